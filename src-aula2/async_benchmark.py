@@ -0,0 +1,252 @@
+"""
+Gerador de carga concorrente (asyncio) para o benchmark de votação.
+
+benchmark.py envia os votos em sequência, a partir de uma única thread: mede
+a latência de ida e volta do cliente, não o que o banco aguenta sob tráfego
+concorrente. Aqui vários votos ficam "em voo" ao mesmo tempo:
+
+- circuito fechado: N trabalhadores, cada um envia o próximo voto assim que
+  o anterior termina (a vazão é consequência da latência);
+- circuito aberto: os votos chegam a uma taxa alvo, independentemente das
+  respostas, com no máximo N em voo; a latência conta a partir do instante
+  em que o voto deveria ter saído, para não esconder filas (coordinated omission).
+
+Backends: redis.asyncio, o cliente assíncrono do PyMongo e SQLite com as
+escritas delegadas a uma única thread. O resultado é uma curva
+vazão x latência por backend, variando o nível de concorrência.
+"""
+import argparse
+import asyncio
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from latency_stats import percentil
+
+
+# --- Backends assíncronos ---
+
+class VotoRedisAsync:
+    nome = "Redis"
+
+    def __init__(self, offline=False):
+        if offline:
+            import fakeredis
+            self.r = fakeredis.FakeAsyncRedis(decode_responses=True)
+        else:
+            import redis.asyncio
+            self.r = redis.asyncio.Redis(host='localhost', port=6379, db=1, decode_responses=True)
+
+    async def preparar(self):
+        await self.r.flushdb()
+
+    async def votar(self, id_enquete, id_usuario, opcao):
+        if await self.r.sadd(f"enquete:{id_enquete}:votantes", id_usuario):
+            pipe = self.r.pipeline(transaction=False)
+            pipe.incr(f"enquete:{id_enquete}:opcao:{opcao}")
+            pipe.zincrby(f"enquete:{id_enquete}:placar", 1, opcao)
+            await pipe.execute()
+            return True
+        return False
+
+    async def fechar(self):
+        await self.r.aclose()
+
+
+class VotoMongoAsync:
+    """
+    Usa o AsyncMongoClient do PyMongo. O mongomock não tem cliente assíncrono,
+    então no modo offline as chamadas síncronas são delegadas a threads.
+    """
+
+    nome = "MongoDB"
+
+    def __init__(self, offline=False):
+        self.offline = offline
+        if offline:
+            import mongomock
+            self.client = mongomock.MongoClient()
+        else:
+            from pymongo import AsyncMongoClient
+            self.client = AsyncMongoClient('localhost', 27017, serverSelectionTimeoutMS=5000)
+        self.colecao = self.client['enquete_benchmark_db']['votes']
+
+    async def _chamar(self, metodo, *args, **kwargs):
+        if self.offline:
+            return await asyncio.to_thread(metodo, *args, **kwargs)
+        return await metodo(*args, **kwargs)
+
+    async def preparar(self):
+        await self._chamar(self.colecao.delete_many, {})
+        await self._chamar(self.colecao.create_index, [("poll_id", 1), ("user_id", 1)], unique=True)
+
+    async def votar(self, id_enquete, id_usuario, opcao):
+        try:
+            await self._chamar(self.colecao.insert_one,
+                               {"poll_id": id_enquete, "user_id": id_usuario, "option_id": opcao})
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def fechar(self):
+        if self.offline:
+            self.client.close()
+        else:
+            await self.client.close()
+
+
+class VotoSQLiteAsync:
+    """
+    O SQLite não tem API assíncrona e aceita um escritor por vez: todas as
+    escritas vão para uma única thread dedicada, e o event loop só aguarda.
+    """
+
+    nome = "SQLite"
+
+    def __init__(self, db_file="enquete_async_benchmark.db"):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="escritor-sqlite")
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+
+    async def _na_thread(self, funcao, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, funcao, *args)
+
+    def _preparar(self):
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("DROP TABLE IF EXISTS votes")
+        self.conn.execute(
+            'CREATE TABLE votes (id INTEGER PRIMARY KEY, user_id INTEGER, poll_id INTEGER, option_id TEXT, '
+            'UNIQUE (user_id, poll_id))')
+        self.conn.commit()
+
+    def _votar(self, id_enquete, id_usuario, opcao):
+        try:
+            self.conn.execute("INSERT INTO votes (user_id, poll_id, option_id) VALUES (?, ?, ?)",
+                              (id_usuario, id_enquete, opcao))
+            self.conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    async def preparar(self):
+        await self._na_thread(self._preparar)
+
+    async def votar(self, id_enquete, id_usuario, opcao):
+        return await self._na_thread(self._votar, id_enquete, id_usuario, opcao)
+
+    async def fechar(self):
+        await self._na_thread(self.conn.close)
+        self.executor.shutdown()
+
+
+def criar_backend_async(backend, offline=False):
+    if backend == "sqlite":
+        return VotoSQLiteAsync(":memory:" if offline else "enquete_async_benchmark.db")
+    if backend == "redis":
+        return VotoRedisAsync(offline)
+    if backend == "mongodb":
+        return VotoMongoAsync(offline)
+    raise ValueError(f"Backend desconhecido: {backend!r}")
+
+
+# --- Geradores de carga ---
+
+async def carga_circuito_fechado(backend, votos, concorrencia):
+    """'concorrencia' trabalhadores consomem a mesma fila de votos, um voto por vez cada."""
+    latencias = []
+    fila = iter(votos)
+
+    async def trabalhador():
+        for voto in fila:
+            t0 = time.perf_counter()
+            await backend.votar(*voto)
+            latencias.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return latencias
+
+
+async def carga_circuito_aberto(backend, votos, concorrencia, taxa):
+    """
+    Dispara os votos a 'taxa' votos/s, com no máximo 'concorrencia' em voo.
+    A latência de cada voto é medida a partir do horário agendado de envio.
+    """
+    latencias = []
+    limite = asyncio.Semaphore(concorrencia)
+    inicio = time.perf_counter()
+
+    async def enviar(voto, agendado):
+        async with limite:
+            await backend.votar(*voto)
+        latencias.append(time.perf_counter() - agendado)
+
+    tarefas = []
+    for i, voto in enumerate(votos):
+        agendado = inicio + i / taxa
+        espera = agendado - time.perf_counter()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        tarefas.append(asyncio.create_task(enviar(voto, agendado)))
+    await asyncio.gather(*tarefas)
+    return latencias
+
+
+async def medir(backend, votos, concorrencia, taxa=None):
+    """Roda uma carga e retorna vazão (votos/s) e latências p50/p95/p99 em milissegundos."""
+    await backend.preparar()
+    inicio = time.perf_counter()
+    if taxa is None:
+        latencias = await carga_circuito_fechado(backend, votos, concorrencia)
+    else:
+        latencias = await carga_circuito_aberto(backend, votos, concorrencia, taxa)
+    duracao = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "backend": backend.nome,
+        "concorrencia": concorrencia,
+        "votos_por_segundo": len(votos) / duracao,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+    }
+
+
+async def curva_vazao_latencia(backends, num_votos, niveis, taxa=None, offline=False, id_enquete=1):
+    """Mede cada backend em cada nível de concorrência e imprime a curva vazão x latência."""
+    modo = "circuito fechado" if taxa is None else f"circuito aberto a {taxa} votos/s"
+    print(f"\n--- Carga concorrente ({modo}, {num_votos} votos por ponto) ---")
+    opcoes = ("A", "B", "C")
+    votos = [(id_enquete, i, opcoes[i % len(opcoes)]) for i in range(num_votos)]
+    resultados = []
+    for nome in backends:
+        backend = criar_backend_async(nome, offline)
+        try:
+            for concorrencia in niveis:
+                resultado = await medir(backend, votos, concorrencia, taxa)
+                resultados.append(resultado)
+                print(f"{resultado['backend']:<8} concorrência {concorrencia:>4} | "
+                      f"{resultado['votos_por_segundo']:>10,.0f} votos/s | p50 {resultado['p50_ms']:.3f} ms | "
+                      f"p95 {resultado['p95_ms']:.3f} ms | p99 {resultado['p99_ms']:.3f} ms")
+        except (RedisConnectionError, ConnectionFailure):
+            print(f"AVISO: {nome} indisponível; ignorado.")
+        finally:
+            await backend.fechar()
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador de carga concorrente para o benchmark de votação.")
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "redis", "mongodb"],
+                        choices=["sqlite", "redis", "mongodb"])
+    parser.add_argument("--votos", type=int, default=20000, help="votos por ponto da curva")
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 4, 16, 64, 256],
+                        help="níveis de concorrência (votos em voo)")
+    parser.add_argument("--taxa", type=float,
+                        help="taxa alvo em votos/s (circuito aberto); sem ela, circuito fechado")
+    parser.add_argument("--offline", action="store_true",
+                        help="usa SQLite em memória, fakeredis e mongomock (sem Docker)")
+    args = parser.parse_args()
+
+    asyncio.run(curva_vazao_latencia(args.backends, args.votos, args.concorrencia, args.taxa, args.offline))
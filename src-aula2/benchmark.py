@@ -1,20 +1,42 @@
 import sqlite3
 import redis
+import bson
 from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError, ConnectionFailure
+from pymongo.errors import DuplicateKeyError, ConnectionFailure, OperationFailure
+import argparse
+import multiprocessing
+import random
 import time
 import os
 
+from sqlite_example import (consultar_placar_sql, consultar_votantes_sql, consultar_voto_sql, criar_tallies_sql,
+                            seed_data, setup_database)
+from scoreboard_cache import CachedVoteStore, CachePlacar
+from write_behind import WriteBehindVoteStore
+from vote_rollups import criar_store_temporal
+from instrumentation import OPERACOES_PLACAR, OPERACOES_VOTO, instrumentacao
+from latency_stats import percentil
+from benchmark_results import RegistroResultados, caminho_padrao
+from vote_store import (BACKENDS, ESTRATEGIAS_DEDUPLICACAO, SCRIPT_VOTO_LUA, RedisVoteStore, chaves_voto_redis,
+                        criar_store, definir_shards_enquete, em_lotes, inserir_sql_em_lote, votar_mongo_em_lote,
+                        votar_redis_em_lote)
+
 # --- Configuração do SQLite ---
 DB_FILE = "enquete_benchmark.db"
 
-def setup_sqlite():
+# Medições desta execução, gravadas em JSON no final (ver benchmark_results.py)
+resultados = RegistroResultados()
+
+def setup_sqlite(wal=False, synchronous=None, unico=True):
     if os.path.exists(DB_FILE):
         os.remove(DB_FILE)
     conn = sqlite3.connect(DB_FILE)
+    configurar_pragmas_sqlite(conn, wal=wal, synchronous=synchronous)
     cursor = conn.cursor()
+    # unico=False tira a restrição UNIQUE (e o índice que a implementa), para medir o seu custo
+    restricao = ", UNIQUE (user_id, poll_id)" if unico else ""
     cursor.execute(
-        'CREATE TABLE votes (id INTEGER PRIMARY KEY, user_id INTEGER, poll_id INTEGER, UNIQUE (user_id, poll_id))')
+        f'CREATE TABLE votes (id INTEGER PRIMARY KEY, user_id INTEGER, poll_id INTEGER{restricao})')
     conn.commit()
     return conn
 
@@ -30,26 +52,116 @@ def votar_sql(conn, id_enquete, id_usuario):
     except sqlite3.IntegrityError:
         return False
 
-# --- Configuração do Redis ---
-try:
-    r = redis.Redis(host='localhost', port=6379, db=1, decode_responses=True)
-    r.flushdb()  # Limpa o banco de dados do benchmark
-    r.ping()
-    print("Conexão com o Redis bem-sucedida!")
-except redis.exceptions.ConnectionError:
-    r = None # Define como None se a conexão falhar
-    print("AVISO: Não foi possível conectar ao Redis. O benchmark para Redis será ignorado.")
-
-# --- Configuração do MongoDB ---
-try:
-    client = MongoClient('localhost', 27017, serverSelectionTimeoutMS=5000)
-    client.admin.command('ping')
-    db = client['enquete_benchmark_db']
-    votes_collection = db['votes']
-    print("Conexão com o MongoDB bem-sucedida!")
-except ConnectionFailure:
-    client = None # Define como None se a conexão falhar
-    print("AVISO: Não foi possível conectar ao MongoDB. O benchmark para MongoDB será ignorado.")
+def configurar_pragmas_sqlite(conn, wal=False, synchronous=None):
+    """
+    Ajusta o modo de journal e o nível de 'synchronous' da conexão.
+    WAL troca o journal de rollback por um log de escrita antecipada, e
+    synchronous=NORMAL (ou OFF) reduz a quantidade de fsyncs por commit.
+    """
+    if wal:
+        conn.execute("PRAGMA journal_mode=WAL")
+    if synchronous is not None:
+        conn.execute(f"PRAGMA synchronous={synchronous}")
+
+def votar_sql_em_lote(conn, votos, tamanho_lote=10000):
+    """
+    Registra vários votos (id_enquete, id_usuario) com executemany, uma transação por lote.
+    Retorna a lista de votos rejeitados pela restrição UNIQUE (user_id, poll_id).
+    """
+    return inserir_sql_em_lote(
+        conn,
+        "INSERT INTO votes (user_id, poll_id) VALUES (?, ?)",
+        votos,
+        lambda voto: (voto[1], voto[0]),
+        tamanho_lote,
+    )
+
+def _banco_ocupado(erro):
+    """True se o OperationalError for SQLITE_BUSY/SQLITE_LOCKED (outro processo segura o lock)."""
+    codigo = getattr(erro, "sqlite_errorcode", None)  # disponível a partir do Python 3.11
+    if codigo is not None:
+        return codigo in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(erro) or "busy" in str(erro)
+
+def escritor_sqlite(id_enquete, usuarios, busy_timeout_ms=100, max_tentativas=50):
+    """
+    Processo escritor do benchmark de contenção: um voto por transação no mesmo arquivo.
+    Cada transação usa BEGIN IMMEDIATE (pede o lock de escrita logo no início) e,
+    se o banco continuar ocupado após o busy_timeout, tenta de novo com backoff
+    exponencial e jitter. Retorna (votos gravados, retentativas, segundos esperando lock).
+    """
+    conn = sqlite3.connect(DB_FILE, timeout=0, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+    gravados = retentativas = 0
+    espera_lock = 0.0
+    for id_usuario in usuarios:
+        for tentativa in range(max_tentativas):
+            t0 = time.perf_counter()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if not _banco_ocupado(e):
+                    raise
+                retentativas += 1
+                time.sleep(min(0.001 * 2 ** tentativa, 0.1) * random.random())
+                espera_lock += time.perf_counter() - t0
+                continue
+            # BEGIN IMMEDIATE pode ter esperado até busy_timeout pelo lock
+            espera_lock += time.perf_counter() - t0
+            try:
+                conn.execute("INSERT INTO votes (user_id, poll_id) VALUES (?, ?)", (id_usuario, id_enquete))
+                gravados += 1
+            except sqlite3.IntegrityError:
+                pass
+            conn.execute("COMMIT")
+            break
+        else:
+            raise RuntimeError(f"Banco ocupado após {max_tentativas} tentativas (usuário {id_usuario}).")
+    conn.close()
+    return gravados, retentativas, espera_lock
+
+# --- Configuração do Redis e do MongoDB ---
+r = None
+script_voto = None
+client = None
+votes_collection = None
+
+def conectar_backends(offline=False):
+    """
+    Conecta ao Redis e ao MongoDB. Com offline=True usa fakeredis e mongomock,
+    permitindo rodar todos os modos do benchmark sem Docker.
+    """
+    global r, script_voto, client, votes_collection
+
+    if offline:
+        import fakeredis
+        import mongomock
+        r = fakeredis.FakeRedis(decode_responses=True)
+        script_voto = r.register_script(SCRIPT_VOTO_LUA)
+        client = mongomock.MongoClient()
+        votes_collection = client['enquete_benchmark_db']['votes']
+        print("Modo offline: usando fakeredis e mongomock.")
+        return
+
+    try:
+        r = redis.Redis(host='localhost', port=6379, db=1, decode_responses=True)
+        r.flushdb()  # Limpa o banco de dados do benchmark
+        r.ping()
+        script_voto = r.register_script(SCRIPT_VOTO_LUA)
+        print("Conexão com o Redis bem-sucedida!")
+    except redis.exceptions.ConnectionError:
+        r = None # Define como None se a conexão falhar
+        print("AVISO: Não foi possível conectar ao Redis. O benchmark para Redis será ignorado.")
+
+    try:
+        client = MongoClient('localhost', 27017, serverSelectionTimeoutMS=5000)
+        client.admin.command('ping')
+        db = client['enquete_benchmark_db']
+        votes_collection = db['votes']
+        print("Conexão com o MongoDB bem-sucedida!")
+    except ConnectionFailure:
+        client = None # Define como None se a conexão falhar
+        print("AVISO: Não foi possível conectar ao MongoDB. O benchmark para MongoDB será ignorado.")
 
 
 def setup_mongodb():
@@ -77,6 +189,10 @@ def votar_redis_pipelined(id_enquete, id_usuario, opcao):
     resultados = pipe.execute()
     return resultados[0] == 1
 
+def votar_redis_lua(id_enquete, id_usuario, opcao):
+    # Um único EVALSHA faz SADD + INCR + ZINCRBY de forma atômica no servidor
+    return bool(script_voto(keys=chaves_voto_redis(id_enquete, opcao), args=[id_usuario, opcao]))
+
 def votar_mongo(id_enquete, id_usuario, opcao):
     try:
         votes_collection.insert_one({
@@ -90,9 +206,518 @@ def votar_mongo(id_enquete, id_usuario, opcao):
 
 # --- O Benchmark ---
 
+def executar_benchmark_store(store, votos, tamanho_lote=None):
+    """
+    Mede um VoteStore com a lista de votos (id_enquete, id_usuario, opcao).
+    Sem 'tamanho_lote' cada voto é uma chamada a store.votar; com ele, cada lote
+    é uma chamada a store.votar_em_lote e a latência medida é a do lote inteiro.
+    Retorna um dicionário com vazão (votos/s) e latências p50/p95/p99 em milissegundos.
+    """
+    store.preparar()
+    latencias = []
+    rejeitados = 0
+    inicio = time.perf_counter()
+    if tamanho_lote is None:
+        for voto in votos:
+            t0 = time.perf_counter()
+            if not store.votar(*voto):
+                rejeitados += 1
+            latencias.append(time.perf_counter() - t0)
+    else:
+        for lote in em_lotes(votos, tamanho_lote):
+            t0 = time.perf_counter()
+            rejeitados += len(store.votar_em_lote(lote, tamanho_lote))
+            latencias.append(time.perf_counter() - t0)
+    duracao = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "backend": store.nome,
+        "modo": "unitario" if tamanho_lote is None else f"lote {tamanho_lote}",
+        "tamanho_lote": tamanho_lote,
+        "votos": len(votos),
+        "rejeitados": rejeitados,
+        "segundos": duracao,
+        "votos_por_segundo": len(votos) / duracao if duracao else float("inf"),
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p95_ms": percentil(latencias, 95) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+    }
+
+def imprimir_resultado(resultado):
+    rotulo = f"{resultado['backend']} ({resultado['modo']}):"
+    print(f"{rotulo:<28}{resultado['votos_por_segundo']:>12,.0f} votos/s | "
+          f"p50 {resultado['p50_ms']:.3f} ms | p95 {resultado['p95_ms']:.3f} ms | "
+          f"p99 {resultado['p99_ms']:.3f} ms")
+
+def benchmark_stores(num_votos, id_enquete, offline, tamanhos_lote=(None, 1000)):
+    """Roda o mesmo conjunto de votos contra cada backend através da interface VoteStore."""
+    print(f"\n--- VoteStore: {num_votos} votos por backend ---")
+    opcoes = ("A", "B", "C")
+    votos = [(id_enquete, i, opcoes[i % len(opcoes)]) for i in range(num_votos)]
+    for backend in BACKENDS:
+        try:
+            store = criar_store(backend, offline=offline)
+            for tamanho_lote in tamanhos_lote:
+                resultado = executar_benchmark_store(store, votos, tamanho_lote)
+                imprimir_resultado(resultado)
+                resultados.adicionar_resultado("stores", resultado)
+            store.fechar()
+        except (redis.exceptions.ConnectionError, ConnectionFailure):
+            print(f"AVISO: {backend} indisponível; ignorado.")
+
+def medir_latencias(funcao, repeticoes):
+    """Executa 'funcao' várias vezes e retorna as latências (segundos) ordenadas."""
+    latencias = []
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        latencias.append(time.perf_counter() - t0)
+    latencias.sort()
+    return latencias
+
+def medir_latencia(funcao, repeticoes):
+    """Executa 'funcao' várias vezes e retorna a mediana da latência em milissegundos."""
+    return percentil(medir_latencias(funcao, repeticoes), 50) * 1000
+
+def adicionar_latencias(cenario, backend, modo, votos, latencias):
+    """
+    Registra uma medição só de latência (ex.: leituras de placar), sem vazão:
+    'votos' é o tamanho da base consultada e 'latencias' a lista ordenada, em segundos.
+    """
+    resultados.adicionar(cenario, backend, modo, votos, None,
+                         p50_ms=percentil(latencias, 50) * 1000, p95_ms=percentil(latencias, 95) * 1000,
+                         p99_ms=percentil(latencias, 99) * 1000)
+
+def benchmark_placar_sql(tamanhos=(10_000, 1_000_000, 10_000_000), repeticoes=20):
+    """
+    Compara a latência do placar SQLite calculado com JOIN + GROUP BY sobre 'votes'
+    com a leitura da tabela materializada 'option_tallies' (mantida por triggers).
+    """
+    print("\n--- Placar SQLite: JOIN + GROUP BY vs. option_tallies ---")
+    arquivo = "enquete_placar_benchmark.db"
+    for num_votos in tamanhos:
+        conn = setup_database(arquivo)
+        seed_data(conn)
+        conn.executemany(
+            "INSERT INTO votes (user_id, poll_id, option_id) VALUES (?, ?, ?)",
+            ((i, 1, i % 3 + 1) for i in range(num_votos))
+        )
+        conn.commit()
+        # Banco já populado: cria os triggers e reconstrói as contagens de uma vez
+        criar_tallies_sql(conn)
+
+        join = medir_latencias(lambda: consultar_placar_sql(conn, 1), repeticoes)
+        tallies = medir_latencias(lambda: consultar_placar_sql(conn, 1, usar_tallies=True), repeticoes)
+        adicionar_latencias("placar-sql", "SQLite", "JOIN", num_votos, join)
+        adicionar_latencias("placar-sql", "SQLite", "option_tallies", num_votos, tallies)
+        ms_join = percentil(join, 50) * 1000
+        ms_tallies = percentil(tallies, 50) * 1000
+        print(f"{num_votos:>12,} votos | JOIN: {ms_join:10.3f} ms | option_tallies: {ms_tallies:.3f} ms")
+        conn.close()
+    os.remove(arquivo)
+
+def benchmark_placar_mongo(num_votos, id_enquete, offline, repeticoes=50):
+    """
+    Compara o placar do MongoDB por agregação com o placar por documento de contagem:
+    custo de ingestão (vazão em lote) e latência de leitura (mediana).
+    """
+    print("\n--- Placar MongoDB: agregação vs. documento de contagem ---")
+    opcoes = ("A", "B", "C")
+    votos = [(id_enquete, i, opcoes[i % len(opcoes)]) for i in range(num_votos)]
+    for backend in ("mongodb", "mongodb-tally"):
+        store = criar_store(backend, offline=offline)
+        resultado = executar_benchmark_store(store, votos, tamanho_lote=1000)
+        resultados.adicionar_resultado("placar-mongo", resultado)
+        ms_leitura = medir_latencia(lambda: store.obter_placar(id_enquete), repeticoes)
+        print(f"{store.nome:<16}ingestão: {resultado['votos_por_segundo']:>10,.0f} votos/s | "
+              f"placar: {ms_leitura:.3f} ms")
+        store.fechar()
+
+def benchmark_memoria_deduplicacao(num_votantes, id_enquete, taxa_falso_positivo=0.001):
+    """
+    Ingere 'num_votantes' votos com cada estratégia de deduplicação do Redis e reporta
+    a memória da estrutura (MEMORY USAGE) por milhão de votantes e os falsos positivos.
+    """
+    print(f"\n--- Memória da deduplicação no Redis ({num_votantes} votantes) ---")
+    for nome, estrategia in ESTRATEGIAS_DEDUPLICACAO.items():
+        if nome == "bloom":
+            deduplicacao = estrategia(capacidade=num_votantes, taxa_falso_positivo=taxa_falso_positivo)
+        else:
+            deduplicacao = estrategia()
+        store = RedisVoteStore(r, deduplicacao=deduplicacao, indexar_votantes=False)
+        store.preparar()
+        start_time = time.perf_counter()
+        rejeitados = store.votar_em_lote(((id_enquete, i, "A") for i in range(num_votantes)), 10000)
+        end_time = time.perf_counter()
+        memoria = store.memoria_deduplicacao(id_enquete)
+        por_milhao = "n/d" if memoria is None else f"{memoria / num_votantes * 1_000_000 / 1024 ** 2:.2f} MB"
+        print(f"{nome:<8}{por_milhao:>12} por milhão de votantes | "
+              f"{end_time - start_time:.4f} segundos | {len(rejeitados)} falsos positivos")
+        resultados.adicionar("deduplicacao-redis", "Redis", nome, num_votantes, end_time - start_time, 10000,
+                             len(rejeitados), bytes_por_voto=None if memoria is None else memoria / num_votantes)
+    r.flushdb()
+
+def benchmark_shards_redis(num_votos, id_enquete, shards=(1, 4, 16, 64), repeticoes=50):
+    """
+    Contadores particionados: vazão de escrita x custo de leitura do placar conforme K cresce.
+    Em um único nó a escrita quase não muda; o ganho aparece quando os shards se espalham
+    por vários nós de um Redis Cluster, enquanto a leitura sempre paga os K shards.
+    """
+    print(f"\n--- Redis com contadores particionados ({num_votos} votos) ---")
+    opcoes = ("A", "B", "C")
+    for k in shards:
+        store = RedisVoteStore(r, particionado=True)
+        store.preparar()
+        definir_shards_enquete(r, id_enquete, k)
+        start_time = time.perf_counter()
+        for i in range(num_votos):
+            store.votar(id_enquete, i, opcoes[i % len(opcoes)])
+        end_time = time.perf_counter()
+        latencias = medir_latencias(lambda: store.obter_placar(id_enquete), repeticoes)
+        ms_placar = percentil(latencias, 50) * 1000
+        resultados.adicionar("shards-redis", "Redis", f"K={k} escrita", num_votos, end_time - start_time)
+        adicionar_latencias("shards-redis", "Redis", f"K={k} placar", num_votos, latencias)
+        print(f"K={k:<4} escrita: {num_votos / (end_time - start_time):>10,.0f} votos/s | "
+              f"placar: {ms_placar:.3f} ms")
+    r.flushdb()
+
+def benchmark_write_behind(num_votos, id_enquete, offline, backends=("sqlite", "redis", "mongodb")):
+    """
+    Escrita direta (um voto por chamada ao backend) x camada write-behind
+    (voto confirmado após o log local; o backend recebe lotes agregados e uma
+    leitura de deduplicação por voto).
+    Compara a latência de ingestão vista pelo cliente e o número de chamadas ao backend.
+    """
+    print(f"\n--- Write-behind x escrita direta ({num_votos} votos) ---")
+    opcoes = ("A", "B", "C")
+    votos = [(id_enquete, i, opcoes[i % len(opcoes)]) for i in range(num_votos)]
+    caminho_log = "votos_write_behind.log"
+    for backend in backends:
+        try:
+            direto = criar_store(backend, offline=offline)
+            resultado = executar_benchmark_store(direto, votos)
+            resultados.adicionar_resultado("write-behind", resultado)
+            print(f"{direto.nome + ' (direto):':<34}p50 {resultado['p50_ms']:.3f} ms | "
+                  f"p99 {resultado['p99_ms']:.3f} ms | {resultado['votos_por_segundo']:>10,.0f} votos/s | "
+                  f"{num_votos} chamadas ao backend")
+            direto.fechar()
+
+            if os.path.exists(caminho_log):
+                os.remove(caminho_log)  # Log de uma execução interrompida: aqui cada medição começa do zero
+            store = WriteBehindVoteStore(criar_store(backend, offline=offline), caminho_log, tamanho_flush=1000)
+            resultado = executar_benchmark_store(store, votos)
+            start_time = time.perf_counter()
+            store.descarregar()  # Inclui na vazão o tempo da última descarga
+            segundos = resultado["segundos"] + time.perf_counter() - start_time
+            resultados.adicionar_resultado("write-behind", {**resultado, "segundos": segundos})
+            print(f"{store.nome + ':':<34}p50 {resultado['p50_ms']:.3f} ms | "
+                  f"p99 {resultado['p99_ms']:.3f} ms | {num_votos / segundos:>10,.0f} votos/s | "
+                  f"{store.descargas} lotes + {store.consultas} leituras ao backend")
+            store.fechar()
+        except (redis.exceptions.ConnectionError, ConnectionFailure):
+            print(f"AVISO: {backend} indisponível; ignorado.")
+    os.remove(caminho_log)
+
+def benchmark_cache_placar(num_leituras, id_enquete, offline, votos_por_leitura=0.01,
+                           backends=("sqlite", "redis", "mongodb")):
+    """
+    Simula um painel: 'num_leituras' consultas ao placar intercaladas com votos
+    (em média 'votos_por_leitura' votos por leitura). Compara leitura direta com o
+    cache invalidado a cada voto e com o cache de staleness limitada (100 ms).
+    """
+    print(f"\n--- Cache de placar ({num_leituras} leituras, {votos_por_leitura:.0%} com voto) ---")
+    opcoes = ("A", "B", "C")
+    votos_iniciais = [(id_enquete, i, opcoes[i % len(opcoes)]) for i in range(10000)]
+    intervalo_voto = max(1, round(1 / votos_por_leitura))
+    configuracoes = (
+        ("sem cache", None),
+        ("invalidação", dict(ttl=1.0)),
+        ("staleness 100 ms", dict(ttl=1.0, staleness_maxima=0.1)),
+    )
+    for backend in backends:
+        try:
+            for rotulo, parametros in configuracoes:
+                store = criar_store(backend, offline=offline)
+                if parametros is not None:
+                    store = CachedVoteStore(store, CachePlacar(**parametros))
+                store.preparar()
+                store.votar_em_lote(votos_iniciais, 1000)
+                latencias = []
+                for i in range(num_leituras):
+                    if i % intervalo_voto == 0:
+                        store.votar(id_enquete, len(votos_iniciais) + i, opcoes[i % len(opcoes)])
+                    t0 = time.perf_counter()
+                    store.obter_placar(id_enquete)
+                    latencias.append(time.perf_counter() - t0)
+                latencias.sort()
+                adicionar_latencias("cache-placar", backend, rotulo, len(votos_iniciais), latencias)
+                detalhe = "" if parametros is None else f" | acertos: {store.cache.taxa_acerto():.1%}"
+                print(f"{backend:<8}{rotulo:<18}p50 {percentil(latencias, 50) * 1000:.4f} ms | "
+                      f"p99 {percentil(latencias, 99) * 1000:.4f} ms{detalhe}")
+                store.fechar()
+        except (redis.exceptions.ConnectionError, ConnectionFailure):
+            print(f"AVISO: {backend} indisponível; ignorado.")
+
+def tamanho_sqlite(conn):
+    """Bytes do arquivo (page_count * page_size) e, se o SQLite tiver a tabela virtual dbstat, bytes por objeto."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    try:
+        por_objeto = dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name"))
+    except sqlite3.OperationalError:
+        por_objeto = None  # SQLite compilado sem SQLITE_ENABLE_DBSTAT_VTAB
+    return page_count * page_size, por_objeto
+
+def memoria_redis(padrao):
+    """Soma de MEMORY USAGE das chaves que casam com 'padrao' e o used_memory do INFO memory (None se indisponível)."""
+    try:
+        chaves = sum(r.memory_usage(chave, samples=0) or 0 for chave in r.scan_iter(match=padrao, count=1000))
+    except redis.exceptions.ResponseError:
+        chaves = None  # ex.: fakeredis não implementa MEMORY USAGE
+    try:
+        usada = r.info("memory")["used_memory"]
+    except redis.exceptions.ResponseError:
+        usada = None
+    return chaves, usada
+
+def tamanho_mongo():
+    """
+    (dados, índices, estimado) da coleção 'votes' pelo collStats. Sem collStats (mongomock),
+    soma o tamanho BSON dos documentos e devolve estimado=True.
+    """
+    try:
+        stats = votes_collection.database.command({"collStats": votes_collection.name})
+        return stats["size"], stats["totalIndexSize"], False
+    except (NotImplementedError, OperationFailure):
+        return sum(len(bson.encode(doc)) for doc in votes_collection.find()), None, True
+
+def benchmark_armazenamento(tamanhos, id_enquete):
+    """
+    Carrega N votos pelos caminhos em lote de cada backend e reporta bytes por voto:
+    SQLite no disco (com e sem o índice UNIQUE), Redis em memória (chaves da enquete
+    e variação do used_memory) e MongoDB (dados e índices de 'votes').
+    """
+    def por_voto(total, n):
+        return "n/d" if total is None else f"{total / n:8.1f} B/voto"
+
+    print("\n--- Armazenamento por voto ---")
+    opcoes = ("A", "B", "C")
+    for n in tamanhos:
+        print(f"\n{n:,} votos")
+        for unico in (True, False):
+            conn = setup_sqlite(unico=unico)
+            votar_sql_em_lote(conn, ((id_enquete, i) for i in range(n)), 10000)
+            total, por_objeto = tamanho_sqlite(conn)
+            detalhe = ""
+            if por_objeto is not None:
+                indices = sum(tamanho for nome, tamanho in por_objeto.items() if nome.startswith("sqlite_autoindex"))
+                detalhe = f" | tabela {por_voto(por_objeto.get('votes', 0), n)} | índice {por_voto(indices, n)}"
+            rotulo = "SQLite (com UNIQUE)" if unico else "SQLite (sem UNIQUE)"
+            print(f"  {rotulo:<22}disco {por_voto(total, n)}{detalhe}")
+            resultados.adicionar("armazenamento", "SQLite", "com UNIQUE" if unico else "sem UNIQUE", n, None,
+                                 bytes_por_voto=total / n)
+            conn.close()
+        os.remove(DB_FILE)
+
+        if r:
+            r.flushdb()
+            _, usada_antes = memoria_redis(f"enquete:{id_enquete}:*")
+            votar_redis_em_lote(r, ((id_enquete, i, opcoes[i % len(opcoes)]) for i in range(n)), 10000)
+            chaves, usada_depois = memoria_redis(f"enquete:{id_enquete}:*")
+            delta = None if usada_antes is None else usada_depois - usada_antes
+            print(f"  {'Redis':<22}MEMORY USAGE {por_voto(chaves, n)} | INFO used_memory {por_voto(delta, n)}")
+            resultados.adicionar("armazenamento", "Redis", "MEMORY USAGE", n, None,
+                                 bytes_por_voto=None if chaves is None else chaves / n)
+            r.flushdb()
+
+        if client:
+            setup_mongodb()
+            votar_mongo_em_lote(votes_collection, ((id_enquete, i, opcoes[i % len(opcoes)]) for i in range(n)), 10000)
+            dados, indices, estimado = tamanho_mongo()
+            print(f"  {'MongoDB':<22}dados {por_voto(dados, n)}{' (BSON estimado)' if estimado else ''} | "
+                  f"índices {por_voto(indices, n)}")
+            resultados.adicionar("armazenamento", "MongoDB", "dados (BSON estimado)" if estimado else "dados", n,
+                                 None, bytes_por_voto=dados / n)
+            if indices is not None:
+                resultados.adicionar("armazenamento", "MongoDB", "índices", n, None, bytes_por_voto=indices / n)
+
+def benchmark_esquema_compacto(tamanhos=(10_000, 1_000_000), repeticoes=20, tamanho_lote=10000):
+    """
+    Compara o esquema de sqlite_example.py (rowid + índice UNIQUE) com o compacto
+    (WITHOUT ROWID agrupado por (poll_id, user_id) + índice de cobertura por opção):
+    vazão de inserção em lote, bytes por voto no disco e latência mediana do placar,
+    dos votantes de uma opção e da busca do voto de um usuário.
+    Os votos chegam em ordem aleatória de usuário, como numa enquete real.
+    """
+    print("\n--- Esquema SQLite: rowid + UNIQUE vs. WITHOUT ROWID ---")
+    arquivo = "enquete_esquema_benchmark.db"
+    for num_votos in tamanhos:
+        usuarios = list(range(num_votos))
+        random.Random(42).shuffle(usuarios)
+        print(f"\n{num_votos:,} votos")
+        for compacto in (False, True):
+            conn = setup_database(arquivo, compacto=compacto)
+            seed_data(conn)
+            # Todos os votantes como usuários, para a consulta de votantes devolver os nomes
+            conn.executemany("INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+                             ((u, f"user:{u}") for u in usuarios))
+            conn.commit()
+            start_time = time.perf_counter()
+            inserir_sql_em_lote(conn, "INSERT INTO votes (user_id, poll_id, option_id) VALUES (?, ?, ?)",
+                                usuarios, lambda u: (u, 1, u % 3 + 1), tamanho_lote)
+            segundos = time.perf_counter() - start_time
+            conn.execute("ANALYZE")
+            bytes_disco, por_objeto = tamanho_sqlite(conn)
+            if por_objeto is not None:
+                # Só a tabela de votos e os seus índices (sem users/options)
+                objetos = [nome for (nome,) in conn.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'votes'")]
+                bytes_disco = sum(por_objeto.get(nome, 0) for nome in objetos)
+
+            ms_placar = medir_latencia(lambda: consultar_placar_sql(conn, 1), repeticoes)
+            ms_votantes = medir_latencia(lambda: consultar_votantes_sql(conn, 1, "A"), repeticoes)
+            amostra = iter(random.Random(7).choices(usuarios, k=repeticoes))
+            ms_voto = medir_latencia(lambda: consultar_voto_sql(conn, 1, next(amostra)), repeticoes)
+
+            rotulo = "WITHOUT ROWID" if compacto else "rowid + UNIQUE"
+            print(f"  {rotulo:<16}{num_votos / segundos:>10,.0f} votos/s | {bytes_disco / num_votos:6.1f} B/voto em votes | "
+                  f"placar {ms_placar:9.3f} ms | votantes A {ms_votantes:9.3f} ms | voto {ms_voto:.4f} ms")
+            resultados.adicionar("esquema-sqlite", "SQLite", "compacto" if compacto else "rowid", num_votos,
+                                 segundos, tamanho_lote)
+            conn.close()
+    os.remove(arquivo)
+
+def benchmark_series_temporais(num_votos, id_enquete, offline, backends=("sqlite", "redis", "mongodb"),
+                               tamanho_lote=1000, repeticoes=20):
+    """
+    Custo dos rollups por minuto/hora (vote_rollups.py): vazão de ingestão em lote com e sem
+    os baldes e latência mediana de serie_temporal para a última hora (60 baldes de minuto)
+    e o último dia (24 baldes de hora). No SQLite compara também com o GROUP BY sobre
+    'votes', que precisa varrer os votos. Os votos se espalham pelas últimas 24 horas.
+    """
+    print(f"\n--- Séries temporais: rollups por balde ({num_votos} votos em 24 h) ---")
+    agora = int(time.time())
+    rng = random.Random(42)
+    opcoes = ("A", "B", "C")
+    votos = [(id_enquete, i, opcoes[i % len(opcoes)], agora - rng.randrange(86400)) for i in range(num_votos)]
+    for backend in backends:
+        try:
+            simples = criar_store(backend, offline=offline)
+            sem_baldes = executar_benchmark_store(simples, [voto[:3] for voto in votos], tamanho_lote)
+            simples.fechar()
+            store = criar_store_temporal(backend, offline=offline)
+            com_baldes = executar_benchmark_store(store, votos, tamanho_lote)
+            resultados.adicionar_resultado("series-temporais", com_baldes)
+
+            ms_hora = medir_latencia(lambda: store.serie_temporal(id_enquete, "A", agora - 3600, agora), repeticoes)
+            ms_dia = medir_latencia(
+                lambda: store.serie_temporal(id_enquete, "A", agora - 86400, agora, "hora"), repeticoes)
+            print(f"{store.nome:<22}ingestão: {com_baldes['votos_por_segundo']:>10,.0f} votos/s "
+                  f"(sem baldes: {sem_baldes['votos_por_segundo']:,.0f}) | "
+                  f"1 h por minuto: {ms_hora:.3f} ms | 24 h por hora: {ms_dia:.3f} ms")
+            if backend == "sqlite":
+                varredura = ("SELECT voted_at / 60 * 60, COUNT(*) FROM votes "
+                             "WHERE poll_id = ? AND option_id = ? AND voted_at >= ? AND voted_at < ? GROUP BY 1")
+                ms_varredura = medir_latencia(
+                    lambda: store.conn.execute(varredura, (id_enquete, "A", agora - 3600, agora)).fetchall(),
+                    repeticoes)
+                print(f"{'SQLite GROUP BY votes':<22}1 h por minuto: {ms_varredura:.3f} ms (varre os votos)")
+            store.fechar()
+        except (redis.exceptions.ConnectionError, ConnectionFailure):
+            print(f"AVISO: {backend} indisponível; ignorado.")
+
+def benchmark_contencao_sqlite(num_votos, id_enquete, processos=None, busy_timeout_ms=100):
+    """
+    N processos escrevem ao mesmo tempo no mesmo arquivo SQLite (WAL + busy_timeout).
+    Reporta a vazão agregada, o tempo total esperando lock e as retentativas por SQLITE_BUSY.
+    """
+    if processos is None:
+        processos = sorted({1, 2, 4, multiprocessing.cpu_count(), 2 * multiprocessing.cpu_count()})
+    print(f"\n--- Contenção de escrita no SQLite ({num_votos} votos, WAL, busy_timeout={busy_timeout_ms} ms) ---")
+    for n in processos:
+        setup_sqlite(wal=True, synchronous="NORMAL").close()
+        # Cada processo recebe uma fatia intercalada dos usuários
+        tarefas = [(id_enquete, range(i, num_votos, n), busy_timeout_ms) for i in range(n)]
+        with multiprocessing.Pool(n) as pool:
+            start_time = time.perf_counter()
+            por_processo = pool.starmap(escritor_sqlite, tarefas)
+            end_time = time.perf_counter()
+        gravados = sum(g for g, _, _ in por_processo)
+        retentativas = sum(rt for _, rt, _ in por_processo)
+        espera_lock = sum(e for _, _, e in por_processo)
+        print(f"{n:>3} processos | {gravados / (end_time - start_time):>10,.0f} votos/s | "
+              f"espera por lock: {espera_lock:8.3f} s | retentativas: {retentativas}")
+        resultados.adicionar("contencao-sqlite", "SQLite", f"{n} processos", gravados, end_time - start_time)
+    os.remove(DB_FILE)
+
 if __name__ == "__main__":
-    NUM_VOTOS = 100000
+    parser = argparse.ArgumentParser(description="Benchmark de votação em SQLite, Redis e MongoDB.")
+    parser.add_argument("--votos", type=int, default=100000, help="quantidade de votos por modo")
+    parser.add_argument("--offline", action="store_true",
+                        help="usa fakeredis e mongomock no lugar dos servidores (sem Docker)")
+    parser.add_argument("--placar-sql", action="store_true",
+                        help="roda apenas o benchmark de placar SQLite (10k/1M/10M votos)")
+    parser.add_argument("--contencao-sqlite", action="store_true",
+                        help="roda apenas o benchmark de N processos escrevendo no mesmo arquivo SQLite")
+    parser.add_argument("--esquema-sqlite", action="store_true",
+                        help="roda apenas a comparação rowid + UNIQUE x WITHOUT ROWID (10k/1M votos)")
+    parser.add_argument("--series-temporais", action="store_true",
+                        help="roda apenas o benchmark de rollups por minuto/hora (ingestão e consultas por intervalo)")
+    parser.add_argument("--armazenamento", action="store_true",
+                        help="roda apenas o benchmark de bytes por voto (N = votos/100, votos/10 e votos)")
+    parser.add_argument("--instrumentar", metavar="ARQUIVO",
+                        help="grava histogramas de latência por operação em ARQUIVO (.json ou .csv)")
+    parser.add_argument("--resultados", metavar="ARQUIVO", default=None,
+                        help="JSON com as medições desta execução (padrão: resultados/benchmark_<data>.json); "
+                             "compare execuções com 'python benchmark_results.py comparar'")
+    args = parser.parse_args()
+
+    def salvar_resultados():
+        """Toda execução, em qualquer modo, grava as suas medições (ver benchmark_results.py)."""
+        caminho_resultados = args.resultados or caminho_padrao()
+        resultados.salvar(caminho_resultados, offline=args.offline, votos=args.votos)
+        print(f"\nResultados gravados em '{caminho_resultados}'.")
+
+    if args.placar_sql:
+        benchmark_placar_sql()
+        salvar_resultados()
+        raise SystemExit
+    if args.contencao_sqlite:
+        benchmark_contencao_sqlite(args.votos, 1)
+        salvar_resultados()
+        raise SystemExit
+    if args.esquema_sqlite:
+        benchmark_esquema_compacto()
+        salvar_resultados()
+        raise SystemExit
+
+    if args.instrumentar:
+        import sqlite_example
+        import vote_store
+        instrumentacao.instrumentar_modulo(globals(), {**OPERACOES_VOTO, **OPERACOES_PLACAR})
+        instrumentacao.instrumentar_modulo(sqlite_example, OPERACOES_PLACAR)
+        instrumentacao.instrumentar_modulo(vote_store, OPERACOES_PLACAR)
+        # Idas e voltas medidas: ouvinte em todo MongoClient criado a partir daqui e conexões SQLite/Redis
+        instrumentacao.medir_mongo()
+        _setup_sqlite = setup_sqlite
+        setup_sqlite = lambda *args, **kwargs: instrumentacao.medir_conexao(_setup_sqlite(*args, **kwargs))
+        _criar_store = criar_store
+        criar_store = lambda backend, offline=False: instrumentacao.instrumentar_store(_criar_store(backend, offline))
+
+    NUM_VOTOS = args.votos
     ID_ENQUETE = 1
+    conectar_backends(offline=args.offline)
+    if args.instrumentar and r is not None:
+        instrumentacao.medir_conexao(r)
+
+    if args.armazenamento:
+        benchmark_armazenamento(sorted({max(1, NUM_VOTOS // 100), max(1, NUM_VOTOS // 10), NUM_VOTOS}), ID_ENQUETE)
+        salvar_resultados()
+        raise SystemExit
+    if args.series_temporais:
+        benchmark_series_temporais(NUM_VOTOS, ID_ENQUETE, args.offline)
+        salvar_resultados()
+        raise SystemExit
 
     print(f"\n--- Realizando benchmark com {NUM_VOTOS} votos ---")
 
@@ -103,8 +728,22 @@ if __name__ == "__main__":
         votar_sql(conn_sqlite, ID_ENQUETE, i)
     end_time = time.perf_counter()
     print(f"SQLite:              {end_time - start_time:.4f} segundos")
+    resultados.adicionar("funcoes", "SQLite", "unitario", NUM_VOTOS, end_time - start_time)
     conn_sqlite.close()
 
+    # Benchmark SQLite em lote (executemany + uma transação por lote)
+    for tamanho_lote in (1, 100, 10000):
+        conn_sqlite = setup_sqlite(wal=True, synchronous="NORMAL")
+        start_time = time.perf_counter()
+        votos = ((ID_ENQUETE, i) for i in range(NUM_VOTOS))
+        rejeitados = votar_sql_em_lote(conn_sqlite, votos, tamanho_lote)
+        end_time = time.perf_counter()
+        rotulo = f"SQLite (lote {tamanho_lote}):"
+        print(f"{rotulo:<22}{end_time - start_time:.4f} segundos ({len(rejeitados)} duplicados)")
+        resultados.adicionar("funcoes", "SQLite", f"lote {tamanho_lote}", NUM_VOTOS, end_time - start_time,
+                             tamanho_lote, len(rejeitados))
+        conn_sqlite.close()
+
     if r:
         # Benchmark Redis Normal
         start_time = time.perf_counter()
@@ -112,6 +751,7 @@ if __name__ == "__main__":
             votar_redis_normal(ID_ENQUETE, i, "A")
         end_time = time.perf_counter()
         print(f"Redis (Normal):      {end_time - start_time:.4f} segundos")
+        resultados.adicionar("funcoes", "Redis", "normal", NUM_VOTOS, end_time - start_time)
         r.flushdb()  # Limpa para o próximo teste
 
         # Benchmark Redis Pipelined
@@ -120,8 +760,33 @@ if __name__ == "__main__":
             votar_redis_pipelined(ID_ENQUETE, i, "A")
         end_time = time.perf_counter()
         print(f"Redis (Pipelined):   {end_time - start_time:.4f} segundos")
+        resultados.adicionar("funcoes", "Redis", "pipeline", NUM_VOTOS, end_time - start_time)
+        r.flushdb()
+
+        # Benchmark Redis com script Lua (EVALSHA)
+        start_time = time.perf_counter()
+        for i in range(NUM_VOTOS):
+            votar_redis_lua(ID_ENQUETE, i, "A")
+        end_time = time.perf_counter()
+        print(f"Redis (Lua):         {end_time - start_time:.4f} segundos")
+        resultados.adicionar("funcoes", "Redis", "lua", NUM_VOTOS, end_time - start_time)
         r.flushdb()
 
+        # Benchmark Redis em lote (vários votos por pipeline)
+        for tamanho_lote in (100, 1000, 10000):
+            start_time = time.perf_counter()
+            votos = ((ID_ENQUETE, i, "A") for i in range(NUM_VOTOS))
+            rejeitados = votar_redis_em_lote(r, votos, tamanho_lote)
+            end_time = time.perf_counter()
+            rotulo = f"Redis (lote {tamanho_lote}):"
+            print(f"{rotulo:<22}{end_time - start_time:.4f} segundos ({len(rejeitados)} duplicados)")
+            resultados.adicionar("funcoes", "Redis", f"lote {tamanho_lote}", NUM_VOTOS, end_time - start_time,
+                                 tamanho_lote, len(rejeitados))
+            r.flushdb()
+
+        benchmark_memoria_deduplicacao(NUM_VOTOS, ID_ENQUETE)
+        benchmark_shards_redis(NUM_VOTOS, ID_ENQUETE)
+
     # Benchmark do MongoDB
     if client:
         setup_mongodb()
@@ -130,4 +795,29 @@ if __name__ == "__main__":
             votar_mongo(ID_ENQUETE, i, "A")
         end_time = time.perf_counter()
         print(f"MongoDB:             {end_time - start_time:.4f} segundos")
+        resultados.adicionar("funcoes", "MongoDB", "unitario", NUM_VOTOS, end_time - start_time)
+
+        # Benchmark do MongoDB em lote (insert_many não ordenado)
+        for tamanho_lote in (100, 1000, 10000):
+            setup_mongodb()
+            start_time = time.perf_counter()
+            votos = ((ID_ENQUETE, i, "A") for i in range(NUM_VOTOS))
+            rejeitados = votar_mongo_em_lote(votes_collection, votos, tamanho_lote)
+            end_time = time.perf_counter()
+            rotulo = f"MongoDB (lote {tamanho_lote}):"
+            print(f"{rotulo:<22}{end_time - start_time:.4f} segundos ({len(rejeitados)} duplicados)")
+            resultados.adicionar("funcoes", "MongoDB", f"lote {tamanho_lote}", NUM_VOTOS, end_time - start_time,
+                                 tamanho_lote, len(rejeitados))
         client.close()
+        benchmark_placar_mongo(NUM_VOTOS, ID_ENQUETE, args.offline)
+
+    benchmark_stores(NUM_VOTOS, ID_ENQUETE, args.offline)
+    benchmark_write_behind(NUM_VOTOS, ID_ENQUETE, args.offline)
+    benchmark_cache_placar(min(NUM_VOTOS, 10000), ID_ENQUETE, args.offline)
+
+    salvar_resultados()
+
+    if args.instrumentar:
+        instrumentacao.imprimir_resumo()
+        instrumentacao.exportar(args.instrumentar)
+        print(f"\nResumo da instrumentação gravado em '{args.instrumentar}'.")
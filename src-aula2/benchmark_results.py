@@ -0,0 +1,165 @@
+"""
+Resultados persistentes do benchmark e comparação com uma linha de base.
+
+Cada execução de benchmark.py grava um JSON com o ambiente (versões do Python,
+dos clientes e do SQLite, CPU, commit do git, modo offline) e uma linha por
+medição: cenário, backend, modo, votos, tamanho do lote, vazão, percentis e,
+nas medições de armazenamento, bytes por voto. Medições só de latência (ex.:
+leituras de placar) não têm vazão; nelas 'votos' é o tamanho da base consultada.
+
+    python benchmark_results.py comparar base.json atual.json --limite 0.10
+
+junta as duas execuções pelas medições em comum (pandas), mostra a variação
+de vazão, de p99 e de bytes por voto e marca como regressão o que piorou além do limite. O código
+de saída é 1 se houver regressões, para uso em scripts de integração contínua.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+from importlib import metadata
+
+import pandas as pd
+
+CHAVES = ["cenario", "backend", "modo", "votos", "tamanho_lote"]
+METRICAS = ["votos_por_segundo", "p50_ms", "p95_ms", "p99_ms", "bytes_por_voto"]
+PACOTES = ("redis", "pymongo", "fakeredis", "mongomock", "pandas", "numpy")
+
+
+def _versao(pacote):
+    try:
+        return metadata.version(pacote)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _commit_git():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def coletar_ambiente(**extras):
+    """Informações da máquina e das versões, para saber se duas execuções são comparáveis."""
+    return {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "sqlite": sqlite3.sqlite_version,
+        "pacotes": {pacote: _versao(pacote) for pacote in PACOTES},
+        "commit": _commit_git(),
+        **extras,
+    }
+
+
+class RegistroResultados:
+    """Acumula as medições de uma execução e as grava em JSON."""
+
+    def __init__(self):
+        self.resultados = []
+
+    def adicionar(self, cenario, backend, modo, votos, segundos, tamanho_lote=None, rejeitados=0,
+                  p50_ms=None, p95_ms=None, p99_ms=None, bytes_por_voto=None):
+        self.resultados.append({
+            "cenario": cenario,
+            "backend": backend,
+            "modo": modo,
+            "votos": votos,
+            "tamanho_lote": tamanho_lote,
+            "segundos": segundos,
+            "rejeitados": rejeitados,
+            "votos_por_segundo": votos / segundos if segundos else None,
+            "p50_ms": p50_ms,
+            "p95_ms": p95_ms,
+            "p99_ms": p99_ms,
+            "bytes_por_voto": bytes_por_voto,
+        })
+
+    def adicionar_resultado(self, cenario, resultado):
+        """Registra um dicionário devolvido por benchmark.executar_benchmark_store."""
+        self.adicionar(cenario, resultado["backend"], resultado["modo"], resultado["votos"],
+                       resultado["segundos"], resultado["tamanho_lote"], resultado["rejeitados"],
+                       resultado["p50_ms"], resultado["p95_ms"], resultado["p99_ms"])
+
+    def salvar(self, caminho, **ambiente):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"ambiente": coletar_ambiente(**ambiente), "resultados": self.resultados},
+                      arquivo, indent=2, ensure_ascii=False)
+
+
+def caminho_padrao(pasta="resultados"):
+    return os.path.join(pasta, f"benchmark_{datetime.datetime.now():%Y%m%d_%H%M%S}.json")
+
+
+def carregar_resultados(caminho):
+    """Retorna (ambiente, DataFrame com uma linha por medição)."""
+    with open(caminho, "r", encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    tabela = pd.DataFrame(dados["resultados"], columns=CHAVES + ["segundos", "rejeitados"] + METRICAS)
+    # tamanho_lote é None no modo unitário; -1 permite juntar as tabelas por essa coluna
+    tabela["tamanho_lote"] = tabela["tamanho_lote"].fillna(-1).astype(int)
+    # Métricas ausentes (None) viram NaN: não entram na comparação nem acusam regressão
+    tabela[METRICAS] = tabela[METRICAS].astype(float)
+    return dados["ambiente"], tabela
+
+
+def comparar(base, atual, limite=0.10):
+    """
+    Junta duas tabelas de carregar_resultados pelas medições em comum. Regressão: vazão
+    caiu mais que 'limite' (fração) ou o p99 ou os bytes por voto subiram mais que 'limite'.
+    """
+    tabela = base.merge(atual, on=CHAVES, suffixes=("_base", "_atual"))
+    tabela["vazao_%"] = (tabela["votos_por_segundo_atual"] / tabela["votos_por_segundo_base"] - 1) * 100
+    tabela["p99_%"] = (tabela["p99_ms_atual"] / tabela["p99_ms_base"] - 1) * 100
+    tabela["bytes_%"] = (tabela["bytes_por_voto_atual"] / tabela["bytes_por_voto_base"] - 1) * 100
+    tabela["regressao"] = ((tabela["vazao_%"] < -limite * 100) | (tabela["p99_%"] > limite * 100)
+                           | (tabela["bytes_%"] > limite * 100))
+    return tabela[CHAVES + ["votos_por_segundo_base", "votos_por_segundo_atual", "vazao_%",
+                            "p99_ms_base", "p99_ms_atual", "p99_%",
+                            "bytes_por_voto_base", "bytes_por_voto_atual", "bytes_%", "regressao"]]
+
+
+def imprimir_comparacao(tabela, ambiente_base, ambiente_atual):
+    for campo in ("python", "sqlite", "commit"):
+        if ambiente_base.get(campo) != ambiente_atual.get(campo):
+            print(f"Ambiente diferente: {campo} {ambiente_base.get(campo)} -> {ambiente_atual.get(campo)}")
+    pacotes = ambiente_base.get("pacotes", {}), ambiente_atual.get("pacotes", {})
+    for pacote in sorted(set(pacotes[0]) | set(pacotes[1])):
+        if pacotes[0].get(pacote) != pacotes[1].get(pacote):
+            print(f"Ambiente diferente: {pacote} {pacotes[0].get(pacote)} -> {pacotes[1].get(pacote)}")
+
+    exibicao = tabela.assign(
+        tamanho_lote=tabela["tamanho_lote"].where(tabela["tamanho_lote"] >= 0, "-"),
+        regressao=tabela["regressao"].map({True: "REGRESSÃO", False: ""}),
+    )
+    print(exibicao.to_string(index=False, na_rep="-", float_format=lambda valor: f"{valor:,.2f}"))
+    regressoes = int(tabela["regressao"].sum())
+    print(f"\n{len(tabela)} medições comparadas, {regressoes} regressões.")
+    return regressoes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resultados persistentes do benchmark.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comparar_parser = comandos.add_parser("comparar", help="compara uma execução com a linha de base")
+    comparar_parser.add_argument("base", help="JSON da linha de base")
+    comparar_parser.add_argument("atual", help="JSON da execução a comparar")
+    comparar_parser.add_argument("--limite", type=float, default=0.10,
+                                 help="piora tolerada antes de acusar regressão (fração, padrão 0.10)")
+    args = parser.parse_args()
+
+    ambiente_base, base = carregar_resultados(args.base)
+    ambiente_atual, atual = carregar_resultados(args.atual)
+    tabela = comparar(base, atual, args.limite)
+    sys.exit(1 if imprimir_comparacao(tabela, ambiente_base, ambiente_atual) else 0)
@@ -0,0 +1,346 @@
+"""
+Instrumentação das operações de voto e de placar.
+
+instrumentar(funcao) devolve uma versão da função que, a cada chamada, anota:
+
+- a latência em um HistogramaLatencia (baldes log-lineares no estilo HDR:
+  precisão relativa fixa, ~1% com 2 dígitos significativos, e memória
+  constante qualquer que seja o número de chamadas);
+- as idas e voltas ao servidor, medidas nas conexões passadas a
+  medir_conexao (Redis e SQLite) ou pelo ouvinte de comandos do pymongo
+  (medir_mongo), ou então estimadas por número fixo ou função do resultado;
+- as linhas/documentos tocados, por número fixo ou função do resultado;
+- erros (exceções que atravessam a chamada).
+
+Gravar custa duas leituras de relógio e algumas operações inteiras, sem
+travas (cada thread tem seu próprio histograma): pouco o bastante para ficar
+ligado em produção. O resumo sai
+como dicionários e pode ser exportado em JSON ou CSV.
+"""
+import csv
+import functools
+import json
+import sqlite3
+import threading
+import time
+
+
+class HistogramaLatencia:
+    """Histograma de latências (inteiros em nanossegundos, não negativos) com erro relativo limitado."""
+
+    def __init__(self, maximo_ns=60_000_000_000, digitos_significativos=2):
+        # Com 2 dígitos cada potência de 2 é dividida em 128 baldes (erro < 1/128)
+        self.bits_sub = (2 * 10 ** digitos_significativos - 1).bit_length()
+        self.metade = 1 << (self.bits_sub - 1)
+        self.maximo_ns = maximo_ns
+        self.contagens = [0] * (self._indice(maximo_ns) + 1)
+        self.total = 0
+        self.soma_ns = 0
+        self.minimo_ns = None
+        self.maximo_visto_ns = 0
+
+    def _indice(self, valor):
+        expoente = valor.bit_length() - self.bits_sub
+        if expoente <= 0:
+            return valor
+        return expoente * self.metade + (valor >> expoente)
+
+    def _valor(self, indice):
+        """Ponto médio do balde 'indice'."""
+        if indice < 2 * self.metade:
+            return indice
+        expoente = indice // self.metade - 1
+        return ((indice - expoente * self.metade) << expoente) + (1 << expoente) // 2
+
+    def registrar(self, valor_ns):
+        if valor_ns > self.maximo_ns:
+            valor_ns = self.maximo_ns
+        expoente = valor_ns.bit_length() - self.bits_sub
+        self.contagens[valor_ns if expoente <= 0 else expoente * self.metade + (valor_ns >> expoente)] += 1
+        self.total += 1
+        self.soma_ns += valor_ns
+        if self.minimo_ns is None or valor_ns < self.minimo_ns:
+            self.minimo_ns = valor_ns
+        if valor_ns > self.maximo_visto_ns:
+            self.maximo_visto_ns = valor_ns
+
+    def percentil(self, p):
+        """Latência (ns) abaixo da qual estão p% das chamadas (0 se vazio)."""
+        if not self.total:
+            return 0
+        alvo = max(1, -(-self.total * p // 100))  # teto de total * p / 100, como em latency_stats.percentil
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return min(self._valor(indice), self.maximo_visto_ns)
+        return self.maximo_visto_ns
+
+    def media(self):
+        return self.soma_ns / self.total if self.total else 0.0
+
+    def combinar(self, outro):
+        """Soma outro histograma com a mesma configuração (ex.: de outra thread ou processo)."""
+        for indice, contagem in enumerate(outro.contagens):
+            self.contagens[indice] += contagem
+        self.total += outro.total
+        self.soma_ns += outro.soma_ns
+        if outro.minimo_ns is not None and (self.minimo_ns is None or outro.minimo_ns < self.minimo_ns):
+            self.minimo_ns = outro.minimo_ns
+        self.maximo_visto_ns = max(self.maximo_visto_ns, outro.maximo_visto_ns)
+
+
+class EstatisticasOperacao:
+    """
+    Contadores e histograma de uma operação instrumentada. Cada thread grava no seu
+    próprio histograma (sem trava no caminho quente); resumo() soma os de todas.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self.locais = threading.local()
+        self.por_thread = []  # [(histograma, contadores)] de cada thread que já gravou
+        self.trava = threading.Lock()
+
+    def _registro_da_thread(self):
+        registro = (HistogramaLatencia(), [0, 0, 0, 0])  # chamadas, erros, idas e voltas, linhas
+        with self.trava:
+            self.por_thread.append(registro)
+        self.locais.registro = registro
+        return registro
+
+    def registrar(self, duracao_ns, idas_e_voltas, linhas, erro=0):
+        registro = getattr(self.locais, "registro", None) or self._registro_da_thread()
+        registro[0].registrar(duracao_ns)
+        contadores = registro[1]
+        contadores[0] += 1
+        contadores[1] += erro
+        contadores[2] += idas_e_voltas
+        contadores[3] += linhas
+
+    def resumo(self):
+        h = HistogramaLatencia()
+        chamadas = erros = idas_e_voltas = linhas = 0
+        with self.trava:
+            registros = list(self.por_thread)
+        for histograma, contadores in registros:
+            h.combinar(histograma)
+            chamadas += contadores[0]
+            erros += contadores[1]
+            idas_e_voltas += contadores[2]
+            linhas += contadores[3]
+        return {
+            "operacao": self.nome,
+            "chamadas": chamadas,
+            "erros": erros,
+            "idas_e_voltas": idas_e_voltas,
+            "linhas": linhas,
+            "media_us": h.media() / 1000,
+            "p50_us": h.percentil(50) / 1000,
+            "p90_us": h.percentil(90) / 1000,
+            "p99_us": h.percentil(99) / 1000,
+            "p999_us": h.percentil(99.9) / 1000,
+            "max_us": h.maximo_visto_ns / 1000,
+        }
+
+
+class Instrumentacao:
+    """Registro das operações instrumentadas; 'ativa=False' desliga a coleta sem desfazer os wrappers."""
+
+    def __init__(self, ativa=True):
+        self.ativa = ativa
+        self.operacoes = {}
+        self.trava = threading.Lock()
+        self.medidas = threading.local()  # idas e voltas já feitas por esta thread nas conexões medidas
+
+    def contar_ida_e_volta(self, n=1):
+        self.medidas.total = getattr(self.medidas, "total", 0) + n
+
+    def idas_e_voltas_da_thread(self):
+        return getattr(self.medidas, "total", 0)
+
+    def medir_conexao(self, conexao):
+        """
+        Passa a contar as idas e voltas feitas por 'conexao' e a devolve:
+        - Redis: cada comando avulso (inclusive EVALSHA) e cada pipeline executado conta uma;
+        - SQLite: como é embutido, conta cada instrução que a biblioteca executa
+          (set_trace_callback), inclusive o BEGIN implícito e as instruções dos triggers.
+        """
+        if isinstance(conexao, sqlite3.Connection):
+            conexao.set_trace_callback(lambda instrucao: self.contar_ida_e_volta())
+            return conexao
+        if getattr(conexao.execute_command, "medida", False):
+            return conexao
+        executar_comando = conexao.execute_command
+        criar_pipeline = conexao.pipeline
+
+        def execute_command(*args, **opcoes):
+            self.contar_ida_e_volta()
+            return executar_comando(*args, **opcoes)
+
+        def pipeline(*args, **opcoes):
+            pipe = criar_pipeline(*args, **opcoes)
+            executar = pipe.execute
+
+            def execute(*args_execute, **opcoes_execute):
+                if pipe.command_stack:  # pipeline vazio não vai ao servidor
+                    self.contar_ida_e_volta()
+                return executar(*args_execute, **opcoes_execute)
+
+            pipe.execute = execute
+            return pipe
+
+        execute_command.medida = True
+        conexao.execute_command = execute_command
+        conexao.pipeline = pipeline
+        return conexao
+
+    def ouvinte_mongo(self):
+        """CommandListener do pymongo que conta uma ida e volta por comando enviado ao servidor."""
+        from pymongo import monitoring
+
+        instrumentacao = self
+
+        class OuvinteComandos(monitoring.CommandListener):
+            def started(self, evento):
+                instrumentacao.contar_ida_e_volta()
+
+            def succeeded(self, evento):
+                pass
+
+            def failed(self, evento):
+                pass
+
+        return OuvinteComandos()
+
+    def medir_mongo(self):
+        """
+        Registra ouvinte_mongo() em todos os MongoClient criados daqui em diante.
+        O mongomock não passa pelo protocolo do pymongo: no modo offline nada é contado.
+        """
+        from pymongo import monitoring
+        monitoring.register(self.ouvinte_mongo())
+
+    def operacao(self, nome):
+        estatisticas = self.operacoes.get(nome)
+        if estatisticas is None:
+            with self.trava:
+                estatisticas = self.operacoes.setdefault(nome, EstatisticasOperacao(nome))
+        return estatisticas
+
+    def instrumentar(self, funcao, nome=None, idas_e_voltas=None, linhas=None):
+        """
+        Envolve 'funcao'. Sem 'idas_e_voltas', registra as idas e voltas medidas durante a
+        chamada (só as das conexões medidas; ver medir_conexao e medir_mongo). 'idas_e_voltas'
+        e 'linhas' também podem ser estimativas: números fixos ou funções f(resultado) -> int
+        (ex.: linhas=len para um placar). Sem 'linhas', conta 1 se o resultado for verdadeiro
+        (um voto aceito grava uma linha) e 0 caso contrário.
+        """
+        estatisticas = self.operacao(nome or funcao.__name__)
+        relogio = time.perf_counter_ns
+        registrar = estatisticas.registrar
+        medidas = self.idas_e_voltas_da_thread
+
+        @functools.wraps(funcao)
+        def instrumentada(*args, **kwargs):
+            if not self.ativa:
+                return funcao(*args, **kwargs)
+            antes = medidas()
+            inicio = relogio()
+            try:
+                resultado = funcao(*args, **kwargs)
+            except BaseException:
+                registrar(relogio() - inicio,
+                          medidas() - antes if idas_e_voltas is None else
+                          idas_e_voltas(None) if callable(idas_e_voltas) else idas_e_voltas, 0, 1)
+                raise
+            duracao = relogio() - inicio
+            registrar(duracao,
+                      medidas() - antes if idas_e_voltas is None else
+                      idas_e_voltas(resultado) if callable(idas_e_voltas) else idas_e_voltas,
+                      (1 if resultado else 0) if linhas is None else
+                      linhas(resultado) if callable(linhas) else linhas)
+            return resultado
+
+        instrumentada.original = funcao
+        return instrumentada
+
+    def instrumentar_modulo(self, namespace, especificacoes):
+        """
+        Substitui, em 'namespace' (um módulo ou globals()), cada função listada em
+        'especificacoes' {nome: {"idas_e_voltas": ..., "linhas": ...}} pela versão instrumentada.
+        Funções ausentes são ignoradas. Retorna os nomes instrumentados.
+        """
+        alvo = namespace if isinstance(namespace, dict) else vars(namespace)
+        instrumentadas = []
+        for nome, opcoes in especificacoes.items():
+            funcao = alvo.get(nome)
+            if funcao is None or hasattr(funcao, "original"):
+                continue
+            alvo[nome] = self.instrumentar(funcao, nome=nome, **opcoes)
+            instrumentadas.append(nome)
+        return instrumentadas
+
+    def instrumentar_store(self, store):
+        """
+        Instrumenta votar e obter_placar de um VoteStore (na instância, não na classe)
+        e mede a sua conexão SQLite ou Redis (no MongoDB, ver medir_mongo).
+        """
+        for atributo in ("conn", "r"):
+            if getattr(store, atributo, None) is not None:
+                self.medir_conexao(getattr(store, atributo))
+        store.votar = self.instrumentar(store.votar, nome=f"{store.nome}: votar")
+        store.obter_placar = self.instrumentar(store.obter_placar, nome=f"{store.nome}: placar", linhas=len)
+        return store
+
+    def resumo(self):
+        return [linha for linha in (e.resumo() for e in list(self.operacoes.values())) if linha["chamadas"]]
+
+    def exportar(self, caminho):
+        """Grava o resumo em JSON ou CSV, conforme a extensão de 'caminho'."""
+        linhas = self.resumo()
+        if caminho.endswith(".csv"):
+            with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+                escritor = csv.DictWriter(arquivo, fieldnames=list(CAMPOS_RESUMO))
+                escritor.writeheader()
+                escritor.writerows(linhas)
+        else:
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                json.dump(linhas, arquivo, indent=2, ensure_ascii=False)
+
+    def imprimir_resumo(self):
+        print(f"\n{'operação':<28}{'chamadas':>10}{'idas/volta':>11}{'linhas':>9}"
+              f"{'p50 µs':>10}{'p99 µs':>10}{'p99.9 µs':>10}{'máx µs':>11}")
+        for linha in self.resumo():
+            print(f"{linha['operacao']:<28}{linha['chamadas']:>10,}{linha['idas_e_voltas']:>11,}"
+                  f"{linha['linhas']:>9,}{linha['p50_us']:>10.1f}{linha['p99_us']:>10.1f}"
+                  f"{linha['p999_us']:>10.1f}{linha['max_us']:>11.1f}")
+
+
+CAMPOS_RESUMO = ("operacao", "chamadas", "erros", "idas_e_voltas", "linhas", "media_us",
+                 "p50_us", "p90_us", "p99_us", "p999_us", "max_us")
+
+# Funções de voto e de placar do curso. As idas e voltas são medidas nas conexões
+# (medir_conexao/medir_mongo); as funções mostrar_*/obter_resultados imprimem e não
+# retornam o placar, portanto não contam linhas.
+OPERACOES_VOTO = {
+    "votar_sql": {},
+    "votar_redis_normal": {},
+    "votar_redis_pipelined": {},
+    "votar_redis_lua": {},
+    "votar_mongo": {},
+}
+
+OPERACOES_PLACAR = {
+    "consultar_placar_sql": {"linhas": len},
+    "obter_resultados_sql": {"linhas": 0},
+    "mostrar_placar_sql": {"linhas": 0},
+    "placar_redis_sharded": {"linhas": len},
+    "obter_resultados": {"linhas": 0},
+    "mostrar_placar": {"linhas": 0},
+    "placar_tally_mongo": {"linhas": len},
+    "mostrar_placar_mongo": {"linhas": 0},
+}
+
+# Instância global usada pelos scripts do curso
+instrumentacao = Instrumentacao()
@@ -0,0 +1,11 @@
+"""
+Estatísticas de latência compartilhadas pelos benchmarks (benchmark.py e async_benchmark.py).
+"""
+
+
+def percentil(valores_ordenados, p):
+    """Percentil 'p' (0-100) pelo método do posto mais próximo; espera a lista já ordenada."""
+    if not valores_ordenados:
+        return 0.0
+    posto = max(1, -(-len(valores_ordenados) * p // 100))  # teto de n * p / 100
+    return valores_ordenados[int(posto) - 1]
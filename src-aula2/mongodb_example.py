@@ -2,10 +2,14 @@ from pymongo import MongoClient
 from pymongo.errors import DuplicateKeyError, ConnectionFailure
 import time
 
+from instrumentation import OPERACOES_PLACAR, OPERACOES_VOTO, instrumentacao
+from vote_store import incrementar_tallies_mongo, placar_tally_mongo, reconciliar_tallies_mongo
+
 # --- Configuração do MongoDB ---
 try:
     # Conecta ao servidor MongoDB (rodando via Docker em localhost)
-    client = MongoClient('localhost', 27017)
+    # O ouvinte conta os comandos enviados ao servidor (idas e voltas; ver instrumentation.py)
+    client = MongoClient('localhost', 27017, event_listeners=[instrumentacao.ouvinte_mongo()])
     # Testa a conexão
     client.admin.command('ping')
     print("Conexão com o MongoDB bem-sucedida!")
@@ -18,6 +22,8 @@ except ConnectionFailure:
 db = client['enquete_db']
 polls_collection = db['polls']
 votes_collection = db['votes']
+# Documentos de contagem por enquete, mantidos com $inc a cada voto aceito
+tallies_collection = db['tallies']
 
 
 def setup_mongodb():
@@ -26,6 +32,7 @@ def setup_mongodb():
     # Limpa as coleções para começar do zero
     polls_collection.delete_many({})
     votes_collection.delete_many({})
+    tallies_collection.delete_many({})
 
     # PONTO-CHAVE: Criar um índice único para garantir a regra de negócio
     # Isso garante que a combinação de poll_id e user_id seja única em toda a coleção.
@@ -42,8 +49,11 @@ def seed_data_mongo():
     print("Dados iniciais (enquete) inseridos.")
 
 
-def votar_mongo(id_enquete, id_usuario, opcao):
-    """Insere um documento de voto. O índice único cuida da validação."""
+def votar_mongo(id_enquete, id_usuario, opcao, usar_tally=False):
+    """
+    Insere um documento de voto. O índice único cuida da validação.
+    Com usar_tally=True, o voto aceito também incrementa o documento de contagem da enquete.
+    """
     try:
         # Tenta inserir o documento do voto
         votes_collection.insert_one(
@@ -53,6 +63,8 @@ def votar_mongo(id_enquete, id_usuario, opcao):
             "option_id": opcao
         }
         )
+        if usar_tally:
+            incrementar_tallies_mongo(tallies_collection, {(id_enquete, opcao): 1})
         print(f"✅ Voto de '{id_usuario}' para a 'Opção {opcao}' registrado!")
         return True
     except DuplicateKeyError:
@@ -61,13 +73,23 @@ def votar_mongo(id_enquete, id_usuario, opcao):
         return False
 
 
-def mostrar_placar_mongo(id_enquete):
+def mostrar_placar_mongo(id_enquete, usar_tally=False):
     """
     Mostra o placar usando o poderoso Aggregation Framework do MongoDB.
     Isso é o equivalente ao GROUP BY do SQL.
+    Com usar_tally=True, lê apenas o documento de contagem da enquete.
     """
     print("\n--- Placar em Tempo Real (Ranking MongoDB) ---")
 
+    if usar_tally:
+        placar = placar_tally_mongo(tallies_collection, id_enquete)
+        if not placar:
+            print("Nenhum voto registrado ainda.")
+            return
+        for i, (opcao, contagem) in enumerate(placar):
+            print(f"{i + 1}º Lugar: Opção {opcao} com {contagem} votos")
+        return
+
     pipeline = [
         # 1. Filtra os votos apenas para a enquete que queremos
         {"$match": {"poll_id": id_enquete}},
@@ -125,19 +147,28 @@ if __name__ == "__main__":
     setup_mongodb()
     seed_data_mongo()
 
+    # Latência e idas e voltas de cada voto e leitura de placar
+    instrumentacao.instrumentar_modulo(globals(), {**OPERACOES_VOTO, **OPERACOES_PLACAR})
+
     print("\n--- Realizando Votação (MongoDB) ---")
-    votar_mongo(1, "user:101", "A")
-    votar_mongo(1, "user:102", "B")
-    votar_mongo(1, "user:103", "A")
-    votar_mongo(1, "user:101", "C")  # Tentativa de voto duplicado -> FALHA
-    votar_mongo(1, "user:104", "C")
-    votar_mongo(1, "user:105", "A")
+    votar_mongo(1, "user:101", "A", usar_tally=True)
+    votar_mongo(1, "user:102", "B", usar_tally=True)
+    votar_mongo(1, "user:103", "A", usar_tally=True)
+    votar_mongo(1, "user:101", "C", usar_tally=True)  # Tentativa de voto duplicado -> FALHA
+    votar_mongo(1, "user:104", "C", usar_tally=True)
+    votar_mongo(1, "user:105", "A", usar_tally=True)
 
     # Mostrando os resultados
     mostrar_placar_mongo(1)
+    mostrar_placar_mongo(1, usar_tally=True)  # Mesmo placar, lendo um único documento
+
+    # Reconciliação: recalcula as contagens a partir dos votos (fonte da verdade)
+    reconciliar_tallies_mongo(votes_collection, tallies_collection, 1)
 
     # Mostrando a força do MongoDB em consultas flexíveis
     analisar_votantes_por_opcao_mongo(1, "A")
 
+    instrumentacao.imprimir_resumo()
+
     # Fecha a conexão
     client.close()
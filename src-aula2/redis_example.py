@@ -1,6 +1,8 @@
 from redis import Redis, exceptions
 import time
 
+from vote_store import placar_redis_sharded, resultados_redis_sharded, votar_redis_sharded
+
 
 def connect_redis():
     try:
@@ -15,11 +17,20 @@ def connect_redis():
     return r
 
 
-def votar(r, id_enquete, id_usuario, opcao):
+def votar(r, id_enquete, id_usuario, opcao, indexar_votantes=False, num_shards=None):
     """
     Registra o voto de um usuário em uma opção.
     Demonstra a atomicidade e o uso de SETs.
+    Com indexar_votantes=True também guarda o usuário no SET de votantes da opção.
+    Com num_shards, espalha votantes, contadores e placar em K chaves (enquetes virais).
     """
+    if num_shards:
+        if votar_redis_sharded(r, id_enquete, id_usuario, opcao, num_shards):
+            print(f"✅ Voto de '{id_usuario}' para a 'Opção {opcao}' registrado!")
+            return True
+        print(f"⚠️  Usuário '{id_usuario}' já votou nesta enquete.")
+        return False
+
     # 1. CAPACIDADE: Usar um SET para garantir que o usuário vote apenas uma vez.
     # O comando SADD retorna 1 se o item foi adicionado (primeiro voto)
     # e 0 se o item já existia (voto repetido).
@@ -30,72 +41,136 @@ def votar(r, id_enquete, id_usuario, opcao):
         # 3. CAPACIDADE: Usar ZINCRBY para atualizar o placar em tempo real.
         r.zincrby(f"enquete:{id_enquete}:placar", 1, f"Opção {opcao}")
 
+        # 4. (Opcional) Índice de votantes por opção, para responder "quem votou em X?"
+        if indexar_votantes:
+            r.sadd(f"enquete:{id_enquete}:opcao:{opcao}:votantes", id_usuario)
+
         print(f"✅ Voto de '{id_usuario}' para a 'Opção {opcao}' registrado! Total de votos para a opção: {votos}.")
         return True
     else:
         print(f"⚠️  Usuário '{id_usuario}' já votou nesta enquete.")
         return False
 
-def obter_resultados(r, id_enquete, opcoes):
+def obter_resultados(r, id_enquete, opcoes, num_shards=None):
     """
     Mostra os resultados atuais da enquete.
+    Com num_shards, soma os K contadores de cada opção em um único MGET.
     """
     print("\n--- Resultados Parciais ---")
+    if num_shards:
+        for opcao, votos in resultados_redis_sharded(r, id_enquete, opcoes, num_shards).items():
+            print(f"Opção {opcao}: {votos} votos")
+        return
     for opcao in opcoes:
         votos = r.get(f"enquete:{id_enquete}:opcao:{opcao}") or 0
         print(f"Opção {opcao}: {votos} votos")
 
-def mostrar_todos_os_dados(r):
+def mostrar_todos_os_dados(r, padrao='enquete:1:*', tamanho_lote=100):
     """
-    Lista todas as chaves do banco de dados, identifica o tipo de cada uma
+    Percorre as chaves do padrão com SCAN, identifica o tipo de cada uma
     e exibe seu conteúdo de forma apropriada.
     """
     print("\n" + "="*40)
     print("🔎 INSPECIONANDO TODOS OS DADOS NO REDIS 🔎")
     print("="*40)
 
-    # 1. Listar todas as chaves
-    # ATENÇÃO: KEYS * é OK para debug, mas NUNCA em produção. Use SCAN.
-    chaves = r.keys('enquete:1:*') # Vamos pegar apenas as chaves da nossa enquete
-
-    if not chaves:
-        print("Nenhuma chave encontrada no banco de dados com o padrão 'enquete:1:*'.")
+    # 1. SCAN percorre o keyspace aos poucos com um cursor, sem travar o servidor como o KEYS.
+    total = 0
+    lote = []
+    for chave in r.scan_iter(match=padrao, count=tamanho_lote):
+        lote.append(chave)
+        if len(lote) >= tamanho_lote:
+            _mostrar_lote_de_chaves(r, lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        _mostrar_lote_de_chaves(r, lote)
+        total += len(lote)
+
+    if not total:
+        print(f"Nenhuma chave encontrada no banco de dados com o padrão '{padrao}'.")
         return
 
-    print(f"Encontradas {len(chaves)} chaves.\n")
+    print(f"Encontradas {total} chaves.")
 
-    # 2. Iterar sobre cada chave para obter seu tipo e valor
-    for chave in sorted(chaves):
-        # Obtém o tipo da chave (string, set, zset, list, hash)
-        tipo = r.type(chave)
-        print(f"🔑 Chave: '{chave}'")
-        print(f"   🏷️ Tipo: {tipo}")
 
-        valor = None
-        # Usa o comando correto para buscar o valor com base no tipo
+def _mostrar_lote_de_chaves(r, chaves):
+    """Busca tipo e valor de um lote de chaves com dois pipelines (dois round trips no total)."""
+    chaves = sorted(chaves)
+
+    # 2. Um pipeline com o TYPE de todas as chaves do lote
+    pipe = r.pipeline(transaction=False)
+    for chave in chaves:
+        pipe.type(chave)
+    tipos = pipe.execute()
+
+    # 3. Outro pipeline com o comando de leitura adequado a cada tipo
+    pipe = r.pipeline(transaction=False)
+    for chave, tipo in zip(chaves, tipos):
         if tipo == 'string':
-            valor = r.get(chave)
+            pipe.get(chave)
         elif tipo == 'set':
-            valor = r.smembers(chave)
+            pipe.smembers(chave)
         elif tipo == 'zset':
             # zrange com 0 e -1 pega todos os elementos do Sorted Set
-            valor = r.zrange(chave, 0, -1, withscores=True)
+            pipe.zrange(chave, 0, -1, withscores=True)
         elif tipo == 'list':
-            valor = r.lrange(chave, 0, -1)
+            pipe.lrange(chave, 0, -1)
         elif tipo == 'hash':
-            valor = r.hgetall(chave)
+            pipe.hgetall(chave)
         else:
-            valor = "Tipo de dado não inspecionado neste script."
+            pipe.type(chave)  # Mantém o alinhamento entre chaves e respostas
+    valores = pipe.execute()
 
+    for chave, tipo, valor in zip(chaves, tipos, valores):
+        if tipo not in ('string', 'set', 'zset', 'list', 'hash'):
+            valor = "Tipo de dado não inspecionado neste script."
+        print(f"🔑 Chave: '{chave}'")
+        print(f"   🏷️ Tipo: {tipo}")
         print(f"   💾 Valor: {valor}\n")
 
-def mostrar_placar(r, id_enquete):
+
+def limpar_enquete(r, id_enquete, tamanho_lote=500):
+    """
+    Remove todas as chaves da enquete em lotes, usando SCAN + UNLINK.
+    UNLINK libera a memória em segundo plano, sem bloquear o servidor em SETs grandes.
+    """
+    removidas = 0
+    lote = []
+    for chave in r.scan_iter(match=f"enquete:{id_enquete}:*", count=tamanho_lote):
+        lote.append(chave)
+        if len(lote) >= tamanho_lote:
+            removidas += r.unlink(*lote)
+            lote = []
+    if lote:
+        removidas += r.unlink(*lote)
+    return removidas
+
+
+def analisar_votantes_por_opcao(r, id_enquete, opcao):
+    """
+    "Quem votou na opção X?" usando o índice criado por votar(..., indexar_votantes=True).
+    SSCAN entrega os membros aos poucos, mesmo que o SET tenha milhões de votantes.
+    """
+    print(f"\n--- Análise: Quem votou na 'Opção {opcao}'? ---")
+    encontrou = False
+    for votante in r.sscan_iter(f"enquete:{id_enquete}:opcao:{opcao}:votantes", count=1000):
+        encontrou = True
+        print(f"- {votante}")
+    if not encontrou:
+        print(f"Ninguém votou na 'Opção {opcao}' (ou o índice de votantes não está ativo).")
+
+def mostrar_placar(r, id_enquete, num_shards=None):
     """
     Mostra o placar ordenado.
+    Com num_shards, soma os K placares parciais (um pipeline com K ZRANGEs).
     """
-    # ZREVRANGEBYSCORE busca no Sorted Set, ordenando do maior score para o menor.
-    placar = r.zrevrange(f"enquete:{id_enquete}:placar", 0, -1, withscores=True)
     print("\n--- Placar em Tempo Real (Ranking) ---")
+    if num_shards:
+        placar = [(f"Opção {opcao}", votos) for opcao, votos in placar_redis_sharded(r, id_enquete, num_shards)]
+    else:
+        # ZREVRANGEBYSCORE busca no Sorted Set, ordenando do maior score para o menor.
+        placar = r.zrevrange(f"enquete:{id_enquete}:placar", 0, -1, withscores=True)
     if not placar:
         print("Nenhum voto registrado ainda.")
         return
@@ -105,32 +180,34 @@ def mostrar_placar(r, id_enquete):
 
 
 if __name__ == "__main__":
-    r = connect_redis()
+    # Latência e idas e voltas (medidas na conexão) de cada voto e leitura de placar (ver instrumentation.py)
+    from instrumentation import OPERACOES_PLACAR, instrumentacao
+    r = instrumentacao.medir_conexao(connect_redis())
+    votar = instrumentacao.instrumentar(votar)
+    instrumentacao.instrumentar_modulo(globals(), OPERACOES_PLACAR)
     # --- Simulação ---
     ID_ENQUETE = 1
     OPCOES = ["A", "B", "C"]
 
     # Limpando dados de uma execução anterior para começar do zero
     print("\n--- INICIANDO SIMULAÇÃO: Limpando dados antigos... ---")
-    chaves_para_limpar = r.keys(f"enquete:{ID_ENQUETE}:*")
-    if chaves_para_limpar:
-        r.delete(*chaves_para_limpar)
+    limpar_enquete(r, ID_ENQUETE)
 
     print("\n--- Realizando Votação ---")
-    from time import perf_counter_ns
-    start = perf_counter_ns()
-    votar(r, ID_ENQUETE, "user:101", "A")
-    votar(r, ID_ENQUETE, "user:102", "B")
-    votar(r, ID_ENQUETE, "user:103", "A")
-    votar(r, ID_ENQUETE, "user:101", "C") # Tentativa de voto duplicado
-    votar(r, ID_ENQUETE, "user:104", "C")
-    votar(r, ID_ENQUETE, "user:105", "A")
-    print(f"Tempo de execução dos votos: {(perf_counter_ns() - start)/1_000_000_000:03f} s")
-
-
+    votar(r, ID_ENQUETE, "user:101", "A", indexar_votantes=True)
+    votar(r, ID_ENQUETE, "user:102", "B", indexar_votantes=True)
+    votar(r, ID_ENQUETE, "user:103", "A", indexar_votantes=True)
+    votar(r, ID_ENQUETE, "user:101", "C", indexar_votantes=True) # Tentativa de voto duplicado
+    votar(r, ID_ENQUETE, "user:104", "C", indexar_votantes=True)
+    votar(r, ID_ENQUETE, "user:105", "A", indexar_votantes=True)
 
     # Mostrando os resultados
     obter_resultados(r, ID_ENQUETE, OPCOES)
     mostrar_placar(r, ID_ENQUETE)
 
-    mostrar_todos_os_dados(r)
\ No newline at end of file
+    # Com o índice de votantes por opção, o Redis também responde "quem votou em X?"
+    analisar_votantes_por_opcao(r, ID_ENQUETE, "A")
+
+    mostrar_todos_os_dados(r)
+
+    instrumentacao.imprimir_resumo()
@@ -0,0 +1,131 @@
+"""
+Cache read-through para as leituras de placar.
+
+Os painéis consultam o placar milhares de vezes por segundo; sem cache,
+cada consulta vai ao banco (GROUP BY no SQLite, agregação no MongoDB,
+ZREVRANGE no Redis). CachePlacar guarda o último placar de cada enquete:
+
+- TTL por enquete (com um padrão para as demais);
+- despejo LRU quando há mais enquetes do que 'max_enquetes';
+- ao aceitar um voto: invalida a entrada ou, com 'staleness_maxima',
+  apenas garante que ela não fique desatualizada por mais que esse tempo;
+- contadores de acertos/falhas para calibrar esses parâmetros.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from vote_store import VoteStore
+
+
+class CachePlacar:
+
+    def __init__(self, ttl=1.0, max_enquetes=10000, ttl_por_enquete=None, staleness_maxima=None):
+        self.ttl = ttl
+        self.ttl_por_enquete = dict(ttl_por_enquete or {})
+        self.max_enquetes = max_enquetes
+        self.staleness_maxima = staleness_maxima
+        self.entradas = OrderedDict()  # id_enquete -> (expira_em, placar); ordem = uso mais recente por último
+        # id_enquete -> número de votos registrados; se mudar durante um carregar(), o placar lido pode estar velho
+        self.geracoes = {}
+        self.trava = threading.Lock()
+        self.estatisticas = {"acertos": 0, "falhas": 0, "expirados": 0, "despejados": 0, "invalidados": 0}
+
+    def definir_ttl(self, id_enquete, ttl):
+        """TTL específico para uma enquete (ex.: mais curto para uma enquete ao vivo)."""
+        self.ttl_por_enquete[id_enquete] = ttl
+
+    def obter(self, id_enquete, carregar):
+        """Retorna o placar em cache ou chama carregar() e guarda o resultado."""
+        agora = time.monotonic()
+        with self.trava:
+            entrada = self.entradas.get(id_enquete)
+            if entrada is not None:
+                if entrada[0] > agora:
+                    self.entradas.move_to_end(id_enquete)
+                    self.estatisticas["acertos"] += 1
+                    return entrada[1]
+                del self.entradas[id_enquete]
+                self.estatisticas["expirados"] += 1
+            self.estatisticas["falhas"] += 1
+            geracao = self.geracoes.get(id_enquete, 0)
+
+        # Carrega fora da trava para não bloquear as leituras de outras enquetes
+        placar = carregar()
+        ttl = self.ttl_por_enquete.get(id_enquete, self.ttl)
+        with self.trava:
+            expira_em = time.monotonic() + ttl
+            if self.geracoes.get(id_enquete, 0) != geracao:
+                # Um voto chegou durante o carregamento: o placar pode não incluí-lo
+                if self.staleness_maxima is None:
+                    self.estatisticas["invalidados"] += 1
+                    return placar
+                expira_em = min(expira_em, agora + self.staleness_maxima)
+            self.entradas[id_enquete] = (expira_em, placar)
+            self.entradas.move_to_end(id_enquete)
+            while len(self.entradas) > self.max_enquetes:
+                self.entradas.popitem(last=False)
+                self.estatisticas["despejados"] += 1
+        return placar
+
+    def registrar_voto(self, id_enquete):
+        """
+        Chamado quando um voto é aceito. Sem 'staleness_maxima' a entrada é invalidada;
+        com ela, a entrada continua servindo por no máximo esse tempo.
+        """
+        with self.trava:
+            self.geracoes[id_enquete] = self.geracoes.get(id_enquete, 0) + 1
+            entrada = self.entradas.get(id_enquete)
+            if entrada is None:
+                return
+            if self.staleness_maxima is None:
+                del self.entradas[id_enquete]
+                self.estatisticas["invalidados"] += 1
+            else:
+                limite = time.monotonic() + self.staleness_maxima
+                if entrada[0] > limite:
+                    self.entradas[id_enquete] = (limite, entrada[1])
+
+    def taxa_acerto(self):
+        total = self.estatisticas["acertos"] + self.estatisticas["falhas"]
+        return self.estatisticas["acertos"] / total if total else 0.0
+
+
+class CachedVoteStore(VoteStore):
+    """VoteStore cujo obter_placar passa pelo CachePlacar e cujos votos aceitos avisam o cache."""
+
+    def __init__(self, store, cache=None):
+        self.store = store
+        self.cache = cache or CachePlacar()
+        self.nome = f"{store.nome} cache"
+
+    def preparar(self):
+        self.store.preparar()
+        with self.cache.trava:
+            self.cache.entradas.clear()
+
+    def votar(self, id_enquete, id_usuario, opcao):
+        aceito = self.store.votar(id_enquete, id_usuario, opcao)
+        if aceito:
+            self.cache.registrar_voto(id_enquete)
+        return aceito
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        votos = list(votos)
+        rejeitados = self.store.votar_em_lote(votos, tamanho_lote)
+        if len(rejeitados) < len(votos):
+            for id_enquete in {voto[0] for voto in votos}:
+                self.cache.registrar_voto(id_enquete)
+        return rejeitados
+
+    def obter_placar(self, id_enquete):
+        return self.cache.obter(id_enquete, lambda: self.store.obter_placar(id_enquete))
+
+    def votantes_por_opcao(self, id_enquete, opcao):
+        return self.store.votantes_por_opcao(id_enquete, opcao)
+
+    def ja_votou(self, id_enquete, id_usuario):
+        return self.store.ja_votou(id_enquete, id_usuario)
+
+    def fechar(self):
+        self.store.fechar()
@@ -4,13 +4,17 @@ import os
 DB_FILE = "enquete.db"
 
 
-def setup_database():
-    """Cria e/ou zera o banco de dados e as tabelas."""
+def setup_database(db_file=DB_FILE, compacto=False):
+    """
+    Cria e/ou zera o banco de dados e as tabelas.
+    Com compacto=True, 'votes' é uma tabela WITHOUT ROWID agrupada por (poll_id, user_id):
+    a própria chave primária garante o voto único, e cada voto grava uma B-tree a menos.
+    """
     # Apaga o arquivo do banco de dados se ele já existir, para começar do zero
-    if os.path.exists(DB_FILE):
-        os.remove(DB_FILE)
+    if os.path.exists(db_file):
+        os.remove(db_file)
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
 
     # Criar tabelas
@@ -37,6 +41,25 @@ def setup_database():
                        name TEXT NOT NULL UNIQUE
                    )
                    ''')
+    if compacto:
+        cursor.execute('''
+                       CREATE TABLE votes
+                       (
+                           poll_id   INTEGER NOT NULL,
+                           user_id   INTEGER NOT NULL,
+                           option_id INTEGER NOT NULL,
+                           FOREIGN KEY (user_id) REFERENCES users (id),
+                           FOREIGN KEY (poll_id) REFERENCES polls (id),
+                           FOREIGN KEY (option_id) REFERENCES options (id),
+                           -- A chave primária é o voto único: não há rowid nem índice UNIQUE separado
+                           PRIMARY KEY (poll_id, user_id)
+                       ) WITHOUT ROWID
+                       ''')
+        # Índice de cobertura do placar e dos votantes por opção (respondidos sem ler a tabela)
+        cursor.execute("CREATE INDEX idx_votes_opcao ON votes (poll_id, option_id, user_id)")
+        print("Banco de dados e tabelas criados com sucesso (votes WITHOUT ROWID).")
+        conn.commit()
+        return conn
     cursor.execute('''
                    CREATE TABLE votes
                    (
@@ -92,16 +115,95 @@ def votar_sql(conn, id_enquete, id_usuario, id_opcao):
         return False
 
 
-def obter_resultados_sql(conn, id_enquete):
-    """Mostra os resultados da enquete usando JOIN e GROUP BY."""
+# --- PLACAR MATERIALIZADO (option_tallies mantida por TRIGGERS) ---
+def criar_tallies_sql(conn):
+    """
+    Cria a tabela 'option_tallies' com a contagem de votos por opção e os
+    triggers que a mantêm atualizada a cada INSERT/DELETE/UPDATE em 'votes'.
+    Assim o placar lê uma linha por opção, em vez de agrupar a tabela de votos inteira.
+    Pode ser chamada em um banco já existente: as contagens são reconstruídas ao final.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+                   CREATE TABLE IF NOT EXISTS option_tallies
+                   (
+                       option_id  INTEGER PRIMARY KEY,
+                       vote_count INTEGER NOT NULL DEFAULT 0,
+                       FOREIGN KEY (option_id) REFERENCES options (id)
+                   )
+                   ''')
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS votes_tally_insert
+                       AFTER INSERT
+                       ON votes
+                   BEGIN
+                       INSERT INTO option_tallies (option_id, vote_count)
+                       VALUES (NEW.option_id, 1)
+                       ON CONFLICT (option_id) DO UPDATE SET vote_count = vote_count + 1;
+                   END
+                   ''')
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS votes_tally_delete
+                       AFTER DELETE
+                       ON votes
+                   BEGIN
+                       UPDATE option_tallies SET vote_count = vote_count - 1 WHERE option_id = OLD.option_id;
+                   END
+                   ''')
+    cursor.execute('''
+                   CREATE TRIGGER IF NOT EXISTS votes_tally_update
+                       AFTER UPDATE OF option_id
+                       ON votes
+                   BEGIN
+                       UPDATE option_tallies SET vote_count = vote_count - 1 WHERE option_id = OLD.option_id;
+                       INSERT INTO option_tallies (option_id, vote_count)
+                       VALUES (NEW.option_id, 1)
+                       ON CONFLICT (option_id) DO UPDATE SET vote_count = vote_count + 1;
+                   END
+                   ''')
+    conn.commit()
+    reconstruir_tallies_sql(conn)
+
+
+def reconstruir_tallies_sql(conn):
+    """Recalcula 'option_tallies' a partir de 'votes' (ex.: banco criado antes dos triggers)."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM option_tallies")
+    cursor.execute('''
+                   INSERT INTO option_tallies (option_id, vote_count)
+                   SELECT option_id, COUNT(*)
+                   FROM votes
+                   GROUP BY option_id
+                   ''')
+    conn.commit()
+
+
+# Placar lendo a tabela materializada: custo proporcional ao número de opções
+QUERY_PLACAR_TALLIES = '''
+            SELECT o.option_text, \
+                   COALESCE(t.vote_count, 0) as vote_count
+            FROM options o \
+                     LEFT JOIN \
+                 option_tallies t ON o.id = t.option_id
+            WHERE o.poll_id = ?
+            '''
+
+
+def obter_resultados_sql(conn, id_enquete, usar_tallies=False):
+    """Mostra os resultados da enquete usando JOIN e GROUP BY (ou a tabela option_tallies)."""
     print("\n--- Resultados Parciais (SQL) ---")
     cursor = conn.cursor()
+    if usar_tallies:
+        cursor.execute(QUERY_PLACAR_TALLIES + "ORDER BY o.option_text;", (id_enquete,))
+        for row in cursor.fetchall():
+            print(f"Opção {row[0]}: {row[1]} votos")
+        return
     query = '''
             SELECT o.option_text, \
-                   COUNT(v.id) as vote_count
+                   COUNT(v.user_id) as vote_count
             FROM options o \
                      LEFT JOIN \
-                 votes v ON o.id = v.option_id
+                 votes v ON v.poll_id = o.poll_id AND v.option_id = o.id
             WHERE o.poll_id = ?
             GROUP BY o.option_text
             ORDER BY o.option_text; \
@@ -111,22 +213,30 @@ def obter_resultados_sql(conn, id_enquete):
         print(f"Opção {row[0]}: {row[1]} votos")
 
 
-def mostrar_placar_sql(conn, id_enquete):
-    """Mostra o placar ordenado do maior para o menor."""
-    print("\n--- Placar em Tempo Real (Ranking SQL) ---")
+def consultar_placar_sql(conn, id_enquete, usar_tallies=False):
+    """Retorna [(opcao, votos), ...] do maior para o menor, sem imprimir."""
     cursor = conn.cursor()
+    if usar_tallies:
+        cursor.execute(QUERY_PLACAR_TALLIES + "ORDER BY vote_count DESC;", (id_enquete,))
+        return cursor.fetchall()
     query = '''
             SELECT o.option_text, \
-                   COUNT(v.id) as vote_count
+                   COUNT(v.user_id) as vote_count
             FROM options o \
                      LEFT JOIN \
-                 votes v ON o.id = v.option_id
+                 votes v ON v.poll_id = o.poll_id AND v.option_id = o.id
             WHERE o.poll_id = ?
             GROUP BY o.option_text
             ORDER BY vote_count DESC; \
             '''
     cursor.execute(query, (id_enquete,))
-    placar = cursor.fetchall()
+    return cursor.fetchall()
+
+
+def mostrar_placar_sql(conn, id_enquete, usar_tallies=False):
+    """Mostra o placar ordenado do maior para o menor."""
+    print("\n--- Placar em Tempo Real (Ranking SQL) ---")
+    placar = consultar_placar_sql(conn, id_enquete, usar_tallies)
 
     if not any(row[1] > 0 for row in placar):
         print("Nenhum voto registrado ainda.")
@@ -137,25 +247,37 @@ def mostrar_placar_sql(conn, id_enquete):
 
 
 # --- DEMONSTRANDO O PODER DO SQL (A LIMITAÇÃO DO REDIS) ---
-def analisar_votantes_por_opcao_sql(conn, id_enquete, texto_opcao):
-    """
-    Responde à pergunta que era difícil no Redis:
-    "Quais são os nomes de todos que votaram em uma opção específica?"
-    """
-    print(f"\n--- Análise: Quem votou na 'Opção {texto_opcao}'? ---")
+def consultar_votantes_sql(conn, id_enquete, texto_opcao):
+    """Retorna [(nome,), ...] de quem votou na opção 'texto_opcao' da enquete, sem imprimir."""
     cursor = conn.cursor()
     query = '''
             SELECT u.name
-            FROM users u \
+            FROM options o \
                      JOIN \
-                 votes v ON u.id = v.user_id \
+                 votes v ON v.poll_id = o.poll_id AND v.option_id = o.id \
                      JOIN \
-                 options o ON v.option_id = o.id
+                 users u ON u.id = v.user_id
             WHERE o.poll_id = ? \
               AND o.option_text = ?; \
             '''
     cursor.execute(query, (id_enquete, texto_opcao))
-    votantes = cursor.fetchall()
+    return cursor.fetchall()
+
+
+def consultar_voto_sql(conn, id_enquete, id_usuario):
+    """Retorna o option_id em que o usuário votou na enquete, ou None."""
+    linha = conn.execute("SELECT option_id FROM votes WHERE poll_id = ? AND user_id = ?",
+                         (id_enquete, id_usuario)).fetchone()
+    return linha[0] if linha else None
+
+
+def analisar_votantes_por_opcao_sql(conn, id_enquete, texto_opcao):
+    """
+    Responde à pergunta que era difícil no Redis:
+    "Quais são os nomes de todos que votaram em uma opção específica?"
+    """
+    print(f"\n--- Análise: Quem votou na 'Opção {texto_opcao}'? ---")
+    votantes = consultar_votantes_sql(conn, id_enquete, texto_opcao)
     if not votantes:
         print(f"Ninguém votou na 'Opção {texto_opcao}'.")
         return
@@ -166,30 +288,54 @@ def analisar_votantes_por_opcao_sql(conn, id_enquete, texto_opcao):
 
 # --- Simulação ---
 if __name__ == "__main__":
-    conn = setup_database()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exemplo de enquete em SQLite.")
+    parser.add_argument("--tallies", action="store_true",
+                        help="mantém o placar materializado em 'option_tallies' via triggers")
+    parser.add_argument("--compacto", action="store_true",
+                        help="tabela 'votes' WITHOUT ROWID agrupada por (poll_id, user_id)")
+    parser.add_argument("--reconstruir-tallies", metavar="ARQUIVO_DB",
+                        help="cria/reconstrói 'option_tallies' em um banco existente e sai")
+    args = parser.parse_args()
+
+    if args.reconstruir_tallies:
+        conn = sqlite3.connect(args.reconstruir_tallies)
+        criar_tallies_sql(conn)
+        total = conn.execute("SELECT COALESCE(SUM(vote_count), 0) FROM option_tallies").fetchone()[0]
+        print(f"option_tallies reconstruída em '{args.reconstruir_tallies}' ({total} votos).")
+        conn.close()
+        raise SystemExit
+
+    conn = setup_database(compacto=args.compacto)
     seed_data(conn)
+    if args.tallies:
+        criar_tallies_sql(conn)
 
     print("\n--- Realizando Votação (SQL) ---")
     # Opção A tem id=1, B id=2, C id=3
 
-    from time import perf_counter_ns
-    start = perf_counter_ns()
+    # Latência, comandos e linhas de cada voto e de cada placar (ver instrumentation.py)
+    from instrumentation import OPERACOES_PLACAR, OPERACOES_VOTO, instrumentacao
+    instrumentacao.medir_conexao(conn)
+    instrumentacao.instrumentar_modulo(globals(), {**OPERACOES_VOTO, **OPERACOES_PLACAR})
+
     votar_sql(conn, 1, 101, 1)  # User 101 vota na A
     votar_sql(conn, 1, 102, 2)  # User 102 vota na B
     votar_sql(conn, 1, 103, 1)  # User 103 vota na A
     votar_sql(conn, 1, 101, 3)  # User 101 tenta votar de novo (na C) -> FALHA
     votar_sql(conn, 1, 104, 3)  # User 104 vota na C
     votar_sql(conn, 1, 105, 1)  # User 105 vota na A
-    # print time
-    print(f"Tempo de execução dos votos: {(perf_counter_ns()-start)/1_000_000_000:03f} s")
 
     # Mostrando os resultados
-    obter_resultados_sql(conn, 1)
-    mostrar_placar_sql(conn, 1)
+    obter_resultados_sql(conn, 1, usar_tallies=args.tallies)
+    mostrar_placar_sql(conn, 1, usar_tallies=args.tallies)
 
     # Mostrando a força do SQL onde o Redis era fraco
     analisar_votantes_por_opcao_sql(conn, 1, "A")
     analisar_votantes_por_opcao_sql(conn, 1, "B")
 
+    instrumentacao.imprimir_resumo()
+
     conn.close()
     print("\nConexão com o banco de dados fechada.")
@@ -0,0 +1,44 @@
+import json
+import sqlite3
+
+from vote_ingest import ingerir_arquivo, validar_votos
+from vote_store import SQLiteVoteStore
+
+REGISTROS_INVALIDOS = [
+    {"poll_id": [1], "user_id": 1, "option_id": "A"},
+    {"poll_id": {"id": 1}, "user_id": 2, "option_id": "A"},
+    {"poll_id": True, "user_id": 3, "option_id": "A"},
+    {"poll_id": 1.7, "user_id": 4, "option_id": "A"},
+    {"poll_id": 1, "user_id": True, "option_id": "A"},
+    {"poll_id": 1, "user_id": 2.5, "option_id": "A"},
+    {"poll_id": 1, "user_id": [5], "option_id": "A"},
+    {"poll_id": 1, "user_id": 6, "option_id": {"x": 1}},
+    {"poll_id": 1, "user_id": 7, "option_id": False},
+    {"poll_id": "abc", "user_id": 8, "option_id": "A"},
+    {"poll_id": 1, "user_id": None, "option_id": "A"},
+    ["não", "é", "objeto"],
+    None,
+]
+
+
+def test_validar_votos_conta_registros_invalidos():
+    contadores = {"invalidos": 0}
+    validos = [{"poll_id": 1, "user_id": "user:9", "option_id": "B"},
+               {"poll_id": 2.0, "user_id": " 10 ", "option_id": 3}]
+    votos = list(validar_votos(REGISTROS_INVALIDOS + validos, contadores))
+    assert votos == [(1, "user:9", "B"), (2, 10, "3")]
+    assert contadores["invalidos"] == len(REGISTROS_INVALIDOS)
+
+
+def test_ingerir_arquivo_nao_para_em_linha_invalida(tmp_path):
+    caminho = tmp_path / "votos.jsonl"
+    linhas = [json.dumps(registro) for registro in REGISTROS_INVALIDOS]
+    linhas += ["{ilegível", json.dumps({"poll_id": 1, "user_id": 11, "option_id": "A"})]
+    caminho.write_text("\n".join(linhas) + "\n", encoding="utf-8")
+
+    store = SQLiteVoteStore(sqlite3.connect(":memory:"))
+    store.preparar()
+    resumo = ingerir_arquivo(str(caminho), store, tamanho_lote=2)
+    assert resumo["aceitos"] == 1
+    assert resumo["invalidos"] == len(REGISTROS_INVALIDOS) + 1
+    assert store.obter_placar(1) == [("A", 1)]
@@ -0,0 +1,207 @@
+"""
+Ingestão de arquivos de votos (CSV ou JSONL) maiores que a memória.
+
+O arquivo é lido preguiçosamente, linha a linha, por geradores; os votos
+válidos são agrupados em lotes e gravados com VoteStore.votar_em_lote.
+Uma thread leitora coloca os lotes em uma fila limitada: se o backend for
+mais lento que a leitura, a fila enche e a leitora espera (backpressure).
+A memória fica limitada a cerca de tamanho_lote * (lotes_em_voo + 2) votos,
+qualquer que seja o tamanho do arquivo.
+
+Formato esperado (uma linha por voto):
+    CSV:   poll_id,user_id,option_id
+    JSONL: {"poll_id": 1, "user_id": 101, "option_id": "A"}
+Arquivos terminados em .gz são descompactados durante a leitura.
+"""
+import argparse
+import csv
+import gzip
+import json
+import queue
+import threading
+import time
+
+from vote_store import BACKENDS, criar_store, em_lotes
+
+CAMPOS = ("poll_id", "user_id", "option_id")
+
+
+def _abrir_texto(caminho):
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rt", encoding="utf-8", newline="")
+    return open(caminho, "r", encoding="utf-8", newline="")
+
+
+def ler_votos_csv(caminho):
+    """Gera um dicionário por linha do CSV (o cabeçalho define os nomes das colunas)."""
+    with _abrir_texto(caminho) as arquivo:
+        yield from csv.DictReader(arquivo)
+
+
+def ler_votos_jsonl(caminho):
+    """Gera um dicionário por linha do JSONL; linhas vazias são ignoradas e linhas inválidas viram None."""
+    with _abrir_texto(caminho) as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                yield None
+
+
+def ler_votos(caminho):
+    """Escolhe o leitor pela extensão do arquivo (.csv ou .jsonl/.ndjson, com ou sem .gz)."""
+    nome = caminho[:-3] if caminho.endswith(".gz") else caminho
+    if nome.endswith(".csv"):
+        return ler_votos_csv(caminho)
+    if nome.endswith((".jsonl", ".ndjson")):
+        return ler_votos_jsonl(caminho)
+    raise ValueError(f"Formato de arquivo não suportado: {caminho!r} (use .csv ou .jsonl)")
+
+
+def _escalar(valor):
+    # JSON true/false, listas e objetos não são ids nem opções (bool é subclasse de int)
+    if isinstance(valor, bool) or not isinstance(valor, (str, int, float)):
+        raise TypeError(f"valor não escalar: {valor!r}")
+    if isinstance(valor, float) and not valor.is_integer():
+        raise ValueError(f"número não inteiro: {valor!r}")
+    return int(valor) if isinstance(valor, float) else valor
+
+
+def _id_usuario(valor):
+    # Ids numéricos viram int (como no benchmark); os demais ("user:101") ficam como texto
+    valor = _escalar(valor)
+    if isinstance(valor, int):
+        return valor
+    valor = valor.strip()
+    return int(valor) if valor.isdigit() else valor
+
+
+def validar_votos(registros, contadores):
+    """
+    Converte cada registro em (id_enquete, id_usuario, opcao).
+    Registros inválidos são descartados e contados em contadores["invalidos"]:
+    linhas ilegíveis, campos ausentes, nulos (JSON null, linha CSV curta) ou vazios,
+    booleanos, listas/objetos e números não inteiros.
+    """
+    for registro in registros:
+        if not isinstance(registro, dict) or any(
+                registro.get(campo) is None or str(registro[campo]).strip() == "" for campo in CAMPOS):
+            contadores["invalidos"] += 1
+            continue
+        try:
+            id_enquete = int(_escalar(registro["poll_id"]))
+            id_usuario = _id_usuario(registro["user_id"])
+            opcao = str(_escalar(registro["option_id"])).strip()
+        except (TypeError, ValueError):
+            contadores["invalidos"] += 1
+            continue
+        yield id_enquete, id_usuario, opcao
+
+
+def ingerir_arquivo(caminho, store, tamanho_lote=1000, lotes_em_voo=4, intervalo_progresso=5.0):
+    """
+    Lê 'caminho' e grava os votos em 'store' (um VoteStore), lote a lote.
+    Imprime o progresso a cada 'intervalo_progresso' segundos e retorna um resumo.
+    """
+    contadores = {"invalidos": 0}
+    fila = queue.Queue(maxsize=lotes_em_voo)
+    FIM = object()
+    erro_leitura = []
+    parar = threading.Event()  # sinalizado se a gravação falhar: ninguém mais esvazia a fila
+
+    def enfileirar(item):
+        # Bloqueia enquanto a fila estiver cheia (backpressure), mas desiste se a gravação parou
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produtor():
+        try:
+            for lote in em_lotes(validar_votos(ler_votos(caminho), contadores), tamanho_lote):
+                if not enfileirar(lote):
+                    return
+        except Exception as e:
+            erro_leitura.append(e)
+        finally:
+            enfileirar(FIM)
+
+    leitora = threading.Thread(target=produtor, name="leitora-votos", daemon=True)
+    leitora.start()
+
+    aceitos = rejeitados = 0
+    inicio = ultimo_progresso = time.perf_counter()
+    try:
+        while True:
+            lote = fila.get()
+            if lote is FIM:
+                break
+            duplicados = len(store.votar_em_lote(lote, tamanho_lote))
+            rejeitados += duplicados
+            aceitos += len(lote) - duplicados
+
+            agora = time.perf_counter()
+            if agora - ultimo_progresso >= intervalo_progresso:
+                processados = aceitos + rejeitados
+                print(f"[progresso] {processados:,} votos | {processados / (agora - inicio):,.0f} votos/s | "
+                      f"{rejeitados:,} duplicados | {contadores['invalidos']:,} inválidos")
+                ultimo_progresso = agora
+    finally:
+        # Em caso de erro do backend, libera a leitora bloqueada na fila antes de propagar a exceção
+        parar.set()
+        leitora.join()
+    if erro_leitura:
+        raise erro_leitura[0]
+
+    duracao = time.perf_counter() - inicio
+    return {
+        "aceitos": aceitos,
+        "duplicados": rejeitados,
+        "invalidos": contadores["invalidos"],
+        "segundos": duracao,
+        "votos_por_segundo": (aceitos + rejeitados) / duracao if duracao else float("inf"),
+    }
+
+
+def gerar_arquivo_votos(caminho, num_votos, id_enquete=1, opcoes=("A", "B", "C")):
+    """Gera um arquivo de votos sintético (CSV ou JSONL, pela extensão) sem montá-lo em memória."""
+    abrir = gzip.open if caminho.endswith(".gz") else open
+    nome = caminho[:-3] if caminho.endswith(".gz") else caminho
+    with abrir(caminho, "wt", encoding="utf-8", newline="") as arquivo:
+        if nome.endswith(".csv"):
+            escritor = csv.writer(arquivo)
+            escritor.writerow(CAMPOS)
+            for i in range(num_votos):
+                escritor.writerow((id_enquete, i, opcoes[i % len(opcoes)]))
+        else:
+            for i in range(num_votos):
+                arquivo.write(json.dumps({"poll_id": id_enquete, "user_id": i,
+                                          "option_id": opcoes[i % len(opcoes)]}) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão de arquivos de votos (CSV/JSONL) em um VoteStore.")
+    parser.add_argument("arquivo", help="arquivo .csv ou .jsonl (opcionalmente .gz)")
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--lote", type=int, default=1000, help="votos por lote")
+    parser.add_argument("--lotes-em-voo", type=int, default=4, help="lotes lidos à frente do backend")
+    parser.add_argument("--offline", action="store_true",
+                        help="usa SQLite em memória, fakeredis e mongomock (sem Docker)")
+    parser.add_argument("--gerar", type=int, metavar="N", help="antes de ingerir, gera um arquivo com N votos")
+    args = parser.parse_args()
+
+    if args.gerar:
+        gerar_arquivo_votos(args.arquivo, args.gerar)
+
+    store = criar_store(args.backend, offline=args.offline)
+    store.preparar()
+    resumo = ingerir_arquivo(args.arquivo, store, args.lote, args.lotes_em_voo)
+    store.fechar()
+    print(f"{store.nome}: {resumo['aceitos']:,} aceitos, {resumo['duplicados']:,} duplicados, "
+          f"{resumo['invalidos']:,} inválidos em {resumo['segundos']:.2f} s "
+          f"({resumo['votos_por_segundo']:,.0f} votos/s)")
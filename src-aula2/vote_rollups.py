@@ -0,0 +1,255 @@
+"""
+Votos com instante e séries temporais pré-agregadas (rollups por minuto e por hora).
+
+Sem o instante do voto não dá para responder "votos por minuto na opção A na
+última hora"; com ele, mas sem agregação, a resposta varre todos os votos do
+intervalo. Aqui cada voto aceito também incrementa um balde por granularidade
+(GRANULARIDADES), e serie_temporal lê só os baldes do intervalo: o custo cresce
+com o número de baldes, não com o número de votos.
+
+- SQLite: coluna voted_at em 'votes' e tabela 'vote_buckets' mantida por
+  triggers, portanto na mesma transação do INSERT do voto (um voto duplicado
+  desfeito não deixa rastro nos baldes);
+- Redis: um HASH por balde (campo = opção) com EXPIREAT no fim da retenção;
+- MongoDB: um documento por (enquete, granularidade, início do balde) com o
+  total de cada opção, atualizado com $inc.
+
+Um voto é (id_enquete, id_usuario, opcao[, instante]); o instante é em segundos
+desde a época (time.time()) e, se omitido, é o momento da gravação.
+"""
+import time
+from collections import Counter
+
+from pymongo.errors import DuplicateKeyError
+
+from vote_store import (MongoVoteStore, RedisVoteStore, SQLiteVoteStore, campo_opcao_mongo, criar_store,
+                        documento_voto_mongo, em_lotes, incrementar_tallies_mongo, inserir_sql_em_lote)
+
+# Tamanho do balde em segundos
+GRANULARIDADES = {"minuto": 60, "hora": 3600}
+
+# Por quanto tempo o Redis guarda cada balde depois do seu início
+RETENCAO_REDIS = {"minuto": 2 * 24 * 3600, "hora": 90 * 24 * 3600}
+
+
+def instante_do_voto(voto):
+    """Instante (segundos inteiros) de um voto, ou o momento atual se ele não tiver um."""
+    return int(voto[3]) if len(voto) > 3 and voto[3] is not None else int(time.time())
+
+
+def inicio_do_balde(instante, granularidade):
+    segundos = GRANULARIDADES[granularidade]
+    return int(instante) // segundos * segundos
+
+
+def baldes_do_intervalo(inicio, fim, granularidade):
+    """Inícios dos baldes que cobrem [inicio, fim)."""
+    return range(inicio_do_balde(inicio, granularidade), int(fim), GRANULARIDADES[granularidade])
+
+
+def contar_por_balde(votos):
+    """{(id_enquete, granularidade, inicio_balde): {opcao: votos}} dos votos aceitos."""
+    contagens = {}
+    for voto in votos:
+        instante = instante_do_voto(voto)
+        for granularidade in GRANULARIDADES:
+            balde = contagens.setdefault((voto[0], granularidade, inicio_do_balde(instante, granularidade)), {})
+            balde[voto[2]] = balde.get(voto[2], 0) + 1
+    return contagens
+
+
+def votos_aceitos(lote, rejeitados):
+    """Votos do lote que não estão em 'rejeitados' (respeitando repetições)."""
+    restantes = Counter(rejeitados)
+    aceitos = []
+    for voto in lote:
+        if restantes[voto]:
+            restantes[voto] -= 1
+        else:
+            aceitos.append(voto)
+    return aceitos
+
+
+def preencher_serie(contagens, inicio, fim, granularidade):
+    """[(inicio_balde, votos), ...] para todo o intervalo, com zero nos baldes sem votos."""
+    return [(balde, contagens.get(balde, 0)) for balde in baldes_do_intervalo(inicio, fim, granularidade)]
+
+
+class SQLiteVoteStoreTemporal(SQLiteVoteStore):
+    """
+    SQLiteVoteStore com a coluna voted_at e a tabela 'vote_buckets' (chave: enquete,
+    opção, granularidade e início do balde), atualizada por triggers como option_tallies
+    em sqlite_example.py.
+    """
+
+    def __init__(self, conn, compacto=False):
+        super().__init__(conn, compacto)
+        self.nome = f"{self.nome} temporal"
+
+    def preparar(self):
+        super().preparar()
+        cursor = self.conn.cursor()
+        cursor.execute("ALTER TABLE votes ADD COLUMN voted_at INTEGER NOT NULL DEFAULT 0")
+        cursor.execute("DROP TABLE IF EXISTS vote_buckets")
+        cursor.execute('''
+                       CREATE TABLE vote_buckets
+                       (
+                           poll_id       INTEGER NOT NULL,
+                           option_id     TEXT    NOT NULL,
+                           granularidade INTEGER NOT NULL,
+                           bucket_start  INTEGER NOT NULL,
+                           vote_count    INTEGER NOT NULL,
+                           PRIMARY KEY (poll_id, option_id, granularidade, bucket_start)
+                       ) WITHOUT ROWID
+                       ''')
+        incrementos = "\n".join(f'''
+                           INSERT INTO vote_buckets (poll_id, option_id, granularidade, bucket_start, vote_count)
+                           VALUES (NEW.poll_id, NEW.option_id, {segundos}, NEW.voted_at / {segundos} * {segundos}, 1)
+                           ON CONFLICT (poll_id, option_id, granularidade, bucket_start)
+                               DO UPDATE SET vote_count = vote_count + 1;'''
+                                for segundos in GRANULARIDADES.values())
+        cursor.execute(f'''
+                       CREATE TRIGGER votes_buckets_insert
+                           AFTER INSERT
+                           ON votes
+                       BEGIN
+                           {incrementos}
+                       END
+                       ''')
+        self.conn.commit()
+
+    def votar(self, id_enquete, id_usuario, opcao, instante=None):
+        return not self.votar_em_lote([(id_enquete, id_usuario, opcao, instante)])
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        return inserir_sql_em_lote(
+            self.conn,
+            "INSERT INTO votes (user_id, poll_id, option_id, voted_at) VALUES (?, ?, ?, ?)",
+            votos,
+            lambda voto: (voto[1], voto[0], voto[2], instante_do_voto(voto)),
+            tamanho_lote,
+        )
+
+    def serie_temporal(self, id_enquete, opcao, inicio, fim, granularidade="minuto"):
+        """Votos em 'opcao' por balde em [inicio, fim): uma busca por intervalo na chave primária."""
+        cursor = self.conn.execute(
+            "SELECT bucket_start, vote_count FROM vote_buckets "
+            "WHERE poll_id = ? AND option_id = ? AND granularidade = ? AND bucket_start >= ? AND bucket_start < ?",
+            (id_enquete, opcao, GRANULARIDADES[granularidade], inicio_do_balde(inicio, granularidade), fim)
+        )
+        return preencher_serie(dict(cursor.fetchall()), inicio, fim, granularidade)
+
+
+def chave_balde_redis(id_enquete, granularidade, inicio_balde):
+    return f"enquete:{id_enquete}:serie:{granularidade}:{inicio_balde}"
+
+
+class RedisVoteStoreTemporal(RedisVoteStore):
+    """
+    RedisVoteStore que, depois de deduplicar, soma cada voto aceito no HASH do seu
+    balde (um HINCRBY por opção e balde do lote, no mesmo pipeline dos EXPIREAT).
+    """
+
+    def __init__(self, r, **opcoes):
+        super().__init__(r, **opcoes)
+        self.nome = f"{self.nome} temporal"
+
+    def votar(self, id_enquete, id_usuario, opcao, instante=None):
+        if not super().votar(id_enquete, id_usuario, opcao):
+            return False
+        self.incrementar_baldes(contar_por_balde([(id_enquete, id_usuario, opcao, instante)]))
+        return True
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        rejeitados = []
+        for lote in em_lotes(votos, tamanho_lote):
+            rejeitados_lote = super().votar_em_lote(lote, tamanho_lote)
+            self.incrementar_baldes(contar_por_balde(votos_aceitos(lote, rejeitados_lote)))
+            rejeitados.extend(rejeitados_lote)
+        return rejeitados
+
+    def incrementar_baldes(self, contagens):
+        if not contagens:
+            return
+        pipe = self.r.pipeline(transaction=False)
+        for (id_enquete, granularidade, inicio_balde), opcoes in contagens.items():
+            chave = chave_balde_redis(id_enquete, granularidade, inicio_balde)
+            for opcao, quantidade in opcoes.items():
+                pipe.hincrby(chave, opcao, quantidade)
+            pipe.expireat(chave, inicio_balde + RETENCAO_REDIS[granularidade])
+        pipe.execute()
+
+    def serie_temporal(self, id_enquete, opcao, inicio, fim, granularidade="minuto"):
+        """Votos em 'opcao' por balde em [inicio, fim): um HGET por balde, num único pipeline."""
+        baldes = baldes_do_intervalo(inicio, fim, granularidade)
+        pipe = self.r.pipeline(transaction=False)
+        for inicio_balde in baldes:
+            pipe.hget(chave_balde_redis(id_enquete, granularidade, inicio_balde), opcao)
+        return [(inicio_balde, int(votos or 0)) for inicio_balde, votos in zip(baldes, pipe.execute())]
+
+
+class MongoVoteStoreTemporal(MongoVoteStore):
+    """
+    MongoVoteStore com o campo voted_at nos votos e a coleção de baldes
+    {"poll_id", "granularidade", "inicio", "opcoes": {"A": 3, ...}} (opções codificadas por campo_opcao_mongo),
+    com índice único (poll_id, granularidade, inicio).
+    """
+
+    def __init__(self, colecao, colecao_baldes, colecao_tallies=None):
+        super().__init__(colecao, colecao_tallies)
+        self.colecao_baldes = colecao_baldes
+        self.nome = f"{self.nome} temporal"
+
+    def preparar(self):
+        super().preparar()
+        self.colecao_baldes.delete_many({})
+        self.colecao_baldes.drop_indexes()
+        self.colecao_baldes.create_index([("poll_id", 1), ("granularidade", 1), ("inicio", 1)], unique=True)
+
+    def votar(self, id_enquete, id_usuario, opcao, instante=None):
+        instante = instante_do_voto((id_enquete, id_usuario, opcao, instante))
+        try:
+            self.colecao.insert_one(documento_voto_mongo((id_enquete, id_usuario, opcao, instante)))
+        except DuplicateKeyError:
+            return False
+        if self.colecao_tallies is not None:
+            incrementar_tallies_mongo(self.colecao_tallies, {(id_enquete, opcao): 1})
+        self.incrementar_baldes(contar_por_balde([(id_enquete, id_usuario, opcao, instante)]))
+        return True
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        rejeitados = []
+        for lote in em_lotes(votos, tamanho_lote):
+            # Fixa o instante dos votos sem um, para o voto e o balde concordarem
+            lote = [(*voto[:3], instante_do_voto(voto)) for voto in lote]
+            rejeitados_lote = super().votar_em_lote(lote, tamanho_lote)
+            self.incrementar_baldes(contar_por_balde(votos_aceitos(lote, rejeitados_lote)))
+            rejeitados.extend(rejeitados_lote)
+        return rejeitados
+
+    def incrementar_baldes(self, contagens):
+        """Um update por documento de balde: as opções do lote vão num único $inc."""
+        for (id_enquete, granularidade, inicio_balde), opcoes in contagens.items():
+            self.colecao_baldes.update_one(
+                {"poll_id": id_enquete, "granularidade": granularidade, "inicio": inicio_balde},
+                {"$inc": {f"opcoes.{campo_opcao_mongo(opcao)}": quantidade for opcao, quantidade in opcoes.items()}},
+                upsert=True)
+
+    def serie_temporal(self, id_enquete, opcao, inicio, fim, granularidade="minuto"):
+        """Votos em 'opcao' por balde em [inicio, fim): uma busca por intervalo no índice dos baldes."""
+        cursor = self.colecao_baldes.find(
+            {"poll_id": id_enquete, "granularidade": granularidade,
+             "inicio": {"$gte": inicio_do_balde(inicio, granularidade), "$lt": fim}},
+            {"inicio": 1, f"opcoes.{campo_opcao_mongo(opcao)}": 1})
+        contagens = {doc["inicio"]: doc.get("opcoes", {}).get(campo_opcao_mongo(opcao), 0) for doc in cursor}
+        return preencher_serie(contagens, inicio, fim, granularidade)
+
+
+def criar_store_temporal(backend, offline=False):
+    """Como criar_store (mesmas conexões e backends), com votos datados e rollups por balde."""
+    store = criar_store(backend, offline)
+    if isinstance(store, SQLiteVoteStore):
+        return SQLiteVoteStoreTemporal(store.conn, store.compacto)
+    if isinstance(store, RedisVoteStore):
+        return RedisVoteStoreTemporal(store.r, atomico=store.atomico)
+    return MongoVoteStoreTemporal(store.colecao, store.colecao.database["vote_buckets"], store.colecao_tallies)
@@ -0,0 +1,784 @@
+"""
+Interface única para armazenar votos (VoteStore) e suas implementações
+para SQLite, Redis e MongoDB.
+
+Cada backend oferece as mesmas operações: votar, votar em lote, obter o
+placar e listar os votantes de uma opção. Assim o benchmark consegue
+exercitar qualquer um deles da mesma forma.
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+import zlib
+from urllib.parse import unquote
+from abc import ABC, abstractmethod
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from redis.exceptions import ResponseError
+
+# Código de erro do MongoDB para violação de índice único
+CODIGO_CHAVE_DUPLICADA = 11000
+
+
+def em_lotes(itens, tamanho_lote):
+    """Agrupa um iterável (possivelmente preguiçoso) em listas de até 'tamanho_lote' itens."""
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho_lote:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def inserir_sql_em_lote(conn, sql, votos, para_linha, tamanho_lote=10000):
+    """
+    Executa 'sql' com executemany para cada lote de votos, uma transação por lote.
+    'para_linha' converte um voto nos parâmetros do INSERT.
+    Retorna a lista de votos rejeitados por restrições UNIQUE.
+
+    O lote é gravado dentro de um SAVEPOINT: se algum voto violar a restrição,
+    o lote é desfeito e reinserido voto a voto (ainda na mesma transação),
+    para sabermos exatamente quais votos eram duplicados.
+    """
+    rejeitados = []
+    cursor = conn.cursor()
+    for lote in em_lotes(votos, tamanho_lote):
+        cursor.execute("SAVEPOINT lote_votos")
+        try:
+            cursor.executemany(sql, [para_linha(voto) for voto in lote])
+        except sqlite3.IntegrityError:
+            cursor.execute("ROLLBACK TO lote_votos")
+            for voto in lote:
+                try:
+                    cursor.execute(sql, para_linha(voto))
+                except sqlite3.IntegrityError:
+                    rejeitados.append(voto)
+        # Liberar o SAVEPOINT mais externo efetiva (COMMIT) a transação do lote
+        cursor.execute("RELEASE lote_votos")
+    conn.commit()
+    return rejeitados
+
+
+class VoteStore(ABC):
+    """
+    Contrato comum dos backends de votação.
+    Um voto é sempre a tupla (id_enquete, id_usuario, opcao).
+    """
+
+    nome = "base"
+
+    @abstractmethod
+    def preparar(self):
+        """Cria (ou zera) as estruturas necessárias no backend."""
+
+    @abstractmethod
+    def votar(self, id_enquete, id_usuario, opcao):
+        """Registra um voto. Retorna True se aceito e False se o usuário já votou."""
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        """
+        Registra vários votos. Retorna a lista dos votos rejeitados como duplicados.
+        A implementação padrão vota um a um; os backends sobrescrevem com algo mais eficiente.
+        """
+        return [voto for voto in votos if not self.votar(*voto)]
+
+    @abstractmethod
+    def obter_placar(self, id_enquete):
+        """Retorna [(opcao, votos), ...] ordenado do mais votado para o menos votado."""
+
+    @abstractmethod
+    def votantes_por_opcao(self, id_enquete, opcao):
+        """Retorna a lista de usuários que votaram em 'opcao'."""
+
+    def ja_votou(self, id_enquete, id_usuario):
+        """
+        True se o backend já tem um voto do usuário na enquete, consultando o mesmo
+        mecanismo que rejeita votos repetidos (usado por camadas como o write-behind).
+        """
+        raise NotImplementedError(f"{self.nome} não consulta votos já gravados.")
+
+    def fechar(self):
+        """Libera recursos do backend (conexões, arquivos)."""
+
+
+class SQLiteVoteStore(VoteStore):
+    """
+    Votos em uma tabela SQLite. No esquema padrão cada voto grava duas B-trees: a tabela
+    (chave rowid) e o índice da restrição UNIQUE. Com compacto=True a tabela é WITHOUT ROWID,
+    agrupada pela chave (poll_id, user_id), que já é a restrição de voto único; o índice
+    (poll_id, option_id, user_id) cobre o placar e os votantes por opção sem ler a tabela.
+    """
+
+    def __init__(self, conn, compacto=False):
+        self.conn = conn
+        self.compacto = compacto
+        self.nome = "SQLite compacto" if compacto else "SQLite"
+
+    def preparar(self):
+        cursor = self.conn.cursor()
+        cursor.execute("DROP TABLE IF EXISTS votes")
+        if self.compacto:
+            cursor.execute('''
+                           CREATE TABLE votes
+                           (
+                               poll_id   INTEGER NOT NULL,
+                               user_id   INTEGER NOT NULL,
+                               option_id TEXT    NOT NULL,
+                               PRIMARY KEY (poll_id, user_id)
+                           ) WITHOUT ROWID
+                           ''')
+            cursor.execute("CREATE INDEX idx_votes_opcao ON votes (poll_id, option_id, user_id)")
+        else:
+            cursor.execute('''
+                           CREATE TABLE votes
+                           (
+                               id        INTEGER PRIMARY KEY,
+                               user_id   INTEGER NOT NULL,
+                               poll_id   INTEGER NOT NULL,
+                               option_id TEXT    NOT NULL,
+                               UNIQUE (user_id, poll_id)
+                           )
+                           ''')
+        self.conn.commit()
+
+    def votar(self, id_enquete, id_usuario, opcao):
+        try:
+            self.conn.execute(
+                "INSERT INTO votes (user_id, poll_id, option_id) VALUES (?, ?, ?)",
+                (id_usuario, id_enquete, opcao)
+            )
+            self.conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        return inserir_sql_em_lote(
+            self.conn,
+            "INSERT INTO votes (user_id, poll_id, option_id) VALUES (?, ?, ?)",
+            votos,
+            lambda voto: (voto[1], voto[0], voto[2]),
+            tamanho_lote,
+        )
+
+    def obter_placar(self, id_enquete):
+        cursor = self.conn.execute(
+            "SELECT option_id, COUNT(*) FROM votes WHERE poll_id = ? "
+            "GROUP BY option_id ORDER BY COUNT(*) DESC",
+            (id_enquete,)
+        )
+        return cursor.fetchall()
+
+    def votantes_por_opcao(self, id_enquete, opcao):
+        cursor = self.conn.execute(
+            "SELECT user_id FROM votes WHERE poll_id = ? AND option_id = ?",
+            (id_enquete, opcao)
+        )
+        return [row[0] for row in cursor]
+
+    def ja_votou(self, id_enquete, id_usuario):
+        # Busca pontual no índice da restrição de voto único
+        cursor = self.conn.execute(
+            "SELECT 1 FROM votes WHERE poll_id = ? AND user_id = ?",
+            (id_enquete, id_usuario)
+        )
+        return cursor.fetchone() is not None
+
+    def fechar(self):
+        self.conn.close()
+
+
+# Voto completo em um único round trip: deduplicação, contador da opção e placar.
+# O Redis executa o script inteiro sem intercalar outros comandos, então não
+# há janela entre o SADD e os incrementos (ao contrário de votar em redis_example.py).
+# KEYS: votantes, contador da opção, placar [, votantes da opção] | ARGV: id_usuario, membro do placar
+# Retorna o novo total da opção, ou 0 se o usuário já tinha votado.
+SCRIPT_VOTO_LUA = """
+if redis.call('SADD', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local votos = redis.call('INCR', KEYS[2])
+redis.call('ZINCRBY', KEYS[3], 1, ARGV[2])
+if KEYS[4] then
+    redis.call('SADD', KEYS[4], ARGV[1])
+end
+return votos
+"""
+
+
+def chave_votantes_opcao(id_enquete, opcao):
+    """SET com os votantes de uma opção (índice opcional para 'quem votou em X?')."""
+    return f"enquete:{id_enquete}:opcao:{opcao}:votantes"
+
+
+def chaves_voto_redis(id_enquete, opcao, indexar_votantes=False):
+    """Chaves (votantes, contador da opção, placar [, votantes da opção]) usadas por um voto."""
+    chaves = [
+        f"enquete:{id_enquete}:votantes",
+        f"enquete:{id_enquete}:opcao:{opcao}",
+        f"enquete:{id_enquete}:placar",
+    ]
+    if indexar_votantes:
+        chaves.append(chave_votantes_opcao(id_enquete, opcao))
+    return chaves
+
+
+# --- Estratégias de deduplicação de votantes no Redis ---
+# Cada estratégia enfileira seus comandos em um pipeline e depois interpreta as
+# respostas desses comandos para decidir se o voto é novo (aceito) ou repetido.
+# enfileirar_consulta/ja_visto fazem o mesmo só lendo (SISMEMBER/GETBIT).
+
+class DeduplicacaoSet:
+    """SET exato com o id de cada votante (o modelo original de redis_example.py)."""
+
+    nome = "set"
+    comandos_por_voto = 1
+
+    def chave(self, id_enquete):
+        return f"enquete:{id_enquete}:votantes"
+
+    def enfileirar(self, pipe, id_enquete, id_usuario):
+        pipe.sadd(self.chave(id_enquete), id_usuario)
+
+    def aceito(self, respostas):
+        # SADD retorna 1 se o membro foi adicionado agora
+        return respostas[0] == 1
+
+    def enfileirar_consulta(self, pipe, id_enquete, id_usuario):
+        pipe.sismember(self.chave(id_enquete), id_usuario)
+
+    def ja_visto(self, respostas):
+        return bool(respostas[0])
+
+
+class DeduplicacaoBitmap:
+    """
+    Um bit por usuário (SETBIT/GETBIT) em uma string: ~125 KB por milhão de ids.
+    Exige ids inteiros não negativos e densos; ids esparsos desperdiçam memória.
+    """
+
+    nome = "bitmap"
+    comandos_por_voto = 1
+
+    def chave(self, id_enquete):
+        return f"enquete:{id_enquete}:votantes:bitmap"
+
+    def enfileirar(self, pipe, id_enquete, id_usuario):
+        if not isinstance(id_usuario, int) or id_usuario < 0:
+            raise ValueError(f"O bitmap exige ids inteiros não negativos, recebido: {id_usuario!r}")
+        pipe.setbit(self.chave(id_enquete), id_usuario, 1)
+
+    def aceito(self, respostas):
+        # SETBIT retorna o valor anterior do bit
+        return respostas[0] == 0
+
+    def enfileirar_consulta(self, pipe, id_enquete, id_usuario):
+        if not isinstance(id_usuario, int) or id_usuario < 0:
+            raise ValueError(f"O bitmap exige ids inteiros não negativos, recebido: {id_usuario!r}")
+        pipe.getbit(self.chave(id_enquete), id_usuario)
+
+    def ja_visto(self, respostas):
+        return respostas[0] == 1
+
+
+class DeduplicacaoBloom:
+    """
+    Filtro de Bloom sobre uma string comum do Redis (SETBIT), sem precisar de módulos.
+    Dimensionado para 'capacidade' votantes com a taxa de falso positivo desejada.
+    Um falso positivo rejeita um voto novo como se fosse repetido; nunca aceita um repetido.
+    """
+
+    nome = "bloom"
+
+    def __init__(self, capacidade=1_000_000, taxa_falso_positivo=0.001):
+        # m = -n ln(p) / (ln 2)^2 bits e k = (m / n) ln 2 funções de hash
+        self.num_bits = math.ceil(-capacidade * math.log(taxa_falso_positivo) / math.log(2) ** 2)
+        self.comandos_por_voto = max(1, round(self.num_bits / capacidade * math.log(2)))
+
+    def chave(self, id_enquete):
+        return f"enquete:{id_enquete}:votantes:bloom"
+
+    def posicoes(self, id_usuario):
+        # Hash duplo (Kirsch-Mitzenmacher): h1 + i*h2 gera as k posições a partir de um só digest
+        digest = hashlib.blake2b(str(id_usuario).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.comandos_por_voto)]
+
+    def enfileirar(self, pipe, id_enquete, id_usuario):
+        chave = self.chave(id_enquete)
+        for posicao in self.posicoes(id_usuario):
+            pipe.setbit(chave, posicao, 1)
+
+    def aceito(self, respostas):
+        # Se algum bit estava apagado, o usuário certamente ainda não tinha votado
+        return any(anterior == 0 for anterior in respostas)
+
+    def enfileirar_consulta(self, pipe, id_enquete, id_usuario):
+        chave = self.chave(id_enquete)
+        for posicao in self.posicoes(id_usuario):
+            pipe.getbit(chave, posicao)
+
+    def ja_visto(self, respostas):
+        # Todos os bits acesos: já votou ou é um falso positivo, como em aceito()
+        return all(bit == 1 for bit in respostas)
+
+
+ESTRATEGIAS_DEDUPLICACAO = {
+    "set": DeduplicacaoSet,
+    "bitmap": DeduplicacaoBitmap,
+    "bloom": DeduplicacaoBloom,
+}
+
+
+def votar_redis_em_lote(r, votos, tamanho_lote=1000, transacao=False, deduplicacao=None,
+                        indexar_votantes=False):
+    """
+    Registra vários votos (id_enquete, id_usuario, opcao) empacotando cada lote em pipelines.
+    Retorna a lista de votos rejeitados como duplicados.
+
+    Cada lote custa dois round trips, independentemente do tamanho:
+      1. os comandos de deduplicação de cada voto (um SADD, na estratégia padrão);
+         suas respostas dizem se o voto foi aceito;
+      2. um INCRBY/ZINCRBY por opção, somando apenas os votos aceitos
+         (e, com indexar_votantes=True, um SADD no SET de votantes de cada opção).
+    Com transacao=True cada etapa vai dentro de um bloco MULTI/EXEC.
+    """
+    deduplicacao = deduplicacao or DeduplicacaoSet()
+    n = deduplicacao.comandos_por_voto
+    rejeitados = []
+    for lote in em_lotes(votos, tamanho_lote):
+        pipe = r.pipeline(transaction=transacao)
+        for id_enquete, id_usuario, *_ in lote:
+            deduplicacao.enfileirar(pipe, id_enquete, id_usuario)
+        respostas = pipe.execute()
+
+        aceitos = {}
+        for i, voto in enumerate(lote):
+            if deduplicacao.aceito(respostas[i * n:(i + 1) * n]):
+                aceitos.setdefault((voto[0], voto[2]), []).append(voto[1])
+            else:
+                rejeitados.append(voto)
+
+        if aceitos:
+            pipe = r.pipeline(transaction=transacao)
+            for (id_enquete, opcao), usuarios in aceitos.items():
+                pipe.incrby(f"enquete:{id_enquete}:opcao:{opcao}", len(usuarios))
+                pipe.zincrby(f"enquete:{id_enquete}:placar", len(usuarios), opcao)
+                if indexar_votantes:
+                    pipe.sadd(chave_votantes_opcao(id_enquete, opcao), *usuarios)
+            pipe.execute()
+    return rejeitados
+
+
+def votar_redis_lua_em_lote(r, script, votos, tamanho_lote=1000, indexar_votantes=False):
+    """
+    Como votar_redis_em_lote, mas cada voto é um EVALSHA do SCRIPT_VOTO_LUA ('script',
+    de register_script): um pipeline por lote, com cada voto atômico no servidor.
+    Retorna a lista de votos rejeitados como duplicados.
+    """
+    rejeitados = []
+    for lote in em_lotes(votos, tamanho_lote):
+        pipe = r.pipeline(transaction=False)
+        for id_enquete, id_usuario, opcao, *_ in lote:
+            script(keys=chaves_voto_redis(id_enquete, opcao, indexar_votantes), args=[id_usuario, opcao], client=pipe)
+        rejeitados.extend(voto for voto, votos_opcao in zip(lote, pipe.execute()) if not votos_opcao)
+    return rejeitados
+
+
+# --- Contadores particionados (shards) para enquetes virais ---
+# Em vez de uma única chave quente por opção, cada voto vai para um de K shards,
+# escolhido pelo hash do votante. O mesmo votante cai sempre no mesmo shard,
+# então o SET de votantes também pode ser particionado sem perder a deduplicação.
+# As leituras somam os K shards em um único pipeline.
+
+def definir_shards_enquete(r, id_enquete, num_shards):
+    """Define K para a enquete. Deve ser chamado antes do primeiro voto: mudar K depois quebra a deduplicação."""
+    r.set(f"enquete:{id_enquete}:shards", num_shards)
+
+
+def obter_shards_enquete(r, id_enquete):
+    """K configurado para a enquete (1 se nunca foi definido)."""
+    return int(r.get(f"enquete:{id_enquete}:shards") or 1)
+
+
+def shard_do_usuario(id_usuario, num_shards):
+    return zlib.crc32(str(id_usuario).encode()) % num_shards
+
+
+def votar_redis_sharded(r, id_enquete, id_usuario, opcao, num_shards, indexar_votantes=False):
+    """
+    Voto com votantes, contador e placar particionados; dois round trips, como votar em redis_example.py.
+    Com indexar_votantes=True o usuário também entra no SET de votantes da opção no seu shard.
+    """
+    shard = shard_do_usuario(id_usuario, num_shards)
+    if not r.sadd(f"enquete:{id_enquete}:votantes:shard:{shard}", id_usuario):
+        return False
+    pipe = r.pipeline(transaction=False)
+    pipe.incr(f"enquete:{id_enquete}:opcao:{opcao}:shard:{shard}")
+    pipe.zincrby(f"enquete:{id_enquete}:placar:shard:{shard}", 1, opcao)
+    if indexar_votantes:
+        pipe.sadd(f"{chave_votantes_opcao(id_enquete, opcao)}:shard:{shard}", id_usuario)
+    pipe.execute()
+    return True
+
+
+def resultados_redis_sharded(r, id_enquete, opcoes, num_shards):
+    """{opcao: votos} somando os K contadores de cada opção com um único MGET."""
+    chaves = [f"enquete:{id_enquete}:opcao:{opcao}:shard:{k}" for opcao in opcoes for k in range(num_shards)]
+    valores = r.mget(chaves)
+    return {opcao: sum(int(v or 0) for v in valores[i * num_shards:(i + 1) * num_shards])
+            for i, opcao in enumerate(opcoes)}
+
+
+def placar_redis_sharded(r, id_enquete, num_shards):
+    """Placar [(opcao, votos), ...] somando os K ZSETs de placar em um único pipeline."""
+    pipe = r.pipeline(transaction=False)
+    for k in range(num_shards):
+        pipe.zrange(f"enquete:{id_enquete}:placar:shard:{k}", 0, -1, withscores=True)
+    totais = {}
+    for parcial in pipe.execute():
+        for opcao, score in parcial:
+            totais[opcao] = totais.get(opcao, 0) + int(score)
+    return sorted(totais.items(), key=lambda item: item[1], reverse=True)
+
+
+class RedisVoteStore(VoteStore):
+    """
+    Mesmo modelo de chaves de redis_example.py: SET de votantes, contadores e placar (ZSET).
+    Com atomico=True cada voto é uma única chamada EVALSHA ao SCRIPT_VOTO_LUA
+    (em lote, um pipeline de EVALSHAs).
+    'deduplicacao' troca o SET de votantes por um bitmap ou filtro de Bloom
+    (veja ESTRATEGIAS_DEDUPLICACAO); o modo atômico só suporta o SET.
+    Por padrão (indexar_votantes=True) cada opção ganha um SET com seus votantes,
+    o que permite responder votantes_por_opcao com SSCAN; o modelo de chaves de
+    redis_example.py, sem esse índice, só guarda QUEM votou, não EM QUE votou.
+    Com particionado=True votantes, contadores, placar e o índice por opção são
+    divididos em K shards, com K lido por enquete de definir_shards_enquete.
+    """
+
+    nome = "Redis"
+
+    def __init__(self, r, atomico=False, deduplicacao=None, indexar_votantes=True, particionado=False):
+        self.r = r
+        self.atomico = atomico
+        self.indexar_votantes = indexar_votantes
+        self.particionado = particionado
+        self.shards_por_enquete = {}
+        self.deduplicacao = deduplicacao or DeduplicacaoSet()
+        if atomico and not isinstance(self.deduplicacao, DeduplicacaoSet):
+            raise ValueError("O voto atômico via Lua só suporta a deduplicação por SET.")
+        if particionado and (atomico or deduplicacao is not None):
+            raise ValueError("O modo particionado usa seu próprio SET por shard e não combina com as outras opções.")
+        # register_script calcula o SHA uma vez; cada chamada usa EVALSHA e só
+        # reenvia o código (SCRIPT LOAD) se o servidor responder NOSCRIPT.
+        self.script_voto = r.register_script(SCRIPT_VOTO_LUA)
+        if atomico:
+            self.nome = "Redis Lua"
+        elif particionado:
+            self.nome = "Redis shards"
+        elif self.deduplicacao.nome != "set":
+            self.nome = f"Redis {self.deduplicacao.nome}"
+
+    def preparar(self):
+        self.r.flushdb()
+        self.shards_por_enquete.clear()
+
+    def num_shards(self, id_enquete):
+        # K muda raramente: lê do Redis uma vez por enquete e guarda localmente
+        if id_enquete not in self.shards_por_enquete:
+            self.shards_por_enquete[id_enquete] = obter_shards_enquete(self.r, id_enquete)
+        return self.shards_por_enquete[id_enquete]
+
+    def votar(self, id_enquete, id_usuario, opcao):
+        if self.particionado:
+            return votar_redis_sharded(self.r, id_enquete, id_usuario, opcao, self.num_shards(id_enquete),
+                                       self.indexar_votantes)
+        if self.atomico:
+            chaves = chaves_voto_redis(id_enquete, opcao, self.indexar_votantes)
+            return bool(self.script_voto(keys=chaves, args=[id_usuario, opcao]))
+        # MULTI/EXEC garante que os vários SETBITs do Bloom sejam aplicados juntos
+        pipe = self.r.pipeline(transaction=True)
+        self.deduplicacao.enfileirar(pipe, id_enquete, id_usuario)
+        if self.deduplicacao.aceito(pipe.execute()):
+            self.r.incr(f"enquete:{id_enquete}:opcao:{opcao}")
+            self.r.zincrby(f"enquete:{id_enquete}:placar", 1, opcao)
+            if self.indexar_votantes:
+                self.r.sadd(chave_votantes_opcao(id_enquete, opcao), id_usuario)
+            return True
+        return False
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        if self.particionado:
+            return super().votar_em_lote(votos, tamanho_lote)
+        if self.atomico:
+            return votar_redis_lua_em_lote(self.r, self.script_voto, votos, tamanho_lote, self.indexar_votantes)
+        return votar_redis_em_lote(self.r, votos, tamanho_lote, deduplicacao=self.deduplicacao,
+                                   indexar_votantes=self.indexar_votantes)
+
+    def memoria_deduplicacao(self, id_enquete):
+        """Bytes ocupados pela estrutura de deduplicação (MEMORY USAGE), ou None se indisponível."""
+        try:
+            return self.r.memory_usage(self.deduplicacao.chave(id_enquete), samples=0)
+        except ResponseError:
+            return None  # ex.: fakeredis não implementa MEMORY USAGE
+
+    def obter_placar(self, id_enquete):
+        if self.particionado:
+            return placar_redis_sharded(self.r, id_enquete, self.num_shards(id_enquete))
+        placar = self.r.zrevrange(f"enquete:{id_enquete}:placar", 0, -1, withscores=True)
+        return [(opcao, int(score)) for opcao, score in placar]
+
+    def votantes_por_opcao(self, id_enquete, opcao):
+        if not self.indexar_votantes:
+            # Índice desligado explicitamente: sem ele não há registro de EM QUE cada usuário votou.
+            raise ValueError("RedisVoteStore criado com indexar_votantes=False não responde votantes por opção.")
+        chave = chave_votantes_opcao(id_enquete, opcao)
+        if self.particionado:
+            chaves = [f"{chave}:shard:{k}" for k in range(self.num_shards(id_enquete))]
+        else:
+            chaves = [chave]
+        return [usuario for chave in chaves for usuario in self.r.sscan_iter(chave, count=1000)]
+
+    def ja_votou(self, id_enquete, id_usuario):
+        if self.particionado:
+            shard = shard_do_usuario(id_usuario, self.num_shards(id_enquete))
+            return bool(self.r.sismember(f"enquete:{id_enquete}:votantes:shard:{shard}", id_usuario))
+        pipe = self.r.pipeline(transaction=False)
+        self.deduplicacao.enfileirar_consulta(pipe, id_enquete, id_usuario)
+        return self.deduplicacao.ja_visto(pipe.execute())
+
+    def fechar(self):
+        self.r.close()
+
+
+def documento_voto_mongo(voto):
+    """Documento de um voto (id_enquete, id_usuario, opcao[, instante]); o instante vira 'voted_at'."""
+    documento = {"poll_id": voto[0], "user_id": voto[1], "option_id": voto[2]}
+    if len(voto) > 3 and voto[3] is not None:
+        documento["voted_at"] = int(voto[3])
+    return documento
+
+
+def votar_mongo_em_lote(colecao, votos, tamanho_lote=1000):
+    """
+    Insere vários votos (id_enquete, id_usuario, opcao) com insert_many(ordered=False).
+    Retorna a lista de votos rejeitados pelo índice único (poll_id, user_id).
+
+    Com ordered=False o servidor continua inserindo o restante do lote após um erro;
+    o BulkWriteError traz o índice (dentro do lote) de cada documento rejeitado.
+    Qualquer erro que não seja de chave duplicada é propagado.
+    """
+    rejeitados = []
+    for lote in em_lotes(votos, tamanho_lote):
+        documentos = [documento_voto_mongo(voto) for voto in lote]
+        try:
+            colecao.insert_many(documentos, ordered=False)
+        except BulkWriteError as e:
+            erros = e.details.get("writeErrors", [])
+            if e.details.get("writeConcernErrors") or any(
+                    erro["code"] != CODIGO_CHAVE_DUPLICADA for erro in erros):
+                raise
+            rejeitados.extend(lote[erro["index"]] for erro in erros)
+    return rejeitados
+
+
+# --- Placar incremental no MongoDB (um documento de contagem por enquete) ---
+# Formato: {"_id": id_enquete, "opcoes": {"A": 3, "B": 1, ...}}, com as opções
+# codificadas por campo_opcao_mongo
+
+def campo_opcao_mongo(opcao):
+    """
+    Nome de campo para a opção: '.' separa caminhos e um '$' inicial indica operador,
+    então '%', '.' e '$' viram %25, %2E e %24 (opcao_do_campo_mongo desfaz).
+    """
+    return str(opcao).replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def opcao_do_campo_mongo(campo):
+    return unquote(campo)
+
+
+def incrementar_tallies_mongo(colecao_tallies, incrementos):
+    """
+    Aplica {(id_enquete, opcao): quantidade} com $inc.
+    Um update por enquete: as opções de um lote são agregadas em um único $inc.
+    """
+    por_enquete = {}
+    for (id_enquete, opcao), quantidade in incrementos.items():
+        por_enquete.setdefault(id_enquete, {})[f"opcoes.{campo_opcao_mongo(opcao)}"] = quantidade
+    for id_enquete, inc in por_enquete.items():
+        colecao_tallies.update_one({"_id": id_enquete}, {"$inc": inc}, upsert=True)
+
+
+def placar_tally_mongo(colecao_tallies, id_enquete):
+    """Lê o placar de um único documento pequeno, sem varrer os votos."""
+    documento = colecao_tallies.find_one({"_id": id_enquete}) or {}
+    placar = [(opcao_do_campo_mongo(campo), votos) for campo, votos in documento.get("opcoes", {}).items()]
+    return sorted(placar, key=lambda item: item[1], reverse=True)
+
+
+def reconciliar_tallies_mongo(colecao_votos, colecao_tallies, id_enquete=None):
+    """
+    Recalcula os documentos de contagem a partir da coleção 'votes' (a fonte da verdade),
+    removendo os de enquetes sem votos. Votos aceitos durante a reconciliação podem ser
+    sobrescritos; a rodada seguinte os corrige.
+    """
+    filtro = [] if id_enquete is None else [{"$match": {"poll_id": id_enquete}}]
+    pipeline = filtro + [
+        {"$group": {"_id": {"poll_id": "$poll_id", "option_id": "$option_id"}, "vote_count": {"$sum": 1}}},
+    ]
+    contagens = {}
+    for doc in colecao_votos.aggregate(pipeline):
+        contagens.setdefault(doc["_id"]["poll_id"], {})[campo_opcao_mongo(doc["_id"]["option_id"])] = doc["vote_count"]
+    for poll_id, opcoes in contagens.items():
+        colecao_tallies.replace_one({"_id": poll_id}, {"_id": poll_id, "opcoes": opcoes}, upsert=True)
+    # Contagens sem nenhum voto correspondente (ex.: votos apagados) não sobrevivem à reconciliação
+    if id_enquete is None:
+        colecao_tallies.delete_many({"_id": {"$nin": list(contagens)}})
+    elif id_enquete not in contagens:
+        colecao_tallies.delete_one({"_id": id_enquete})
+    return len(contagens)
+
+
+class ReconciliacaoMongo(threading.Event):
+    """
+    Controle da thread de iniciar_reconciliacao_mongo: .set() a encerra. Uma rodada que
+    falha (ex.: AutoReconnect) não mata a thread; o erro fica em 'erro' até levantar_erro().
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.erro = None
+        self.falhas = 0
+
+    def levantar_erro(self):
+        erro, self.erro = self.erro, None
+        if erro is not None:
+            raise RuntimeError("A reconciliação dos tallies do MongoDB falhou; a thread segue tentando.") from erro
+
+
+def iniciar_reconciliacao_mongo(colecao_votos, colecao_tallies, intervalo_s=60.0):
+    """
+    Roda reconciliar_tallies_mongo em uma thread de fundo a cada 'intervalo_s' segundos.
+    Retorna um ReconciliacaoMongo (um threading.Event); chame .set() nele para encerrar a thread.
+    """
+    parar = ReconciliacaoMongo()
+
+    def laco():
+        while not parar.wait(intervalo_s):
+            try:
+                reconciliar_tallies_mongo(colecao_votos, colecao_tallies)
+            except Exception as e:
+                # Os tallies ficam como estão até a próxima rodada, que tenta de novo
+                print(f"AVISO: reconciliação dos tallies falhou ({e!r}); nova tentativa em {intervalo_s} s.")
+                parar.erro = e
+                parar.falhas += 1
+
+    threading.Thread(target=laco, name="reconciliacao-tallies", daemon=True).start()
+    return parar
+
+
+class MongoVoteStore(VoteStore):
+    """
+    Um documento por voto, com índice único em (poll_id, user_id).
+    Com 'colecao_tallies', cada voto aceito também faz $inc no documento de contagem
+    da enquete, e o placar passa a ler esse documento em vez de agregar os votos.
+    """
+
+    nome = "MongoDB"
+
+    def __init__(self, colecao, colecao_tallies=None):
+        self.colecao = colecao
+        self.colecao_tallies = colecao_tallies
+        if colecao_tallies is not None:
+            self.nome = "MongoDB tally"
+
+    def preparar(self):
+        self.colecao.delete_many({})
+        self.colecao.drop_indexes()
+        self.colecao.create_index([("poll_id", 1), ("user_id", 1)], unique=True)
+        if self.colecao_tallies is not None:
+            self.colecao_tallies.delete_many({})
+
+    def votar(self, id_enquete, id_usuario, opcao):
+        try:
+            self.colecao.insert_one({"poll_id": id_enquete, "user_id": id_usuario, "option_id": opcao})
+        except DuplicateKeyError:
+            return False
+        if self.colecao_tallies is not None:
+            incrementar_tallies_mongo(self.colecao_tallies, {(id_enquete, opcao): 1})
+        return True
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        if self.colecao_tallies is None:
+            return votar_mongo_em_lote(self.colecao, votos, tamanho_lote)
+        rejeitados = []
+        for lote in em_lotes(votos, tamanho_lote):
+            rejeitados_lote = votar_mongo_em_lote(self.colecao, lote, tamanho_lote)
+            incrementos = {}
+            for voto in lote:
+                incrementos[(voto[0], voto[2])] = incrementos.get((voto[0], voto[2]), 0) + 1
+            for voto in rejeitados_lote:
+                incrementos[(voto[0], voto[2])] -= 1
+            incrementar_tallies_mongo(
+                self.colecao_tallies, {chave: n for chave, n in incrementos.items() if n})
+            rejeitados.extend(rejeitados_lote)
+        return rejeitados
+
+    def obter_placar(self, id_enquete):
+        if self.colecao_tallies is not None:
+            return placar_tally_mongo(self.colecao_tallies, id_enquete)
+        pipeline = [
+            {"$match": {"poll_id": id_enquete}},
+            {"$group": {"_id": "$option_id", "vote_count": {"$sum": 1}}},
+            {"$sort": {"vote_count": -1}},
+        ]
+        return [(doc["_id"], doc["vote_count"]) for doc in self.colecao.aggregate(pipeline)]
+
+    def votantes_por_opcao(self, id_enquete, opcao):
+        cursor = self.colecao.find({"poll_id": id_enquete, "option_id": opcao}, {"user_id": 1})
+        return [doc["user_id"] for doc in cursor]
+
+    def ja_votou(self, id_enquete, id_usuario):
+        # Coberta pelo índice único (poll_id, user_id)
+        return self.colecao.find_one({"poll_id": id_enquete, "user_id": id_usuario}, {"_id": 1}) is not None
+
+    def fechar(self):
+        self.colecao.database.client.close()
+
+
+BACKENDS = ("sqlite", "sqlite-compacto", "redis", "redis-lua", "mongodb", "mongodb-tally")
+
+
+def criar_store(backend, offline=False):
+    """
+    Cria o VoteStore de um backend.
+    Com offline=True usa substitutos locais (SQLite em memória, fakeredis e mongomock),
+    o que permite rodar o benchmark sem Docker (por exemplo, na CI).
+    """
+    if backend in ("sqlite", "sqlite-compacto"):
+        # check_same_thread=False: camadas como o write-behind descarregam a partir de outra thread
+        conn = sqlite3.connect(":memory:" if offline else "enquete_store.db", check_same_thread=False)
+        return SQLiteVoteStore(conn, compacto=backend == "sqlite-compacto")
+    if backend in ("redis", "redis-lua"):
+        if offline:
+            import fakeredis
+            r = fakeredis.FakeRedis(decode_responses=True)
+        else:
+            import redis
+            r = redis.Redis(host='localhost', port=6379, db=1, decode_responses=True)
+        return RedisVoteStore(r, atomico=backend == "redis-lua")
+    if backend in ("mongodb", "mongodb-tally"):
+        if offline:
+            import mongomock
+            client = mongomock.MongoClient()
+        else:
+            from pymongo import MongoClient
+            client = MongoClient('localhost', 27017, serverSelectionTimeoutMS=5000)
+        db = client['enquete_benchmark_db']
+        return MongoVoteStore(db['votes'], db['tallies'] if backend == "mongodb-tally" else None)
+    raise ValueError(f"Backend desconhecido: {backend!r}. Use um de {BACKENDS}.")
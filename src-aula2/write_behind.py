@@ -0,0 +1,196 @@
+"""
+Camada write-behind em memória na frente de qualquer VoteStore.
+
+Cada voto é deduplicado e agregado em memória e, antes de ser confirmado ao
+chamador, anotado em um log local só de acréscimo (uma linha JSON por voto).
+Os votos pendentes vão para o backend em lote (votar_em_lote) quando
+acumulam 'tamanho_flush' votos ou a cada 'intervalo_flush' segundos.
+A descarga envia os votos individuais, não só as contagens agregadas: cada
+voto é o registro que deduplica e responde "quem votou em X". Os contadores
+são agregados pelos próprios lotes dos backends (um INCRBY/ZINCRBY por opção
+no Redis, um $inc por enquete no MongoDB tally); as contagens em memória
+servem para o placar incluir os votos ainda pendentes.
+
+Depois de cada descarga o log é truncado: ele só guarda votos ainda não
+gravados no backend. Ao criar a camada, o log é reaplicado (recuperar), antes
+de qualquer voto novo. A reaplicação é idempotente, porque o backend rejeita
+votos (poll_id, user_id) repetidos; por isso não há problema se o processo
+cair entre a descarga e o truncamento.
+
+A deduplicação usa a do próprio backend: um voto é recusado se o usuário tem
+voto pendente em memória (só os ainda não descarregados) ou
+se store.ja_votou o encontra (SISMEMBER/GETBIT no Redis, busca no índice único
+no SQLite e no MongoDB). São uma leitura por voto, mas a memória não cresce com
+o tamanho das enquetes; stores sem ja_votou são recusados ao criar a camada.
+
+A descarga roda em outra thread, a cada 'intervalo_flush' segundos ou assim que
+um votar acumula 'tamanho_flush' votos: no SQLite, abra a conexão com
+check_same_thread=False (criar_store já faz isso); o acesso é serializado pela trava.
+Se uma descarga falhar, os votos continuam pendentes (e no log), a thread segue
+tentando e o erro é levantado no próximo votar ou no fechar. Sem a thread
+(intervalo_flush=None) o votar descarrega, e um erro fica guardado da mesma forma:
+o voto já está no log, então continua aceito.
+"""
+import json
+import os
+import threading
+
+from vote_store import VoteStore
+
+
+class WriteBehindVoteStore(VoteStore):
+
+    def __init__(self, store, caminho_log, tamanho_flush=1000, intervalo_flush=1.0, sincronizar_disco=False):
+        if type(store).ja_votou is VoteStore.ja_votou:
+            raise ValueError(f"O write-behind deduplica com store.ja_votou, que {store.nome} não implementa.")
+        self.store = store
+        self.nome = f"{store.nome} write-behind"
+        self.caminho_log = caminho_log
+        self.tamanho_flush = tamanho_flush
+        self.sincronizar_disco = sincronizar_disco
+
+        self.trava = threading.RLock()
+        self.votantes_pendentes = {}  # id_enquete -> set de usuários (texto) com voto ainda não descarregado
+        self.contagens = {}   # (id_enquete, opcao) -> votos aceitos ainda não descarregados
+        self.pendentes = []
+        self.descargas = 0    # lotes enviados ao backend, para medir a carga gerada
+        self.consultas = 0    # leituras de deduplicação (store.ja_votou)
+        self.rejeitados_backend = []
+        self.erro_descarga = None  # exceção de uma descarga, levantada no próximo votar/fechar
+
+        self.log = open(caminho_log, "a", encoding="utf-8")
+        # Votos confirmados antes de uma queda ainda estão no log: vão para o backend antes de aceitar novos
+        self.recuperar()
+        self.parar = threading.Event()
+        self.acordar = threading.Event()  # votar pede uma descarga ao atingir 'tamanho_flush'
+        self.descarregador = None
+        if intervalo_flush:
+            self.descarregador = threading.Thread(
+                target=self._descarregar_periodicamente, args=(intervalo_flush,),
+                name="write-behind", daemon=True)
+            self.descarregador.start()
+
+    def _descarregar_periodicamente(self, intervalo):
+        while True:
+            self.acordar.wait(intervalo)
+            self.acordar.clear()
+            if self.parar.is_set():
+                return
+            self._descarregar_guardando_erro()
+
+    def _descarregar_guardando_erro(self):
+        try:
+            self.descarregar()
+        except Exception as e:
+            # Os votos continuam pendentes; a próxima rodada tenta de novo
+            print(f"AVISO: descarga write-behind falhou ({e!r}); {len(self.pendentes)} votos pendentes.")
+            self.erro_descarga = e
+
+    def _levantar_erro_descarga(self):
+        erro, self.erro_descarga = self.erro_descarga, None
+        if erro is not None:
+            raise RuntimeError("A descarga do write-behind falhou; os votos seguem pendentes.") from erro
+
+    def preparar(self):
+        with self.trava:
+            self.store.preparar()
+            self.votantes_pendentes.clear()
+            self.contagens.clear()
+            self.pendentes.clear()
+            self._truncar_log()
+
+    def recuperar(self):
+        """
+        Reaplica no backend os votos que ficaram no log (ex.: após uma queda do processo).
+        Retorna quantos votos foram lidos do log.
+        """
+        with self.trava:
+            with open(self.caminho_log, "r", encoding="utf-8") as arquivo:
+                votos = []
+                for linha in arquivo:
+                    try:
+                        votos.append(tuple(json.loads(linha)))
+                    except json.JSONDecodeError:
+                        break  # Última linha escrita pela metade durante a queda
+            if votos:
+                self.store.votar_em_lote(votos, self.tamanho_flush)
+                self.descargas += 1
+            self._truncar_log()
+            return len(votos)
+
+    def ja_votou(self, id_enquete, id_usuario):
+        with self.trava:
+            if str(id_usuario) in self.votantes_pendentes.get(id_enquete, ()):
+                return True
+            self.consultas += 1
+            return self.store.ja_votou(id_enquete, id_usuario)
+
+    def votar(self, id_enquete, id_usuario, opcao):
+        self._levantar_erro_descarga()
+        with self.trava:
+            if self.ja_votou(id_enquete, id_usuario):
+                return False
+            self.votantes_pendentes.setdefault(id_enquete, set()).add(str(id_usuario))
+
+            # Durabilidade primeiro: o voto só é aceito depois de chegar ao log
+            self.log.write(json.dumps([id_enquete, id_usuario, opcao]) + "\n")
+            self.log.flush()
+            if self.sincronizar_disco:
+                os.fsync(self.log.fileno())
+
+            self.pendentes.append((id_enquete, id_usuario, opcao))
+            chave = (id_enquete, opcao)
+            self.contagens[chave] = self.contagens.get(chave, 0) + 1
+            if len(self.pendentes) >= self.tamanho_flush:
+                # O voto já está no log: uma falha do backend aqui não pode virar um voto recusado
+                if self.descarregador is not None:
+                    self.acordar.set()
+                else:
+                    self._descarregar_guardando_erro()
+            return True
+
+    def votar_em_lote(self, votos, tamanho_lote=1000):
+        return [voto for voto in votos if not self.votar(*voto)]
+
+    def descarregar(self):
+        """Envia os votos pendentes ao backend em um lote e trunca o log."""
+        with self.trava:
+            if not self.pendentes:
+                return
+            # O backend ainda pode rejeitar votos já gravados por outra instância
+            self.rejeitados_backend.extend(self.store.votar_em_lote(self.pendentes, self.tamanho_flush))
+            self.descargas += 1
+            self.pendentes = []
+            self.votantes_pendentes.clear()
+            self.contagens.clear()
+            self._truncar_log()
+
+    def _truncar_log(self):
+        self.log.seek(0)
+        self.log.truncate()
+        self.log.flush()
+
+    def obter_placar(self, id_enquete):
+        # Placar do backend somado às contagens ainda pendentes em memória
+        with self.trava:
+            totais = dict(self.store.obter_placar(id_enquete))
+            for (enquete, opcao), votos in self.contagens.items():
+                if enquete == id_enquete:
+                    totais[opcao] = totais.get(opcao, 0) + votos
+        return sorted(totais.items(), key=lambda item: item[1], reverse=True)
+
+    def votantes_por_opcao(self, id_enquete, opcao):
+        self.descarregar()
+        return self.store.votantes_por_opcao(id_enquete, opcao)
+
+    def fechar(self):
+        self.parar.set()
+        self.acordar.set()
+        if self.descarregador is not None:
+            self.descarregador.join()
+        try:
+            self.descarregar()
+        finally:
+            self.log.close()
+            self.store.fechar()
+        self._levantar_erro_descarga()
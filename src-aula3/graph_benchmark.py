@@ -0,0 +1,102 @@
+"""
+Benchmark das consultas da rede social: JOINs no SQLite x motor CSR em memória.
+
+Gera grafos aleatórios com 10 mil, 1 milhão e 10 milhões de relações
+(grau médio 10), carrega o mesmo grafo nos dois motores e mede a latência
+mediana das três consultas de social_network_modeling.py para uma amostra
+de usuários. Também mede o tempo das recomendações top-10 de todos os usuários.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from graph_engine import GrafoCSR
+from graph_generator import gerar_grafo_uniforme
+from social_network_modeling import SQL_AMIGOS_DE_AMIGOS, SQL_SEGUE, SQL_SEGUIDORES
+from social_sql import criar_indice_reverso, criar_tabelas_sql
+
+DB_FILE = "social_network_benchmark.db"
+
+
+def gerar_arestas_aleatorias(num_arestas, grau_medio=10, semente=42):
+    """Arestas (seguidor, seguido) uniformes, sem laços nem repetições (graph_generator.py). Ids começam em 1."""
+    num_usuarios = max(2, num_arestas // grau_medio)
+    origens, destinos = gerar_grafo_uniforme(num_usuarios, grau_medio, semente)
+    return num_usuarios, origens, destinos
+
+
+def criar_sqlite(num_usuarios, origens, destinos, sem_rowid=False):
+    """Cria o banco com o mesmo esquema de modelagem_sql_com_sqlite (social_sql.py) e carrega o grafo."""
+    if os.path.exists(DB_FILE):
+        os.remove(DB_FILE)
+    conn = sqlite3.connect(DB_FILE)
+    criar_tabelas_sql(conn, sem_rowid=sem_rowid, criar_indice=False)
+    conn.executemany("INSERT INTO usuarios VALUES (?, ?, ?)",
+                     ((i, f"user{i}", f"Usuário {i}") for i in range(1, num_usuarios + 1)))
+    conn.executemany("INSERT INTO seguidores VALUES (?, ?)", zip(origens.tolist(), destinos.tolist()))
+    criar_indice_reverso(conn)
+    conn.commit()
+    return conn
+
+
+def mediana_ms(funcao, usuarios):
+    latencias = []
+    for usuario in usuarios:
+        t0 = time.perf_counter()
+        funcao(usuario)
+        latencias.append(time.perf_counter() - t0)
+    return float(np.median(latencias)) * 1000
+
+
+def benchmark(tamanhos=(10_000, 1_000_000, 10_000_000), amostra=200, semente=42, sem_rowid=False):
+    print("--- Consultas da rede social: SQLite (JOIN) x CSR em memória ---")
+    for num_arestas in tamanhos:
+        num_usuarios, origens, destinos = gerar_arestas_aleatorias(num_arestas, semente=semente)
+
+        t0 = time.perf_counter()
+        conn = criar_sqlite(num_usuarios, origens, destinos, sem_rowid)
+        carga_sql = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        grafo = GrafoCSR.de_sqlite(conn)
+        carga_csr = time.perf_counter() - t0
+
+        usuarios = np.random.default_rng(semente).integers(1, num_usuarios + 1, size=amostra).tolist()
+        consultas = (
+            ("a) segue",
+             lambda u: conn.execute(SQL_SEGUE, (u,)).fetchall(),
+             lambda u: grafo.nomes_de(grafo.segue(u))),
+            ("b) seguidores",
+             lambda u: conn.execute(SQL_SEGUIDORES, (u,)).fetchall(),
+             lambda u: grafo.nomes_de(grafo.seguidores(u))),
+            ("c) amigos de amigos",
+             lambda u: conn.execute(SQL_AMIGOS_DE_AMIGOS, {"usuario": u}).fetchall(),
+             lambda u: grafo.nomes_de(grafo.amigos_de_amigos(u))),
+        )
+        print(f"\n{len(origens):,} relações, {num_usuarios:,} usuários "
+              f"(carga SQLite {carga_sql:.1f} s, CSR a partir do SQLite {carga_csr:.1f} s)")
+        for rotulo, sql, csr in consultas:
+            ms_sql = mediana_ms(sql, usuarios)
+            ms_csr = mediana_ms(csr, usuarios)
+            print(f"  {rotulo:<22}SQLite: {ms_sql:10.3f} ms | CSR: {ms_csr:8.3f} ms | {ms_sql / ms_csr:8.1f}x")
+
+        # Lote noturno: top-10 de todos os usuários de uma vez (A·A em blocos de linhas)
+        t0 = time.perf_counter()
+        recomendados = sum(int((r >= 0).sum()) for _, r, _ in grafo.recomendacoes_em_lote(k=10))
+        segundos = time.perf_counter() - t0
+        print(f"  {'d) top-10 de todos':<22}CSR em lote: {segundos:.2f} s "
+              f"({num_usuarios / segundos:,.0f} usuários/s, {recomendados:,} recomendações)")
+        conn.close()
+    os.remove(DB_FILE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark SQLite x CSR para as consultas da rede social.")
+    parser.add_argument("--arestas", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000],
+                        help="tamanhos de grafo (número de relações)")
+    parser.add_argument("--amostra", type=int, default=200, help="usuários consultados por tamanho")
+    parser.add_argument("--sem-rowid", action="store_true", help="tabela de relações WITHOUT ROWID")
+    args = parser.parse_args()
+    benchmark(args.arestas, args.amostra, sem_rowid=args.sem_rowid)
@@ -0,0 +1,169 @@
+"""
+Motor de grafo em memória para as consultas da rede social.
+
+As relações "segue" ficam em arrays NumPy no formato CSR (compressed sparse
+row), nos dois sentidos:
+
+- direto:  indptr[u]..indptr[u+1] em 'indices' são as pessoas que u segue;
+- reverso: o mesmo para as pessoas que seguem u.
+
+Assim "quem X segue" e "quem segue X" viram fatias de array, e os "amigos
+dos amigos" viram uma junção de fatias seguida de operações de conjunto,
+sem JOINs. Os ids de usuário são usados diretamente como índices, então
+devem ser inteiros não negativos (e, de preferência, densos).
+
+recomendacoes_em_lote ranqueia os amigos dos amigos de todos os usuários
+pelo número de seguidos em comum: é o produto esparso A·A da matriz de
+adjacência, calculado em blocos de linhas com no máximo 'max_caminhos'
+caminhos de dois saltos cada, para a memória não depender do tamanho do grafo.
+"""
+import numpy as np
+
+
+def _csr(origens, destinos, num_nos):
+    """Monta (indptr, indices) com os vizinhos de cada nó ordenados."""
+    ordem = np.lexsort((destinos, origens))
+    indices = destinos[ordem]
+    indptr = np.zeros(num_nos + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origens, minlength=num_nos), out=indptr[1:])
+    return indptr, indices
+
+
+def _fatias(indptr, indices, nos):
+    """Concatena os vizinhos de vários nós de uma vez (sem laço em Python)."""
+    inicios = indptr[nos]
+    tamanhos = indptr[np.asarray(nos) + 1] - inicios
+    total = int(tamanhos.sum())
+    if total == 0:
+        return indices[:0]
+    # Para cada posição de saída: início da sua fatia + deslocamento dentro dela
+    deslocamentos = np.arange(total) - np.repeat(np.cumsum(tamanhos) - tamanhos, tamanhos)
+    return indices[np.repeat(inicios, tamanhos) + deslocamentos]
+
+
+class GrafoCSR:
+    """Grafo dirigido "seguidor -> seguido" em CSR, com índice direto e reverso."""
+
+    def __init__(self, origens, destinos, num_nos=None, nomes=None):
+        origens = np.asarray(origens, dtype=np.int64)
+        destinos = np.asarray(destinos, dtype=np.int64)
+        if num_nos is None:
+            num_nos = int(max(origens.max(initial=-1), destinos.max(initial=-1))) + 1
+        self.num_nos = num_nos
+        self.num_arestas = len(origens)
+        self.indptr, self.indices = _csr(origens, destinos, num_nos)
+        self.indptr_rev, self.indices_rev = _csr(destinos, origens, num_nos)
+        # Quantas contas cada nó segue; calculado uma vez para todos os blocos de recomendação
+        self.graus = np.diff(self.indptr)
+        # Array de nomes indexado pelo id, para devolver resultados legíveis
+        self.nomes = None if nomes is None else np.asarray(nomes, dtype=object)
+
+    @classmethod
+    def de_arestas(cls, arestas, usuarios=None):
+        """
+        Cria o grafo a partir de listas como follows_data [(seguidor_id, seguido_id), ...]
+        e, opcionalmente, users_data [(id, username, nome_completo), ...].
+        """
+        arestas = np.asarray(arestas, dtype=np.int64).reshape(-1, 2)
+        nomes = None
+        num_nos = None
+        if usuarios:
+            num_nos = max(max(u[0] for u in usuarios), int(arestas.max(initial=-1))) + 1
+            nomes = np.empty(num_nos, dtype=object)
+            for id_usuario, _, nome in usuarios:
+                nomes[id_usuario] = nome
+        return cls(arestas[:, 0], arestas[:, 1], num_nos, nomes)
+
+    @classmethod
+    def de_sqlite(cls, conn, tamanho_bloco=1_000_000):
+        """Carrega as tabelas 'usuarios' e 'seguidores' de uma conexão SQLite, em blocos."""
+        cursor = conn.execute("SELECT seguidor_id, seguido_id FROM seguidores")
+        blocos = []
+        while True:
+            linhas = cursor.fetchmany(tamanho_bloco)
+            if not linhas:
+                break
+            blocos.append(np.array(linhas, dtype=np.int64))
+        arestas = np.concatenate(blocos) if blocos else np.empty((0, 2), dtype=np.int64)
+
+        num_nos = int(max(conn.execute("SELECT COALESCE(MAX(id), -1) FROM usuarios").fetchone()[0],
+                          arestas.max(initial=-1))) + 1
+        nomes = np.empty(num_nos, dtype=object)
+        for id_usuario, nome in conn.execute("SELECT id, nome_completo FROM usuarios"):
+            nomes[id_usuario] = nome
+        return cls(arestas[:, 0], arestas[:, 1], num_nos, nomes)
+
+    def segue(self, usuario):
+        """a) Quem 'usuario' segue? (fatia do CSR direto)"""
+        return self.indices[self.indptr[usuario]:self.indptr[usuario + 1]]
+
+    def seguidores(self, usuario):
+        """b) Quem segue 'usuario'? (fatia do CSR reverso)"""
+        return self.indices_rev[self.indptr_rev[usuario]:self.indptr_rev[usuario + 1]]
+
+    def amigos_de_amigos(self, usuario):
+        """
+        c) Quem as pessoas que 'usuario' segue também seguem?
+        Exclui o próprio usuário e quem ele já segue; resultado ordenado e sem repetições.
+        """
+        seguidos = self.segue(usuario)
+        candidatos = np.unique(_fatias(self.indptr, self.indices, seguidos))
+        candidatos = np.setdiff1d(candidatos, seguidos, assume_unique=True)
+        return candidatos[candidatos != usuario]
+
+    def _recomendar_bloco(self, inicio, fim, k):
+        """Top-k das linhas inicio..fim-1 de A·A, sem o próprio usuário e sem quem ele já segue."""
+        n = fim - inicio
+        graus = self.graus[inicio:fim]
+        linhas = np.repeat(np.arange(inicio, fim), graus)            # usuário de cada aresta u -> v
+        meios = self.indices[self.indptr[inicio]:self.indptr[fim]]   # v
+        candidatos = _fatias(self.indptr, self.indices, meios)       # w, para cada v -> w
+        linhas = np.repeat(linhas, self.graus[meios])
+        validos = candidatos != linhas
+        # Chave (linha do bloco, candidato); contar chaves repetidas = somar o produto A·A
+        chaves, contagens = np.unique((linhas[validos] - inicio) * self.num_nos + candidatos[validos],
+                                      return_counts=True)
+        diretas = np.repeat(np.arange(n), graus) * self.num_nos + meios
+        novas = ~np.isin(chaves, diretas)
+        chaves, contagens = chaves[novas], contagens[novas]
+
+        linha, candidato = chaves // self.num_nos, chaves % self.num_nos
+        ordem = np.lexsort((candidato, -contagens, linha))  # por linha: mais seguidos em comum primeiro
+        linha, candidato, contagens = linha[ordem], candidato[ordem], contagens[ordem]
+        posicao = np.arange(len(linha)) - np.searchsorted(linha, linha)
+        topo = posicao < k
+
+        recomendados = np.full((n, k), -1, dtype=np.int64)
+        em_comum = np.zeros((n, k), dtype=np.int64)
+        recomendados[linha[topo], posicao[topo]] = candidato[topo]
+        em_comum[linha[topo], posicao[topo]] = contagens[topo]
+        return np.arange(inicio, fim), recomendados, em_comum
+
+    def recomendacoes_em_lote(self, k=10, max_caminhos=5_000_000):
+        """
+        Gera (usuarios, recomendados, em_comum) para todos os nós, bloco a bloco.
+        recomendados[i] são os k melhores candidatos de usuarios[i] (completados com -1) e
+        em_comum[i] quantas pessoas que ele segue seguem cada candidato. Empates saem pelo menor id.
+        """
+        graus = self.graus
+        # Caminhos de dois saltos que partem de cada nó = soma dos graus de quem ele segue
+        por_aresta = np.concatenate(([0], np.cumsum(graus[self.indices])))
+        caminhos = np.cumsum(por_aresta[self.indptr[1:]] - por_aresta[self.indptr[:-1]])
+        inicio = 0
+        while inicio < self.num_nos:
+            ja_feitos = caminhos[inicio - 1] if inicio else 0
+            fim = int(np.searchsorted(caminhos, ja_feitos + max_caminhos, side="right"))
+            fim = min(max(fim, inicio + 1), self.num_nos)  # um nó sozinho pode passar do limite
+            yield self._recomendar_bloco(inicio, fim, k)
+            inicio = fim
+
+    def recomendar(self, usuario, k=10):
+        """Top-k recomendações de um usuário: [(id, seguidos em comum), ...]."""
+        _, recomendados, em_comum = self._recomendar_bloco(usuario, usuario + 1, k)
+        return [(int(r), int(c)) for r, c in zip(recomendados[0], em_comum[0]) if r >= 0]
+
+    def nomes_de(self, ids):
+        """Converte um array de ids em nomes (ou devolve os ids se o grafo não tiver nomes)."""
+        if self.nomes is None:
+            return list(ids)
+        return list(self.nomes[ids])
@@ -0,0 +1,164 @@
+"""
+Gerador de redes sociais sintéticas em grande escala e carregadores em massa.
+
+O grafo de exemplo de social_network_modeling.py tem cinco usuários; para
+estudar escala precisamos de milhões. gerar_grafo_lei_de_potencia cria um
+grafo "seguidor -> seguido" reprodutível (semente fixa) em que poucas contas
+concentram a maior parte dos seguidores, como em redes reais.
+
+Carregadores:
+- SQLite: executemany em blocos, PRAGMAs relaxados durante a carga e índices
+  secundários criados só depois dos dados;
+- Neo4j: restrição de unicidade em Usuario.id (os MATCH viram buscas no
+  índice, não varreduras do rótulo) e UNWIND em lotes.
+Cada carregador reporta linhas por segundo.
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+from social_sql import criar_indice_reverso, criar_tabelas_sql
+
+
+def _pesos_lei_de_potencia(n, expoente, rng):
+    """Pesos ~ posto^(-1/(expoente-1)) (modelo de Chung-Lu), embaralhados entre os ids."""
+    pesos = np.arange(1, n + 1, dtype=np.float64) ** (-1.0 / (expoente - 1.0))
+    rng.shuffle(pesos)
+    return pesos / pesos.sum()
+
+
+def _sortear_arestas(num_usuarios, grau_medio, p_seguidor, p_seguido, rng, tamanho_bloco):
+    """
+    Sorteia arestas (seguidor, seguido) com as probabilidades dadas (None = uniforme) até ter
+    ~num_usuarios * grau_medio arestas distintas, sem laços. O excedente é descartado por
+    amostragem, não pela ordem das chaves (cortar o fim favoreceria os ids menores).
+    """
+    # Metade do grafo completo no máximo: perto disso as repetições dominam o sorteio
+    alvo = min(num_usuarios * grau_medio, num_usuarios * (num_usuarios - 1) // 2)
+
+    chaves = np.empty(0, dtype=np.int64)
+    while len(chaves) < alvo:
+        # Sorteia um pouco mais que o necessário para compensar laços e repetições
+        n = min(tamanho_bloco, int((alvo - len(chaves)) * 1.2) + 1)
+        origens = rng.choice(num_usuarios, size=n, p=p_seguidor) + 1
+        destinos = rng.choice(num_usuarios, size=n, p=p_seguido) + 1
+        validas = origens != destinos
+        novas = origens[validas] * (num_usuarios + 1) + destinos[validas]
+        chaves = np.union1d(chaves, novas)  # ordena e remove repetições
+    if len(chaves) > alvo:
+        chaves = np.sort(rng.choice(chaves, size=alvo, replace=False))
+    return chaves // (num_usuarios + 1), chaves % (num_usuarios + 1)
+
+
+def gerar_grafo_lei_de_potencia(num_usuarios, grau_medio=10, expoente=2.1, semente=42, tamanho_bloco=5_000_000):
+    """
+    Retorna (origens, destinos) com ~num_usuarios * grau_medio arestas, sem laços nem repetições.
+    Os ids vão de 1 a num_usuarios. O número de seguidores segue uma lei de potência com o
+    expoente dado; o número de contas seguidas também, porém mais suave (expoente + 1).
+    As arestas saem ordenadas por (seguidor, seguido), a ordem da chave primária no SQLite.
+    """
+    rng = np.random.default_rng(semente)
+    p_seguido = _pesos_lei_de_potencia(num_usuarios, expoente, rng)
+    p_seguidor = _pesos_lei_de_potencia(num_usuarios, expoente + 1.0, rng)
+    return _sortear_arestas(num_usuarios, grau_medio, p_seguidor, p_seguido, rng, tamanho_bloco)
+
+
+def gerar_grafo_uniforme(num_usuarios, grau_medio=10, semente=42, tamanho_bloco=5_000_000):
+    """Como gerar_grafo_lei_de_potencia, mas com seguidor e seguido sorteados uniformemente."""
+    rng = np.random.default_rng(semente)
+    return _sortear_arestas(num_usuarios, grau_medio, None, None, rng, tamanho_bloco)
+
+
+def gerar_usuarios(num_usuarios):
+    """Gera (id, username, nome_completo) sob demanda, no formato de users_data."""
+    for i in range(1, num_usuarios + 1):
+        yield i, f"user{i}", f"Usuário {i}"
+
+
+def _em_blocos(origens, destinos, tamanho_lote):
+    for inicio in range(0, len(origens), tamanho_lote):
+        yield zip(origens[inicio:inicio + tamanho_lote].tolist(), destinos[inicio:inicio + tamanho_lote].tolist())
+
+
+def carregar_sqlite(db_file, num_usuarios, origens, destinos, tamanho_lote=100_000, sem_rowid=False):
+    """
+    Cria o esquema de social_sql.py em 'db_file' (WITHOUT ROWID se 'sem_rowid') e carrega o grafo.
+    Durante a carga o journal e o fsync ficam desligados (um arquivo novo pode ser
+    simplesmente recriado se a carga falhar); o índice reverso (seguido_id, seguidor_id)
+    é criado no final, uma única ordenação em vez de milhões de inserções aleatórias.
+    Retorna a conexão aberta, já com os PRAGMAs padrão restaurados.
+    """
+    if os.path.exists(db_file):
+        os.remove(db_file)
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MB de cache de páginas
+    conn.execute("PRAGMA temp_store=MEMORY")
+    criar_tabelas_sql(conn, sem_rowid=sem_rowid, criar_indice=False)
+
+    t0 = time.perf_counter()
+    usuarios = gerar_usuarios(num_usuarios)
+    while True:
+        lote = [u for _, u in zip(range(tamanho_lote), usuarios)]
+        if not lote:
+            break
+        conn.executemany("INSERT INTO usuarios VALUES (?, ?, ?)", lote)
+        conn.commit()
+    segundos = time.perf_counter() - t0
+    print(f"[SQLite] usuarios:   {num_usuarios:>12,} linhas | {num_usuarios / segundos:>12,.0f} linhas/s")
+
+    t0 = time.perf_counter()
+    for lote in _em_blocos(origens, destinos, tamanho_lote):
+        conn.executemany("INSERT INTO seguidores VALUES (?, ?)", lote)
+        conn.commit()
+    segundos = time.perf_counter() - t0
+    print(f"[SQLite] seguidores: {len(origens):>12,} linhas | {len(origens) / segundos:>12,.0f} linhas/s")
+
+    t0 = time.perf_counter()
+    criar_indice_reverso(conn)
+    conn.execute("ANALYZE")
+    print(f"[SQLite] índice reverso e ANALYZE em {time.perf_counter() - t0:.1f} s")
+
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.execute("PRAGMA synchronous=FULL")
+    return conn
+
+
+def carregar_neo4j(modelo, num_usuarios, origens, destinos, tamanho_lote=10_000):
+    """Carrega o grafo em um Neo4jModel (de social_network_modeling.py) usando UNWIND em lotes."""
+    usuarios = ({'id': i, 'username': u, 'nome': n} for i, u, n in gerar_usuarios(num_usuarios))
+    relacoes = ({'seguidor_id': s, 'seguido_id': d} for s, d in zip(origens.tolist(), destinos.tolist()))
+    modelo.create_users_and_relationships(usuarios, relacoes, tamanho_lote=tamanho_lote)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma rede social sintética e a carrega no SQLite e/ou Neo4j.")
+    parser.add_argument("--usuarios", type=int, default=1_000_000)
+    parser.add_argument("--grau-medio", type=int, default=10, help="média de contas seguidas por usuário")
+    parser.add_argument("--expoente", type=float, default=2.1, help="expoente da lei de potência dos seguidores")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--sqlite", metavar="ARQUIVO_DB", help="carrega no arquivo SQLite indicado")
+    parser.add_argument("--neo4j", action="store_true", help="carrega no Neo4j configurado em social_network_modeling.py")
+    parser.add_argument("--sem-rowid", action="store_true", help="tabela de relações WITHOUT ROWID no SQLite")
+    parser.add_argument("--lote", type=int, default=None, help="linhas por lote (padrão: 100k SQLite, 10k Neo4j)")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    origens, destinos = gerar_grafo_lei_de_potencia(args.usuarios, args.grau_medio, args.expoente, args.semente)
+    seguidores = np.bincount(destinos, minlength=args.usuarios + 1)
+    print(f"Grafo gerado em {time.perf_counter() - t0:.1f} s: {args.usuarios:,} usuários, {len(origens):,} relações; "
+          f"maior número de seguidores: {seguidores.max():,} (mediana {int(np.median(seguidores[1:]))})")
+
+    if args.sqlite:
+        carregar_sqlite(args.sqlite, args.usuarios, origens, destinos, args.lote or 100_000,
+                        args.sem_rowid).close()
+    if args.neo4j:
+        from social_network_modeling import NEO4J_PASSWORD, NEO4J_URI, NEO4J_USER, Neo4jModel
+        modelo = Neo4jModel(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        modelo.clean_database()
+        carregar_neo4j(modelo, args.usuarios, origens, destinos, args.lote or 10_000)
+        modelo.close()
@@ -0,0 +1,136 @@
+"""
+Executores de consultas Cypher usados pelo Neo4jModel.
+
+Um executor expõe três operações:
+
+- executar(query, parametros): gera os registros do resultado sob demanda
+  (o driver busca do servidor em blocos de fetch_size, sem montar uma lista);
+- transacao(): contexto em que todas as consultas rodam em uma única
+  transação explícita (commit ao sair, rollback em caso de erro);
+- fechar().
+
+ExecutorSessao fala com o Neo4j reaproveitando uma sessão do driver entre
+consultas. ExecutorGravador não precisa de servidor: anota cada consulta e
+devolve respostas pré-definidas, para exercitar a divisão em lotes e o
+consumo em streaming sem Docker.
+"""
+import re
+from contextlib import contextmanager
+from itertools import islice
+
+# Parâmetro usado como fonte de um UNWIND no início da consulta: "UNWIND $users AS user"
+_PADRAO_UNWIND = re.compile(r"^\s*UNWIND\s+\$(\w+)", re.IGNORECASE)
+
+
+def parametro_unwind(query):
+    """Nome do parâmetro desenrolado pelo UNWIND inicial da consulta (ou None)."""
+    encontrado = _PADRAO_UNWIND.match(query)
+    return encontrado.group(1) if encontrado else None
+
+
+def executar_em_lotes(executor, query, parametros, tamanho_lote):
+    """
+    Executa uma consulta "UNWIND $lista ..." enviando 'lista' em lotes de no máximo
+    'tamanho_lote' itens (a lista pode ser qualquer iterável, até um gerador).
+    Os demais parâmetros vão iguais em todos os lotes. Retorna quantos itens foram enviados.
+    """
+    nome = parametro_unwind(query)
+    if nome is None or nome not in parametros:
+        raise ValueError("a consulta deve começar com 'UNWIND $<parametro>' presente em 'parametros'")
+    linhas = iter(parametros[nome])
+    total = 0
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            return total
+        for _ in executor.executar(query, {**parametros, nome: lote}):
+            pass  # Descarta o retorno (normalmente vazio) sem guardá-lo
+        total += len(lote)
+
+
+class ExecutorSessao:
+    """Reaproveita uma única sessão do driver; abre de novo só se ela for fechada."""
+
+    def __init__(self, driver, database=None, fetch_size=1000):
+        self.driver = driver
+        self.database = database
+        self.fetch_size = fetch_size
+        self.sessao = None
+        self.tx = None
+
+    def _obter_sessao(self):
+        if self.sessao is None or self.sessao.closed():
+            self.sessao = self.driver.session(database=self.database, fetch_size=self.fetch_size)
+        return self.sessao
+
+    def executar(self, query, parametros=None):
+        alvo = self.tx if self.tx is not None else self._obter_sessao()
+        yield from alvo.run(query, parametros)
+
+    @contextmanager
+    def transacao(self):
+        if self.tx is not None:
+            yield self  # Já dentro de uma transação: apenas participa dela
+            return
+        self.tx = self._obter_sessao().begin_transaction()
+        try:
+            yield self
+            self.tx.commit()
+        except BaseException:
+            self.tx.rollback()
+            raise
+        finally:
+            self.tx.close()
+            self.tx = None
+
+    def fechar(self):
+        if self.sessao is not None:
+            self.sessao.close()
+            self.sessao = None
+
+
+class ExecutorGravador:
+    """
+    Stand-in do Neo4j: guarda (query, parametros) em 'chamadas' e devolve registros
+    (dicionários) de 'respostas', que pode ser uma lista de pares (trecho_da_query, registros)
+    ou uma função responder(query, parametros). Transações aparecem como "BEGIN"/"COMMIT"/"ROLLBACK".
+    """
+
+    def __init__(self, respostas=None):
+        self.respostas = respostas or []
+        self.chamadas = []
+        self.registros_entregues = 0
+        self.em_transacao = False
+
+    def _responder(self, query, parametros):
+        if callable(self.respostas):
+            return self.respostas(query, parametros)
+        for trecho, registros in self.respostas:
+            if trecho in query:
+                return registros
+        return []
+
+    def executar(self, query, parametros=None):
+        self.chamadas.append((query, parametros))
+        for registro in self._responder(query, parametros):
+            self.registros_entregues += 1  # Conta só o que o chamador de fato consumiu
+            yield registro
+
+    @contextmanager
+    def transacao(self):
+        if self.em_transacao:
+            yield self
+            return
+        self.em_transacao = True
+        self.chamadas.append(("BEGIN", None))
+        try:
+            yield self
+            self.chamadas.append(("COMMIT", None))
+        except BaseException:
+            self.chamadas.append(("ROLLBACK", None))
+            raise
+        finally:
+            self.em_transacao = False
+
+    def fechar(self):
+        pass
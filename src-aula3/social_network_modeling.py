@@ -1,6 +1,13 @@
+import argparse
 import sqlite3
 from neo4j import GraphDatabase
 import os
+import time
+
+from graph_engine import GrafoCSR
+from neo4j_executor import ExecutorGravador, ExecutorSessao, executar_em_lotes, parametro_unwind
+from social_sql import (criar_tabela_k_saltos, criar_tabelas_sql, plano_de_consulta, sql_passo_k_saltos,
+                        varreduras_completas, vizinhanca_k_saltos)
 
 # --- Configurações ---
 # Para o Neo4j, configure com os dados do seu banco de dados local
@@ -32,6 +39,36 @@ follows_data = [
     (4, 5),  # Diana segue Eva
 ]
 
+# --- Consultas SQL (parametrizadas pelo id do usuário) ---
+# a) Quem o usuário segue?
+SQL_SEGUE = """
+            SELECT u.nome_completo
+            FROM usuarios u
+                     JOIN seguidores s ON u.id = s.seguido_id
+            WHERE s.seguidor_id = ?;
+            """
+
+# b) Quem são os seguidores do usuário?
+SQL_SEGUIDORES = """
+                 SELECT u.nome_completo
+                 FROM usuarios u
+                          JOIN seguidores s ON u.id = s.seguidor_id
+                 WHERE s.seguido_id = ?;
+                 """
+
+# c) Quem as pessoas que o usuário segue também seguem? (Sugestões de amizade)
+SQL_AMIGOS_DE_AMIGOS = """
+                       SELECT DISTINCT u_sugestao.nome_completo
+                       FROM seguidores s1
+                                JOIN seguidores s2 ON s1.seguido_id = s2.seguidor_id
+                                JOIN usuarios u_sugestao ON u_sugestao.id = s2.seguido_id
+                       WHERE s1.seguidor_id = :usuario -- Partindo do usuário
+                         AND s2.seguido_id != :usuario -- Não sugerir o próprio usuário
+                         AND s2.seguido_id NOT IN ( -- Não sugerir pessoas que ele já segue
+                           SELECT seguido_id FROM seguidores WHERE seguidor_id = :usuario
+                       );
+                       """
+
 
 def modelagem_sql_com_sqlite():
     """
@@ -49,27 +86,8 @@ def modelagem_sql_com_sqlite():
 
     # --- 1. Criação das Tabelas (Estrutura) ---
     print("\n[SQL] 1. Criando as tabelas 'usuarios' e 'seguidores'...")
-    # Tabela para armazenar os usuários
-    cursor.execute("""
-                   CREATE TABLE usuarios
-                   (
-                       id            INTEGER PRIMARY KEY,
-                       username      TEXT NOT NULL UNIQUE,
-                       nome_completo TEXT
-                   );
-                   """)
-
-    # Tabela de associação para representar a relação "segue" (muitos-para-muitos)
-    cursor.execute("""
-                   CREATE TABLE seguidores
-                   (
-                       seguidor_id INTEGER,
-                       seguido_id  INTEGER,
-                       PRIMARY KEY (seguidor_id, seguido_id),
-                       FOREIGN KEY (seguidor_id) REFERENCES usuarios (id),
-                       FOREIGN KEY (seguido_id) REFERENCES usuarios (id)
-                   );
-                   """)
+    # 'seguidores' ganha o índice reverso (seguido_id, seguidor_id); ver social_sql.py
+    criar_tabelas_sql(conn)
     print("[SQL] Tabelas criadas com sucesso!")
 
     # --- 2. Inserção de Dados ---
@@ -84,88 +102,160 @@ def modelagem_sql_com_sqlite():
 
     # a) Quem Alice (id=1) segue?
     print("\n  a) Quem Alice (id=1) segue?")
-    cursor.execute("""
-                   SELECT u.nome_completo
-                   FROM usuarios u
-                            JOIN seguidores s ON u.id = s.seguido_id
-                   WHERE s.seguidor_id = 1;
-                   """)
+    cursor.execute(SQL_SEGUE, (1,))
     results = cursor.fetchall()
     print(f"     Resultado: {[row[0] for row in results]}")
 
     # b) Quem são os seguidores de Diana (id=4)?
     print("\n  b) Quem são os seguidores de Diana (id=4)?")
-    cursor.execute("""
-                   SELECT u.nome_completo
-                   FROM usuarios u
-                            JOIN seguidores s ON u.id = s.seguidor_id
-                   WHERE s.seguido_id = 4;
-                   """)
+    cursor.execute(SQL_SEGUIDORES, (4,))
     results = cursor.fetchall()
     print(f"     Resultado: {[row[0] for row in results]}")
 
     # c) Quem são os "amigos dos amigos"? (Quem as pessoas que Alice segue, também seguem?)
     # Esta é a consulta que começa a mostrar a complexidade dos JOINs.
     print("\n  c) Quem as pessoas que Alice (id=1) segue, também seguem? (Sugestões de amizade)")
-    cursor.execute("""
-                   SELECT DISTINCT u_sugestao.nome_completo
-                   FROM seguidores s1
-                            JOIN seguidores s2 ON s1.seguido_id = s2.seguidor_id
-                            JOIN usuarios u_sugestao ON u_sugestao.id = s2.seguido_id
-                   WHERE s1.seguidor_id = 1 -- Partindo de Alice
-                     AND s2.seguido_id != 1      -- Não sugerir a própria Alice
-          AND s2.seguido_id NOT IN (  -- Não sugerir pessoas que Alice já segue
-              SELECT seguido_id FROM seguidores WHERE seguidor_id = 1
-          );
-                   """)
+    cursor.execute(SQL_AMIGOS_DE_AMIGOS, {"usuario": 1})
     results = cursor.fetchall()
     print(f"     Resultado: {[row[0] for row in results]}")
 
+    # d) Vizinhança a até 3 saltos: busca em largura, um INSERT por nível (sem um JOIN por nível na consulta)
+    print("\n  d) Quem está a até 3 saltos de Alice (id=1)? (id, distância)")
+    print(f"     Resultado: {vizinhanca_k_saltos(conn, 1, k=3)}")
+
+    # --- 4. Planos de execução: cada consulta deve buscar por índice, sem varrer tabelas ---
+    print("\n[SQL] 4. EXPLAIN QUERY PLAN das consultas...")
+    planos = (
+        ("a) segue", SQL_SEGUE, (1,)),
+        ("b) seguidores", SQL_SEGUIDORES, (4,)),
+        ("c) amigos de amigos", SQL_AMIGOS_DE_AMIGOS, {"usuario": 1}),
+        ("d) k saltos (um nível)", sql_passo_k_saltos("segue"), {"distancia": 1}),
+    )
+    criar_tabela_k_saltos(conn)
+    for rotulo, sql, parametros in planos:
+        plano = plano_de_consulta(conn, sql, parametros)
+        varreduras = varreduras_completas(plano)
+        print(f"\n  {rotulo}: {'varre tabela: ' + ', '.join(varreduras) if varreduras else 'só índices'}")
+        for etapa in plano:
+            print(f"     {etapa}")
+
     # Fechar a conexão
     conn.close()
     print("\n--- MODELAGEM SQL FINALIZADA ---")
 
 
+def modelagem_grafo_em_memoria():
+    """
+    Mesmas consultas, respondidas pelo motor em memória (arrays CSR do NumPy).
+    """
+    print("\n\n--- INICIANDO MODELAGEM EM MEMÓRIA (CSR com NumPy) ---")
+    grafo = GrafoCSR.de_arestas(follows_data, users_data)
+    print(f"[CSR] Grafo carregado: {len(users_data)} usuários e {grafo.num_arestas} relações de 'seguir'.")
+
+    print("\n  a) Quem Alice (id=1) segue?")
+    print(f"     Resultado: {grafo.nomes_de(grafo.segue(1))}")
+
+    print("\n  b) Quem são os seguidores de Diana (id=4)?")
+    print(f"     Resultado: {grafo.nomes_de(grafo.seguidores(4))}")
+
+    print("\n  c) Quem as pessoas que Alice (id=1) segue, também seguem? (Sugestões de amizade)")
+    print(f"     Resultado: {grafo.nomes_de(grafo.amigos_de_amigos(1))}")
+
+    # d) Em lote: as 3 melhores sugestões de cada usuário, pelo número de seguidos em comum
+    print("\n  d) Sugestões ranqueadas para todos os usuários (seguidos em comum)")
+    for usuarios, recomendados, em_comum in grafo.recomendacoes_em_lote(k=3):
+        for usuario, ids, contagens in zip(usuarios, recomendados, em_comum):
+            if grafo.nomes[usuario] is not None:
+                sugestoes = [f"{grafo.nomes[i]} ({c})" for i, c in zip(ids, contagens) if i >= 0]
+                print(f"     {grafo.nomes[usuario]}: {sugestoes}")
+    print("\n--- MODELAGEM EM MEMÓRIA FINALIZADA ---")
+
+
 class Neo4jModel:
     """
     Classe para gerenciar a conexão e as operações com o Neo4j.
+    As consultas passam por um executor (ver neo4j_executor.py): por padrão um
+    ExecutorSessao que reaproveita a sessão do driver; passe 'executor' para usar
+    outro, como o ExecutorGravador, que dispensa um servidor.
+    Listas grandes em consultas "UNWIND $lista" são enviadas em lotes de 'tamanho_lote'.
     """
 
-    def __init__(self, uri, user, password):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri=None, user=None, password=None, executor=None, tamanho_lote=10000):
+        self.driver = None
+        if executor is None:
+            self.driver = GraphDatabase.driver(uri, auth=(user, password))
+            executor = ExecutorSessao(self.driver)
+        self.executor = executor
+        self.tamanho_lote = tamanho_lote
 
     def close(self):
-        self.driver.close()
+        self.executor.fechar()
+        if self.driver is not None:
+            self.driver.close()
+
+    def transacao(self):
+        """Agrupa as consultas do bloco 'with' em uma única transação."""
+        return self.executor.transacao()
+
+    def _stream_query(self, query, parameters=None):
+        """Gera os registros um a um, sem montar a lista inteira em memória."""
+        return self.executor.executar(query, parameters)
 
     def _execute_query(self, query, parameters=None):
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return [record for record in result]
+        # Listas de UNWIND maiores que um lote são divididas automaticamente
+        # (iteráveis sem tamanho também); nesse caso o retorno dos lotes é descartado
+        nome = parametro_unwind(query)
+        if parameters and nome in parameters:
+            linhas = parameters[nome]
+            if not isinstance(linhas, (list, tuple)) or len(linhas) > self.tamanho_lote:
+                executar_em_lotes(self.executor, query, parameters, self.tamanho_lote)
+                return []
+        return list(self._stream_query(query, parameters))
 
     def clean_database(self):
         print("\n[Neo4j] 0. Limpando o banco de dados para começar do zero...")
         self._execute_query("MATCH (n) DETACH DELETE n")
         print("[Neo4j] Banco de dados limpo.")
 
-    def create_users_and_relationships(self):
+    def create_constraints(self):
+        # Sem índice, cada MATCH por id varre todos os nós :Usuario; com a restrição vira uma busca no índice
+        self._execute_query("CREATE CONSTRAINT usuario_id IF NOT EXISTS FOR (u:Usuario) REQUIRE u.id IS UNIQUE")
+
+    def _unwind_em_lotes(self, query, nome_parametro, linhas, tamanho_lote):
+        """Executa 'query' (um UNWIND) em lotes de 'tamanho_lote' linhas; retorna (linhas, segundos)."""
+        inicio = time.perf_counter()
+        total = executar_em_lotes(self.executor, query, {nome_parametro: linhas}, tamanho_lote)
+        return total, time.perf_counter() - inicio
+
+    def create_users_and_relationships(self, users=None, follows=None, tamanho_lote=None):
+        """
+        Cria os nós e as relações. Por padrão usa users_data/follows_data; para grafos grandes
+        (ver graph_generator.py) receba iteráveis de dicionários, enviados em lotes de
+        'tamanho_lote' linhas para não montar uma transação gigante no servidor.
+        """
         print("\n[Neo4j] 1. Criando nós de Usuários e relacionamentos 'SEGUE'...")
-        # Usando UNWIND para criar todos os usuários de uma vez a partir de uma lista
-        self._execute_query("""
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+        if users is None:
+            users = ({'id': u[0], 'username': u[1], 'nome': u[2]} for u in users_data)
+        if follows is None:
+            follows = ({'seguidor_id': f[0], 'seguido_id': f[1]} for f in follows_data)
+        self.create_constraints()
+
+        # Usando UNWIND para criar os usuários a partir de uma lista, lote a lote
+        total, segundos = self._unwind_em_lotes("""
             UNWIND $users as user
             CREATE (u:Usuario {id: user.id, username: user.username, nome: user.nome})
-        """, parameters={'users': [
-            {'id': u[0], 'username': u[1], 'nome': u[2]} for u in users_data
-        ]})
+        """, 'users', users, tamanho_lote)
+        print(f"[Neo4j] {total:,} usuários | {total / segundos:,.0f} linhas/s")
 
-        # Usando UNWIND para criar todos os relacionamentos de uma vez
-        self._execute_query("""
+        # Usando UNWIND para criar os relacionamentos, lote a lote
+        total, segundos = self._unwind_em_lotes("""
             UNWIND $follows as follow
             MATCH (seguidor:Usuario {id: follow.seguidor_id})
             MATCH (seguido:Usuario {id: follow.seguido_id})
             CREATE (seguidor)-[:SEGUE]->(seguido)
-        """, parameters={'follows': [
-            {'seguidor_id': f[0], 'seguido_id': f[1]} for f in follows_data
-        ]})
+        """, 'follows', follows, tamanho_lote)
+        print(f"[Neo4j] {total:,} relações | {total / segundos:,.0f} linhas/s")
         print("[Neo4j] Nós e relacionamentos criados com sucesso!")
 
     def run_queries(self):
@@ -177,7 +267,7 @@ class Neo4jModel:
             MATCH (alice:Usuario {id: 1})-[:SEGUE]->(seguido)
             RETURN seguido.nome
         """
-        results = self._execute_query(query_a)
+        results = self._stream_query(query_a)
         print(f"     Resultado: {[record['seguido.nome'] for record in results]}")
 
         # b) Quem são os seguidores de Diana (id=4)?
@@ -186,7 +276,7 @@ class Neo4jModel:
             MATCH (seguidor)-[:SEGUE]->(diana:Usuario {id: 4})
             RETURN seguidor.nome
         """
-        results = self._execute_query(query_b)
+        results = self._stream_query(query_b)
         print(f"     Resultado: {[record['seguidor.nome'] for record in results]}")
 
         # c) Quem são os "amigos dos amigos"? (Quem as pessoas que Alice segue, também seguem?)
@@ -200,17 +290,23 @@ class Neo4jModel:
             AND NOT (alice)-[:SEGUE]->(sugestao)
             RETURN DISTINCT sugestao.nome
         """
-        results = self._execute_query(query_c)
+        results = self._stream_query(query_c)
         print(f"     Resultado: {[record['sugestao.nome'] for record in results]}")
 
 
-def modelagem_grafo_com_neo4j():
+def modelagem_grafo_com_neo4j(offline=False):
     """
     Função para criar, popular e consultar a rede social usando Neo4j.
+    Com offline=True as consultas vão para um ExecutorGravador (sem servidor), em lotes
+    pequenos, e ao final são listadas as consultas que teriam sido enviadas.
     """
     print("\n\n--- INICIANDO MODELAGEM COM GRAFO (Neo4j) ---")
     try:
-        neo4j_model = Neo4jModel(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+        if offline:
+            gravador = ExecutorGravador()
+            neo4j_model = Neo4jModel(executor=gravador, tamanho_lote=2)
+        else:
+            neo4j_model = Neo4jModel(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
 
         # Passos
         neo4j_model.clean_database()
@@ -218,6 +314,11 @@ def modelagem_grafo_com_neo4j():
         neo4j_model.run_queries()
 
         neo4j_model.close()
+        if offline:
+            print("\n[Neo4j] Consultas gravadas (offline):")
+            for query, parametros in gravador.chamadas:
+                lote = next((len(v) for v in (parametros or {}).values() if isinstance(v, list)), None)
+                print(f"     {' '.join(query.split())[:60]:<60} {'' if lote is None else f'lote de {lote}'}")
         print("\n--- MODELAGEM NEO4J FINALIZADA ---")
 
     except Exception as e:
@@ -227,8 +328,16 @@ def modelagem_grafo_com_neo4j():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Modelagem da rede social em SQLite, em memória e no Neo4j.")
+    parser.add_argument("--offline", action="store_true",
+                        help="não conecta ao Neo4j: grava as consultas que seriam enviadas")
+    args = parser.parse_args()
+
     # Executa a modelagem relacional
     modelagem_sql_com_sqlite()
 
+    # Executa as mesmas consultas no motor de grafo em memória
+    modelagem_grafo_em_memoria()
+
     # Executa a modelagem de grafo
-    modelagem_grafo_com_neo4j()
\ No newline at end of file
+    modelagem_grafo_com_neo4j(offline=args.offline)
\ No newline at end of file
@@ -0,0 +1,125 @@
+"""
+Esquema e consultas SQLite da rede social.
+
+A chave primária de 'seguidores' é (seguidor_id, seguido_id): "quem X segue"
+é uma busca nessa chave, mas "quem segue X" teria de varrer a tabela inteira.
+O índice reverso (seguido_id, seguidor_id) cobre essa consulta sem voltar à
+tabela. Com sem_rowid=True a tabela de relações é WITHOUT ROWID: as linhas
+ficam guardadas na própria árvore da chave primária, sem a árvore extra do rowid.
+
+vizinhanca_k_saltos responde "quem está a até k passos de X" com uma busca em
+largura, um INSERT por nível em uma tabela temporária de visitados;
+plano_de_consulta devolve o EXPLAIN QUERY PLAN de uma consulta, para conferir
+que cada passo usa um índice.
+"""
+
+SENTIDOS = ("segue", "seguidores")
+
+
+def criar_tabelas_sql(conn, sem_rowid=False, criar_indice=True):
+    """
+    Cria 'usuarios' e 'seguidores'. Em cargas em massa passe criar_indice=False
+    e chame criar_indice_reverso depois dos dados (uma ordenação só, no final).
+    """
+    conn.execute("""
+                 CREATE TABLE usuarios
+                 (
+                     id            INTEGER PRIMARY KEY,
+                     username      TEXT NOT NULL UNIQUE,
+                     nome_completo TEXT
+                 );
+                 """)
+    # Tabela de associação para representar a relação "segue" (muitos-para-muitos)
+    conn.execute(f"""
+                 CREATE TABLE seguidores
+                 (
+                     seguidor_id INTEGER NOT NULL,
+                     seguido_id  INTEGER NOT NULL,
+                     PRIMARY KEY (seguidor_id, seguido_id),
+                     FOREIGN KEY (seguidor_id) REFERENCES usuarios (id),
+                     FOREIGN KEY (seguido_id) REFERENCES usuarios (id)
+                 ){" WITHOUT ROWID" if sem_rowid else ""};
+                 """)
+    if criar_indice:
+        criar_indice_reverso(conn)
+
+
+def criar_indice_reverso(conn):
+    """Índice de cobertura para "quem segue X" (seguido_id primeiro)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_seguidores_seguido ON seguidores (seguido_id, seguidor_id)")
+
+
+def criar_tabela_k_saltos(conn):
+    """
+    Tabela temporária (só desta conexão) com os usuários já visitados pela busca
+    em largura: a chave primária em id é o conjunto de visitados.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS k_saltos (id INTEGER PRIMARY KEY, distancia INTEGER NOT NULL)")
+    conn.execute("CREATE INDEX IF NOT EXISTS temp.idx_k_saltos_distancia ON k_saltos (distancia, id)")
+
+
+def sql_passo_k_saltos(sentido="segue"):
+    """
+    Um nível da busca em largura: expande a fronteira (os visitados a :distancia - 1)
+    e grava os vizinhos a :distancia. 'segue' percorre as arestas no sentido
+    seguidor -> seguido (chave primária); 'seguidores' no sentido inverso (índice reverso).
+
+    Poda de ciclos: INSERT OR IGNORE descarta quem já está em k_saltos, ou seja,
+    quem já foi alcançado a uma distância menor (ou igual, por outro caminho).
+    Cada usuário entra na fronteira uma única vez e cada aresta é lida no máximo
+    uma vez: O(E) para a busca toda, qualquer que seja k.
+    """
+    if sentido not in SENTIDOS:
+        raise ValueError(f"sentido deve ser um de {SENTIDOS}, não {sentido!r}")
+    de, para = ("seguidor_id", "seguido_id") if sentido == "segue" else ("seguido_id", "seguidor_id")
+    return f"""
+        INSERT OR IGNORE INTO k_saltos (id, distancia)
+        SELECT s.{para}, :distancia
+        FROM k_saltos v
+                 JOIN seguidores s ON s.{de} = v.id
+        WHERE v.distancia = :distancia - 1
+        """
+
+
+def vizinhanca_k_saltos(conn, usuario, k=2, sentido="segue", limite=None):
+    """
+    Usuários a até 'k' saltos de 'usuario', como [(id, distancia), ...] ordenados
+    pela distância. Busca em largura no SQLite, um INSERT por nível (sql_passo_k_saltos),
+    que para quando a fronteira se esvazia. 'limite' corta o resultado (útil para hubs
+    com milhões de vizinhos) e interrompe a busca assim que um nível completo o atinge.
+    """
+    if k < 1:
+        return []
+    em_transacao = conn.in_transaction
+    criar_tabela_k_saltos(conn)
+    conn.execute("DELETE FROM k_saltos")
+    conn.execute("INSERT INTO k_saltos (id, distancia) VALUES (?, 0)", (usuario,))
+    passo = sql_passo_k_saltos(sentido)
+    alcancados = 0
+    for distancia in range(1, k + 1):
+        novos = conn.execute(passo, {"distancia": distancia}).rowcount
+        alcancados += novos
+        if novos == 0 or (limite is not None and alcancados >= limite):
+            break
+    sql = "SELECT id, distancia FROM k_saltos WHERE distancia > 0 ORDER BY distancia, id"
+    if limite is not None:
+        sql += f" LIMIT {int(limite)}"
+    resultado = conn.execute(sql).fetchall()
+    conn.execute("DELETE FROM k_saltos")
+    if not em_transacao:
+        conn.commit()  # A tabela é temporária: não deixa uma transação aberta na conexão do chamador
+    return resultado
+
+
+def plano_de_consulta(conn, sql, parametros=()):
+    """Linhas do EXPLAIN QUERY PLAN da consulta (ex.: 'SEARCH s USING COVERING INDEX ...')."""
+    return [linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + sql, parametros)]
+
+
+def varreduras_completas(plano, ignorar=("CONSTANT ROW",)):
+    """
+    Etapas do plano que varrem uma tabela inteira ('SCAN <tabela>' sem índice).
+    'ignorar' lista as etapas que não leem tabelas.
+    """
+    return [etapa for etapa in plano
+            if etapa.startswith("SCAN ") and " USING " not in etapa and etapa[5:] not in ignorar]